@@ -1,17 +1,46 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
 import os
 
 from models import db
-from routes.auth import auth_bp
-from routes.campsites import campsites_bp
-from routes.bookings import bookings_bp
-from routes.reviews import reviews_bp
+from json_provider import FastJSONProvider
+from metrics import init_metrics
+from load_shedding import init_load_shedding
+from compression import init_compression
+from change_log import init_change_log
+from campsite_stats import init_campsite_stats
+from availability_index import init_availability_index
+from waitlist import init_waitlist
+from outbox import init_outbox
+from audit_log import init_audit_log
+from archive import init_archive
+from forecast import init_forecast
 
 
-def create_app():
+def create_app(config=None):
+    """Build the application without touching the database
+
+    Tables are created by the init-db command (or seed_data.py), not here,
+    so workers and scripts can build an app without any database I/O.
+    """
+    # Route modules are imported on first build rather than with this module
+    from routes.auth import auth_bp
+    from routes.campsites import campsites_bp
+    from routes.bookings import bookings_bp
+    from routes.reviews import reviews_bp
+    from routes.changes import changes_bp
+    from routes.pricing import pricing_bp
+    from routes.locations import locations_bp
+    from routes.availability import availability_bp
+    from routes.waitlist import waitlist_bp
+    from routes.audit import audit_bp
+    from routes.export import export_bp
+
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     CORS(app)
 
     # Configuration
@@ -23,16 +52,52 @@ def create_app():
     )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "jwt-secret-string")
+    app.config["METRICS_ENABLED"] = (
+        os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+    )
+    app.config["LOAD_SHEDDING_ENABLED"] = (
+        os.environ.get("LOAD_SHEDDING_ENABLED", "True").lower() == "true"
+    )
+    # Users allowed to export every host's bookings
+    app.config["ADMIN_USER_IDS"] = [
+        int(user_id)
+        for user_id in os.environ.get("ADMIN_USER_IDS", "").split(",")
+        if user_id.strip()
+    ]
+
+    # Overrides (e.g. tests pointing at an in-memory database)
+    if config:
+        app.config.update(config)
 
     # Initialize extensions
     db.init_app(app)
+    # Resolve ORM relationships now (CPU only) instead of on the first query
+    configure_mappers()
     jwt = JWTManager(app)
+    init_metrics(app)
+    init_load_shedding(app)
+    init_compression(app)
+    init_change_log(app)
+    init_campsite_stats(app)
+    init_availability_index(app)
+    init_waitlist(app)
+    init_outbox(app)
+    init_audit_log(app)
+    init_archive(app)
+    init_forecast(app)
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix="/api")
     app.register_blueprint(campsites_bp, url_prefix="/api")
     app.register_blueprint(bookings_bp, url_prefix="/api")
     app.register_blueprint(reviews_bp, url_prefix="/api")
+    app.register_blueprint(changes_bp, url_prefix="/api")
+    app.register_blueprint(pricing_bp, url_prefix="/api")
+    app.register_blueprint(locations_bp, url_prefix="/api")
+    app.register_blueprint(availability_bp, url_prefix="/api")
+    app.register_blueprint(waitlist_bp, url_prefix="/api")
+    app.register_blueprint(audit_bp, url_prefix="/api")
+    app.register_blueprint(export_bp, url_prefix="/api")
 
     @app.route("/")
     def home():
@@ -48,6 +113,22 @@ def create_app():
                     "bookings": "/api/bookings",
                     "reviews": "/api/reviews",
                     "payment": "/api/pay",
+                    "waitlist": "/api/waitlist",
+                    "history": (
+                        "/api/bookings/<id>/history, "
+                        "/api/campsites/<id>/booking-history"
+                    ),
+                    "export": "/api/export/bookings",
+                    "changes": "/api/changes",
+                    "locations": "/api/locations/suggest",
+                    "pricing": (
+                        "/api/campsites/<id>/pricing-rules, "
+                        "/api/campsites/<id>/quote"
+                    ),
+                    "availability": (
+                        "/api/campsites/<id>/blackouts, "
+                        "/api/campsites/<id>/availability"
+                    ),
                 },
             }
         )
@@ -71,20 +152,45 @@ def create_app():
     @app.route("/health")
     def health():
         """Health check endpoint"""
+        try:
+            db.session.execute(text("SELECT 1"))
+        except Exception:
+            return (
+                jsonify(
+                    {
+                        "status": "unhealthy",
+                        "service": "camping-api",
+                        "database": "unavailable",
+                    }
+                ),
+                503,
+            )
+
         return jsonify(
             {"status": "healthy", "service": "camping-api", "database": "connected"}
         )
 
-    # Create tables
-    with app.app_context():
+    @app.cli.command("init-db")
+    def init_db():
+        """Create any missing database tables"""
         db.create_all()
+        print("Database tables created")
 
     return app
 
 
-app = create_app()
+def __getattr__(name):
+    # The module-level app (for `python app.py`, `flask --app app` and WSGI
+    # servers) is built on first access, so importing create_app is cheap
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    app = create_app()
     debug_mode = os.environ.get("FLASK_DEBUG", "False").lower() == "true"
     host = os.environ.get("FLASK_HOST", "127.0.0.1")
     port = int(os.environ.get("FLASK_PORT", "5000"))
@@ -0,0 +1,129 @@
+"""
+Archival of finished bookings out of the hot booking table
+
+Availability checks, a guest's booking list and review eligibility all
+read the booking table, which otherwise only grows. Bookings whose stay
+ended more than BOOKING_RETENTION_DAYS ago can no longer block a stay or
+be cancelled or paid, so a background job moves them, whatever their
+status, into archived_booking in chunks of ARCHIVE_BATCH_SIZE. Each chunk
+is one INSERT ... SELECT and one DELETE in its own short transaction, so
+a row is always in exactly one of the two tables.
+
+Archived rows keep their ids and are read only when a request asks for
+history (include_archived=true), except that review eligibility and
+the popularity aggregate (campsite_stats.py) also count them.
+"""
+
+from datetime import date, timedelta
+from threading import Event, Lock, Thread
+
+from sqlalchemy import delete, func, insert, select
+
+from models import db, ArchivedBooking, Booking
+
+DEFAULT_RETENTION_DAYS = 365
+DEFAULT_ARCHIVE_INTERVAL = 3600
+DEFAULT_BATCH_SIZE = 500
+
+ARCHIVED_COLUMNS = (
+    "id",
+    "user_id",
+    "campsite_id",
+    "start_date",
+    "end_date",
+    "status",
+    "total_price",
+    "created_at",
+)
+
+
+def archive_bookings(retention, batch_size=DEFAULT_BATCH_SIZE):
+    """Move bookings that ended before the retention window, in chunks
+
+    Returns the number of bookings archived. Needs an app context.
+    """
+    cutoff = date.today() - retention
+    # SQLite hands out max(id) + 1 for new rows, so archiving the newest
+    # booking would let its id be reused and collide in the archive
+    newest = db.session.query(func.max(Booking.id)).scalar()
+    if newest is None:
+        return 0
+    booking = Booking.__table__
+
+    archived = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.session.query(Booking.id)
+            .filter(Booking.end_date < cutoff, Booking.id < newest)
+            .order_by(Booking.end_date)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return archived
+        columns = [booking.c[name] for name in ARCHIVED_COLUMNS]
+        db.session.execute(
+            insert(ArchivedBooking.__table__).from_select(
+                ARCHIVED_COLUMNS, select(*columns).where(booking.c.id.in_(ids))
+            )
+        )
+        db.session.execute(delete(booking).where(booking.c.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+
+
+class BookingArchiver(Thread):
+    """Daemon thread running archive_bookings every interval seconds"""
+
+    def __init__(self, app, interval, retention, batch_size):
+        super().__init__(name="booking-archiver", daemon=True)
+        self.app = app
+        self.interval = interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    archive_bookings(self.retention, self.batch_size)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Booking archival failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def init_archive(app):
+    """Archive finished bookings in the background"""
+    app.config.setdefault("BOOKING_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    app.config.setdefault("BOOKING_ARCHIVE_INTERVAL", DEFAULT_ARCHIVE_INTERVAL)
+    app.config.setdefault("ARCHIVE_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+    retention = timedelta(days=app.config["BOOKING_RETENTION_DAYS"])
+    interval = app.config["BOOKING_ARCHIVE_INTERVAL"]
+    batch_size = app.config["ARCHIVE_BATCH_SIZE"]
+
+    @app.cli.command("archive-bookings")
+    def archive_bookings_command():
+        """Move bookings that ended before the retention window"""
+        print(f"Archived {archive_bookings(retention, batch_size)} bookings")
+
+    if not interval:
+        return
+
+    # Started by the first request so building an app never spawns threads
+    start_lock = Lock()
+
+    def start_archiver():
+        if "booking_archiver" in app.extensions:
+            return
+        with start_lock:
+            if "booking_archiver" not in app.extensions:
+                archiver = BookingArchiver(app, interval, retention, batch_size)
+                app.extensions["booking_archiver"] = archiver
+                archiver.start()
+
+    app.before_request(start_archiver)
@@ -0,0 +1,75 @@
+"""
+Append-only audit log of booking status transitions
+
+Booking.status is overwritten in place, so every ORM flush that creates a
+booking or changes its status also appends a BookingTransition: who made
+the change (the authenticated user and the endpoint, or "system" outside
+a request), from and to which status, and the booking's amount at the
+time. Like the change feed (change_log.py), the rows are written with one
+multi-row INSERT on the flush's connection, so they commit or roll back
+with the change and a batch of bookings costs a single statement.
+"""
+
+from datetime import datetime
+
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+from models import Booking, BookingTransition
+
+
+def _actor():
+    if not has_request_context():
+        return None, "system"
+    try:
+        user_id = get_jwt_identity()
+    except RuntimeError:
+        # The endpoint does not authenticate, e.g. POST /api/pay
+        user_id = None
+    return user_id, request.endpoint or "system"
+
+
+def _transitions_for(session):
+    rows = []
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Booking):
+            continue
+        if obj in session.new:
+            from_status = None
+        else:
+            history = attributes.get_history(obj, "status")
+            if not history.has_changes():
+                continue
+            from_status = history.deleted[0] if history.deleted else None
+        rows.append(
+            {
+                "booking_id": obj.id,
+                "campsite_id": obj.campsite_id,
+                "from_status": from_status,
+                "to_status": obj.status,
+                "amount": obj.total_price,
+            }
+        )
+    return rows
+
+
+def _record_transitions(session, flush_context):
+    # Runs after the flush statements (so new rows have ids) but before the
+    # commit, on the same connection and therefore in the same transaction
+    rows = _transitions_for(session)
+    if not rows:
+        return
+    actor_id, source = _actor()
+    now = datetime.utcnow()
+    for row in rows:
+        row.update(actor_id=actor_id, source=source, created_at=now)
+    rows.sort(key=lambda row: row["booking_id"])
+    session.connection().execute(BookingTransition.__table__.insert(), rows)
+
+
+def init_audit_log(app):
+    """Record booking status transitions on every flush"""
+    if not event.contains(Session, "after_flush", _record_transitions):
+        event.listen(Session, "after_flush", _record_transitions)
@@ -0,0 +1,249 @@
+"""
+Host blackout dates and the overlap checks shared by booking and search
+
+A campsite's blackouts are stored as merged ranges of nights, from
+start_date up to (not including) end_date like bookings, that never
+overlap or touch. Adding or removing ranges, including recurring patterns
+expanded here, rewrites only the stored ranges in the span they cover, so
+"every Monday for a year" is 52 rows and a run of blocked days is one.
+
+Because the ranges never overlap, they sort the same way by start_date
+as by end_date, and the only one that can overlap a stay is the first to
+end after the stay starts. Checking a stay is one seek on the
+(campsite_id, end_date) index however many ranges a campsite has.
+
+Waitlist holds (see waitlist.py) block nights like bookings until they
+expire.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, func, literal, or_, select, union_all
+
+from models import db, Blackout, Booking, Campsite, WaitlistEntry
+
+BLOCKING_STATUSES = ("confirmed", "paid")
+
+# Longest span one request may block or unblock
+MAX_SPAN_DAYS = 2 * 366
+
+# Waitlist stays are at most this long, so a hold overlapping a range
+# starts at most this many nights before it, bounding the index scan
+MAX_HOLD_NIGHTS = 30
+
+
+def merge_ranges(ranges):
+    """Sorted (start, end) ranges with overlapping or touching ones joined"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(ranges, removed):
+    """Parts of merged ranges not covered by merged removed ranges"""
+    remaining = []
+    for start, end in ranges:
+        for cut_start, cut_end in removed:
+            if cut_end <= start or cut_start >= end:
+                continue
+            if cut_start > start:
+                remaining.append((start, cut_start))
+            start = max(start, cut_end)
+            if start >= end:
+                break
+        if start < end:
+            remaining.append((start, end))
+    return remaining
+
+
+def recurring_ranges(start, end, weekdays):
+    """Merged ranges of the nights from start to end on weekdays (0 = Monday)"""
+    nights = []
+    night = start
+    while night < end:
+        if night.weekday() in weekdays:
+            nights.append((night, night + timedelta(days=1)))
+        night += timedelta(days=1)
+    return merge_ranges(nights)
+
+
+def _parse_range(item):
+    try:
+        start = datetime.strptime(item["start_date"], "%Y-%m-%d").date()
+        end = datetime.strptime(item["end_date"], "%Y-%m-%d").date()
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Ranges need start_date and end_date as YYYY-MM-DD")
+    if start >= end:
+        raise ValueError("End date must be after start date")
+    if (end - start).days > MAX_SPAN_DAYS:
+        raise ValueError(f"Ranges may span at most {MAX_SPAN_DAYS} days")
+    return start, end
+
+
+def _parse_weekdays(raw):
+    # bool is a subclass of int, but true is not Tuesday
+    if (
+        not isinstance(raw, list)
+        or not raw
+        or any(isinstance(day, bool) or day not in range(7) for day in raw)
+    ):
+        raise ValueError("weekdays must be a list of 0 (Monday) to 6")
+    return set(raw)
+
+
+def parse_blackouts(data):
+    """Merged ranges from {"ranges": [...], "recurring": [...]}, or ValueError
+
+    Each range is {start_date, end_date}; each recurring pattern adds
+    weekdays (0 = Monday) to one.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("ranges or recurring is required")
+    ranges = []
+    try:
+        for item in data.get("ranges") or []:
+            ranges.append(_parse_range(item))
+        for item in data.get("recurring") or []:
+            start, end = _parse_range(item)
+            weekdays = _parse_weekdays(item.get("weekdays"))
+            ranges.extend(recurring_ranges(start, end, weekdays))
+    except (AttributeError, TypeError):
+        raise ValueError("ranges and recurring must be lists of objects")
+    if not ranges:
+        raise ValueError("ranges or recurring is required")
+
+    ranges = merge_ranges(ranges)
+    if (ranges[-1][1] - ranges[0][0]).days > MAX_SPAN_DAYS:
+        raise ValueError(f"Ranges may span at most {MAX_SPAN_DAYS} days")
+    return ranges
+
+
+def _replace(campsite_id, stored, ranges):
+    for blackout in stored:
+        db.session.delete(blackout)
+    db.session.add_all(
+        Blackout(campsite_id=campsite_id, start_date=start, end_date=end)
+        for start, end in ranges
+    )
+
+
+def add_blackouts(campsite_id, ranges):
+    """Block merged ranges, joining them with the stored ranges they touch"""
+    first, last = ranges[0][0], ranges[-1][1]
+    stored = Blackout.query.filter(
+        Blackout.campsite_id == campsite_id,
+        Blackout.end_date >= first,
+        Blackout.start_date <= last,
+    ).all()
+    merged = merge_ranges([(b.start_date, b.end_date) for b in stored] + list(ranges))
+    _replace(campsite_id, stored, merged)
+
+
+def remove_blackouts(campsite_id, ranges):
+    """Unblock merged ranges, splitting stored ranges they cut through"""
+    first, last = ranges[0][0], ranges[-1][1]
+    stored = (
+        Blackout.query.filter(
+            Blackout.campsite_id == campsite_id,
+            Blackout.end_date > first,
+            Blackout.start_date < last,
+        )
+        .order_by(Blackout.start_date)
+        .all()
+    )
+    remaining = subtract_ranges([(b.start_date, b.end_date) for b in stored], ranges)
+    _replace(campsite_id, stored, remaining)
+
+
+def delete_blackouts(campsite_id):
+    """Remove a campsite's blackouts ahead of deleting it"""
+    Blackout.query.filter(Blackout.campsite_id == campsite_id).delete(
+        synchronize_session=False
+    )
+
+
+def blackout_overlap(campsite_id, start, end):
+    """SQL condition: a blackout of campsite_id covers a night of the stay"""
+    first_start = (
+        select(Blackout.start_date)
+        .where(Blackout.campsite_id == campsite_id, Blackout.end_date > start)
+        .order_by(Blackout.end_date)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(first_start, end) < end
+
+
+def booking_overlap(campsite_id, start, end, exclude_booking_id=None):
+    """SQL condition: a confirmed or paid booking overlaps the stay"""
+    conditions = [
+        Booking.campsite_id == campsite_id,
+        Booking.status.in_(BLOCKING_STATUSES),
+        Booking.start_date < end,
+        Booking.end_date > start,
+    ]
+    if exclude_booking_id:
+        conditions.append(Booking.id != exclude_booking_id)
+    return exists().where(*conditions)
+
+
+def _hold_conditions(campsite, start, end):
+    return [
+        campsite,
+        WaitlistEntry.status == "offered",
+        WaitlistEntry.start_date > start - timedelta(days=MAX_HOLD_NIGHTS),
+        WaitlistEntry.start_date < end,
+        WaitlistEntry.end_date > start,
+        WaitlistEntry.hold_expires_at > datetime.utcnow(),
+    ]
+
+
+def hold_overlap(campsite_id, start, end, exclude_entry_id=None):
+    """SQL condition: an unexpired waitlist hold overlaps the stay"""
+    conditions = _hold_conditions(WaitlistEntry.campsite_id == campsite_id, start, end)
+    if exclude_entry_id:
+        conditions.append(WaitlistEntry.id != exclude_entry_id)
+    return exists().where(*conditions)
+
+
+def overlaps(ranges, start, end):
+    return any(
+        taken_start < end and taken_end > start for taken_start, taken_end in ranges
+    )
+
+
+def available_filter(start, end):
+    """Filter for campsites free for the whole stay"""
+    return ~or_(
+        booking_overlap(Campsite.id, start, end),
+        blackout_overlap(Campsite.id, start, end),
+        hold_overlap(Campsite.id, start, end),
+    )
+
+
+def unavailable_ranges(campsite_id, start, end):
+    """Bookings, blackouts and holds overlapping start to end, in date order"""
+    bookings = select(Booking.start_date, Booking.end_date, literal("booked")).where(
+        Booking.campsite_id == campsite_id,
+        Booking.status.in_(BLOCKING_STATUSES),
+        Booking.start_date < end,
+        Booking.end_date > start,
+    )
+    blackouts = select(
+        Blackout.start_date, Blackout.end_date, literal("blackout")
+    ).where(
+        Blackout.campsite_id == campsite_id,
+        Blackout.end_date > start,
+        Blackout.start_date < end,
+    )
+    holds = select(
+        WaitlistEntry.start_date, WaitlistEntry.end_date, literal("held")
+    ).where(*_hold_conditions(WaitlistEntry.campsite_id == campsite_id, start, end))
+    return sorted(
+        tuple(row) for row in db.session.execute(union_all(bookings, blackouts, holds))
+    )
@@ -0,0 +1,357 @@
+"""
+In-memory index of the nights each campsite is taken, for booking checks
+
+Booking, batch booking, waitlist matching and the availability include
+(fieldsets.py) check stays here rather than asking the database on
+every attempt. The index keeps each campsite's taken nights in process:
+its confirmed and paid bookings and its blackouts, merged into sorted,
+disjoint ranges, plus its holds with their expiry. A stay is checked with
+one bisect, as blackout_overlap does in SQL, and the ranges of any number
+of campsites are loaded in one query the first time they are asked for.
+
+Every flush that adds, changes or removes a blocking booking, a blackout
+or a hold bumps Campsite.availability_version with one UPDATE, in the
+same transaction. Callers pass the version of the campsite row they have
+already loaded, and an entry cached at another version (written by
+another worker, say) is reloaded before answering. Writes made through
+this process are applied to the index when they commit, so a booking,
+cancellation or payment does not cost a reload.
+
+The database keeps the last word. A check records the versions it
+answered from, and the flush that then writes to one of those campsites
+bumps its version only if it is unchanged, raising AvailabilityConflict
+otherwise. Two workers booking the same nights from the same version
+cannot both commit. Bulk loads that bypass the ORM (seed_data.py) do not
+bump versions; restart the app after one.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from threading import Lock
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, literal, null, or_, select, tuple_, union_all, update
+from sqlalchemy.orm import Session, attributes
+
+from availability import BLOCKING_STATUSES, merge_ranges
+from models import db, Blackout, Booking, Campsite, WaitlistEntry
+
+# Session.info keys: versions checks answered from, and committed changes
+CHECKED_KEY = "availability_checked"
+PENDING_KEY = "availability_pending"
+
+# bookings and blackouts map ids to (start, end), holds to (start, end,
+# expires_at); starts and ends are the merged bookings and blackouts
+CampsiteRanges = namedtuple(
+    "CampsiteRanges", "version bookings blackouts holds starts ends"
+)
+
+_KINDS = {Booking: "bookings", Blackout: "blackouts", WaitlistEntry: "holds"}
+_WATCHED = ("status", "start_date", "end_date", "hold_expires_at")
+
+_index_lock = Lock()
+
+
+class AvailabilityConflict(Exception):
+    """A campsite's nights changed between checking and booking them"""
+
+
+def _blocks(obj, status):
+    if isinstance(obj, Booking):
+        return status in BLOCKING_STATUSES
+    if isinstance(obj, WaitlistEntry):
+        return status == "offered"
+    return True
+
+
+def _value(obj):
+    if isinstance(obj, WaitlistEntry):
+        return (obj.start_date, obj.end_date, obj.hold_expires_at)
+    return (obj.start_date, obj.end_date)
+
+
+def _ranges(version, bookings, blackouts, holds):
+    merged = merge_ranges([*bookings.values(), *blackouts.values()])
+    return CampsiteRanges(
+        version,
+        bookings,
+        blackouts,
+        holds,
+        [start for start, _ in merged],
+        [end for _, end in merged],
+    )
+
+
+def _free(entry, start, end, now, exclude_booking_id=None, exclude_entry_id=None):
+    if exclude_booking_id in entry.bookings:
+        bookings = dict(entry.bookings)
+        del bookings[exclude_booking_id]
+        entry = _ranges(entry.version, bookings, entry.blackouts, entry.holds)
+    # The merged ranges never overlap, so only the first to end after the
+    # stay starts can overlap it
+    position = bisect_right(entry.ends, start)
+    if position < len(entry.ends) and entry.starts[position] < end:
+        return False
+    return not any(
+        hold_start < end and hold_end > start and expires_at > now
+        for entry_id, (hold_start, hold_end, expires_at) in entry.holds.items()
+        if entry_id != exclude_entry_id
+    )
+
+
+class AvailabilityIndex:
+    """Taken nights per campsite, checked against campsite versions"""
+
+    def __init__(self):
+        self.entries = {}
+        self._lock = Lock()
+
+    def is_available(
+        self,
+        campsite_id,
+        version,
+        start,
+        end,
+        exclude_booking_id=None,
+        exclude_entry_id=None,
+    ):
+        """Whether no booking, blackout or hold overlaps the stay
+
+        version is the availability_version of the campsite row the
+        caller loaded. Needs an app context.
+        """
+        entry = self._entries({campsite_id: version})[campsite_id]
+        return _free(
+            entry,
+            start,
+            end,
+            datetime.utcnow(),
+            exclude_booking_id,
+            exclude_entry_id,
+        )
+
+    def taken_ranges(self, versions, start, end):
+        """{campsite_id: taken ranges overlapping start to end}, for many stays
+
+        Campsites with nothing taken in the window are left out.
+        """
+        now = datetime.utcnow()
+        taken = defaultdict(list)
+        for campsite_id, entry in self._entries(versions).items():
+            ranges = []
+            # Every merged range ending after start, while they start before end
+            position = bisect_right(entry.ends, start)
+            while position < len(entry.ends) and entry.starts[position] < end:
+                ranges.append((entry.starts[position], entry.ends[position]))
+                position += 1
+            ranges.extend(
+                (hold_start, hold_end)
+                for hold_start, hold_end, expires_at in entry.holds.values()
+                if hold_start < end and hold_end > start and expires_at > now
+            )
+            if ranges:
+                taken[campsite_id] = ranges
+        return taken
+
+    def _entries(self, versions):
+        entries = {
+            campsite_id: self.entries.get(campsite_id) for campsite_id in versions
+        }
+        stale = [
+            campsite_id
+            for campsite_id, entry in entries.items()
+            if entry is None or entry.version != versions[campsite_id]
+        ]
+        if stale:
+            entries.update(self._load({c: versions[c] for c in stale}))
+        db.session.info.setdefault(CHECKED_KEY, {}).update(versions)
+        return entries
+
+    def _load(self, versions):
+        today = date.today()
+        campsite_ids = sorted(versions)
+        # Holds come first so the union's expiry column is typed DateTime
+        holds = select(
+            WaitlistEntry.campsite_id,
+            literal("holds"),
+            WaitlistEntry.id,
+            WaitlistEntry.start_date,
+            WaitlistEntry.end_date,
+            WaitlistEntry.hold_expires_at,
+        ).where(
+            WaitlistEntry.campsite_id.in_(campsite_ids),
+            WaitlistEntry.status == "offered",
+            WaitlistEntry.hold_expires_at > datetime.utcnow(),
+        )
+        bookings = select(
+            Booking.campsite_id,
+            literal("bookings"),
+            Booking.id,
+            Booking.start_date,
+            Booking.end_date,
+            null(),
+        ).where(
+            Booking.campsite_id.in_(campsite_ids),
+            Booking.status.in_(BLOCKING_STATUSES),
+            Booking.end_date > today,
+        )
+        blackouts = select(
+            Blackout.campsite_id,
+            literal("blackouts"),
+            Blackout.id,
+            Blackout.start_date,
+            Blackout.end_date,
+            null(),
+        ).where(Blackout.campsite_id.in_(campsite_ids), Blackout.end_date > today)
+
+        found = {
+            campsite_id: {"bookings": {}, "blackouts": {}, "holds": {}}
+            for campsite_id in campsite_ids
+        }
+        for campsite_id, kind, row_id, start, end, expires_at in db.session.execute(
+            union_all(holds, bookings, blackouts)
+        ):
+            found[campsite_id][kind][row_id] = (
+                (start, end, expires_at) if kind == "holds" else (start, end)
+            )
+
+        loaded = {
+            campsite_id: _ranges(versions[campsite_id], **kinds)
+            for campsite_id, kinds in found.items()
+        }
+        with self._lock:
+            for campsite_id, entry in loaded.items():
+                cached = self.entries.get(campsite_id)
+                # Versions only grow, so never replace a newer entry
+                if cached is None or cached.version < entry.version:
+                    self.entries[campsite_id] = entry
+        return loaded
+
+    def apply(self, pending):
+        """Apply changes committed by this process, or drop what they miss"""
+        with self._lock:
+            for campsite_id, (first, last, changes) in pending.items():
+                entry = self.entries.get(campsite_id)
+                if entry is None or entry.version >= last:
+                    continue
+                if entry.version != first:
+                    # Another worker wrote in between; reload on next use
+                    del self.entries[campsite_id]
+                    continue
+                kinds = {
+                    kind: dict(getattr(entry, kind))
+                    for kind in ("bookings", "blackouts", "holds")
+                }
+                for kind, rows in changes.items():
+                    for row_id, value in rows.items():
+                        if value is None:
+                            kinds[kind].pop(row_id, None)
+                        else:
+                            kinds[kind][row_id] = value
+                self.entries[campsite_id] = _ranges(last, **kinds)
+
+
+def get_index(app):
+    """The app's availability index, created on first use"""
+    index = app.extensions.get("availability_index")
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get("availability_index")
+            if index is None:
+                index = AvailabilityIndex()
+                app.extensions["availability_index"] = index
+    return index
+
+
+def _changes(session):
+    """{campsite_id: {kind: {row id: value, or None if removed}}} of a flush"""
+    changes = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        kind = _KINDS.get(type(obj))
+        if kind is None:
+            continue
+        histories = [
+            attributes.get_history(obj, name)
+            for name in _WATCHED
+            if hasattr(type(obj), name)
+        ]
+        if obj in session.dirty and not any(h.has_changes() for h in histories):
+            continue
+        old_status = status = None
+        if kind != "blackouts":
+            status = obj.status
+            history = attributes.get_history(obj, "status")
+            old_status = (history.deleted or history.unchanged or [None])[0]
+        blocked = obj not in session.new and _blocks(obj, old_status)
+        blocks = obj not in session.deleted and _blocks(obj, status)
+        if blocked or blocks:
+            rows = changes.setdefault(obj.campsite_id, {}).setdefault(kind, {})
+            rows[obj.id] = _value(obj) if blocks else None
+    return changes
+
+
+def _bump_versions(session, flush_context):
+    changes = _changes(session)
+    if not changes:
+        return
+
+    # Campsites a check answered from must still be at that version
+    checked = session.info.get(CHECKED_KEY, {})
+    expected = {c: checked.pop(c) for c in sorted(changes) if c in checked}
+    campsite = Campsite.__table__
+    statement = (
+        update(campsite)
+        .where(
+            or_(
+                campsite.c.id.in_(sorted(set(changes) - set(expected))),
+                tuple_(campsite.c.id, campsite.c.availability_version).in_(
+                    sorted(expected.items())
+                ),
+            )
+        )
+        .values(availability_version=campsite.c.availability_version + 1)
+        .returning(campsite.c.id, campsite.c.availability_version)
+    )
+    versions = dict(session.connection().execute(statement).all())
+    if set(expected) - set(versions):
+        raise AvailabilityConflict(sorted(set(expected) - set(versions)))
+
+    pending = session.info.setdefault(PENDING_KEY, {})
+    for campsite_id, version in versions.items():
+        first, _, merged = pending.get(campsite_id, (version - 1, None, {}))
+        for kind, rows in changes[campsite_id].items():
+            merged.setdefault(kind, {}).update(rows)
+        pending[campsite_id] = (first, version, merged)
+
+    # The UPDATE bypassed the identity map, so refresh loaded campsites
+    for obj in session.identity_map.values():
+        if isinstance(obj, Campsite) and obj.id in versions:
+            attributes.set_committed_value(
+                obj, "availability_version", versions[obj.id]
+            )
+
+
+def _apply_after_commit(session):
+    session.info.pop(CHECKED_KEY, None)
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending and has_app_context():
+        index = current_app.extensions.get("availability_index")
+        if index is not None:
+            index.apply(pending)
+
+
+def _discard_after_rollback(session):
+    session.info.pop(CHECKED_KEY, None)
+    session.info.pop(PENDING_KEY, None)
+
+
+def init_availability_index(app):
+    """Version campsite availability on every flush"""
+    for name, listener in (
+        ("after_flush", _bump_versions),
+        ("after_commit", _apply_after_commit),
+        ("after_rollback", _discard_after_rollback),
+    ):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
@@ -0,0 +1,1101 @@
+"""
+Endpoint benchmark suite with regression tracking
+
+Load a generated dataset, drive every route in the API blueprints under
+concurrency and record p50/p95/p99 latency and throughput per endpoint:
+
+    python benchmark.py run --concurrency 8 --requests 200 --output before.json
+
+Requests go through Flask's test client in-process by default, or through
+a local HTTP server on a background thread with --target http. Compare two
+runs and fail (exit 1) when an endpoint regresses past a threshold:
+
+    python benchmark.py compare before.json after.json \\
+        --endpoint "GET /api/campsites" --threshold 0.10
+
+Cold start (import, app build, first and second request in a fresh worker
+process) is measured with `python benchmark.py coldstart --runs 10`.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import requests
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import db, User, Campsite, Booking, Review, PricingRule, WaitlistEntry
+from seed_data import seed_database
+
+BENCHMARK_DATABASE_URI = "sqlite:///benchmark.db"
+BENCHMARK_COUNTS = {
+    "users": 2000,
+    "campsites": 1000,
+    "bookings": 20000,
+    "reviews": 5000,
+}
+BENCHMARK_PASSWORD = "password123"
+LOCATION_PREFIXES = ("c", "ca", "yos", "big s", "oregon", "zz")
+SORT_ORDERS = ("price", "-price", "rating", "popularity", "newest")
+# (latitude, longitude) around seeded locations, plus one with no campsites
+GEO_POINTS = ((37.75, -119.59), (36.06, -112.14), (44.43, -110.59), (0.0, 0.0))
+BLUEPRINTS = (
+    "auth",
+    "campsites",
+    "bookings",
+    "reviews",
+    "changes",
+    "pricing",
+    "locations",
+    "availability",
+    "waitlist",
+    "audit",
+    "export",
+)
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps")
+
+# Runs in a fresh interpreter per sample and prints phase timings as JSON
+COLDSTART_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1]})
+built = time.perf_counter()
+client = app.test_client()
+status = client.get(sys.argv[2]).status_code
+first = time.perf_counter()
+client.get(sys.argv[2])
+second = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import": imported - started,
+    "build": built - imported,
+    "first_request": first - built,
+    "second_request": second - first,
+}))
+"""
+COLDSTART_PHASES = ("process", "import", "build", "first_request", "second_request")
+
+
+class BenchData:
+    """Users, tokens and rows the scenarios address
+
+    Created once per run, directly through the ORM, on top of the loaded
+    dataset: a host with a campsite, a guest with a booking and a review.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sequence = itertools.count()
+        today = date.today()
+
+        with app.app_context():
+            suffix = uuid.uuid4().hex[:8]
+            self.host = self.add_user(f"bench-host-{suffix}@example.com")
+            self.guest = self.add_user(
+                f"bench-guest-{suffix}@example.com", BENCHMARK_PASSWORD
+            )
+            self.guest_email = self.guest.email
+
+            self.campsite = Campsite(
+                title="Benchmark Meadow",
+                description="Reserved for benchmark bookings.",
+                price=40.0,
+                location="Benchmark County, California",
+                host_id=self.host.id,
+                image_url="",
+            )
+            db.session.add(self.campsite)
+            db.session.flush()
+
+            self.booking = Booking(
+                user_id=self.guest.id,
+                campsite_id=self.campsite.id,
+                start_date=today + timedelta(days=3),
+                end_date=today + timedelta(days=5),
+                total_price=80.0,
+                status="paid",
+            )
+            self.review = Review(
+                user_id=self.guest.id,
+                campsite_id=self.campsite.id,
+                rating=4,
+                comment="Benchmark review",
+            )
+            db.session.add_all([self.booking, self.review])
+            db.session.commit()
+
+            self.host_id = self.host.id
+            self.guest_id = self.guest.id
+            self.campsite_id = self.campsite.id
+            self.booking_id = self.booking.id
+            self.review_id = self.review.id
+            self.host_headers = self.headers_for(self.host_id)
+            self.guest_headers = self.headers_for(self.guest_id)
+
+            # A fixed spread of existing campsites for the read scenarios
+            self.campsite_ids = [
+                row.id for row in Campsite.query.with_entities(Campsite.id).limit(200)
+            ]
+
+    def add_user(self, email, password=None):
+        user = User(name="Benchmark User", email=email, password_hash="unused")
+        if password:
+            user.set_password(password)
+        db.session.add(user)
+        db.session.flush()
+        return user
+
+    def headers_for(self, user_id):
+        return {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+
+    def pick_campsite(self, i):
+        return self.campsite_ids[i % len(self.campsite_ids)]
+
+    def far_future_stay(self):
+        """A two-night range on the benchmark campsite no other call uses"""
+        start = date.today() + timedelta(days=400 + 3 * next(self.sequence))
+        return start, start + timedelta(days=2)
+
+    def insert(self, row):
+        with self.app.app_context():
+            db.session.add(row)
+            db.session.commit()
+            return row.id
+
+
+class Scenario:
+    """One route, with a prepare() that builds each request untimed
+
+    prepare(data, i) returns (method, url, json body, headers) and may insert
+    whatever rows the request consumes, e.g. the booking a cancel targets.
+    """
+
+    def __init__(self, name, endpoint, prepare, ok=(200,)):
+        self.name = name
+        self.endpoint = endpoint
+        self.prepare = prepare
+        self.ok = ok
+
+
+def _register(data, i):
+    body = {
+        "name": "Bench User",
+        "email": f"bench-{uuid.uuid4().hex}@example.com",
+        "password": BENCHMARK_PASSWORD,
+    }
+    return "POST", "/api/register", body, {}
+
+
+def _login(data, i):
+    body = {"email": data.guest_email, "password": BENCHMARK_PASSWORD}
+    return "POST", "/api/login", body, {}
+
+
+def _create_campsite(data, i):
+    body = {
+        "title": f"Bench Site {i}",
+        "description": "Flat pitch with a fire ring.",
+        "price": 35,
+        "location": "Benchmark County, California",
+    }
+    return "POST", "/api/campsites", body, data.host_headers
+
+
+def _import_campsites(data, i):
+    body = [
+        {
+            "title": f"Bench Import {i}-{row}",
+            "description": "Pitch from a park operator's import.",
+            "price": 25 + row % 20,
+            "location": "Benchmark County, California",
+        }
+        for row in range(100)
+    ]
+    return "POST", "/api/campsites/bulk", body, data.host_headers
+
+
+def _update_campsites(data, i):
+    body = [{"id": data.campsite_id, "price": 40 + i % 10, "title": f"Site {i}"}]
+    return "PATCH", "/api/campsites/bulk", body, data.host_headers
+
+
+def _update_campsite(data, i):
+    body = {"price": 40 + i % 10}
+    return "PUT", f"/api/campsites/{data.campsite_id}", body, data.host_headers
+
+
+def _delete_campsite(data, i):
+    campsite_id = data.insert(
+        Campsite(
+            title="Disposable Site",
+            description="Deleted by the benchmark.",
+            price=10.0,
+            location="Benchmark County, California",
+            host_id=data.host_id,
+            image_url="",
+        )
+    )
+    return "DELETE", f"/api/campsites/{campsite_id}", None, data.host_headers
+
+
+def _create_booking(data, i):
+    start, end = data.far_future_stay()
+    body = {
+        "campsite_id": data.campsite_id,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }
+    return "POST", "/api/bookings", body, data.guest_headers
+
+
+def _create_booking_batch(data, i):
+    # A group trip: five campsites on one far-future stay
+    start, end = data.far_future_stay()
+    body = {
+        "bookings": [
+            {
+                "campsite_id": data.pick_campsite(i + offset),
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat(),
+            }
+            for offset in range(5)
+        ]
+    }
+    return "POST", "/api/bookings/batch", body, data.guest_headers
+
+
+def _insert_future_booking(data, status="confirmed"):
+    start, end = data.far_future_stay()
+    return data.insert(
+        Booking(
+            user_id=data.guest_id,
+            campsite_id=data.campsite_id,
+            start_date=start,
+            end_date=end,
+            total_price=80.0,
+            status=status,
+        )
+    )
+
+
+def _cancel_booking(data, i):
+    booking_id = _insert_future_booking(data)
+    return "PUT", f"/api/bookings/{booking_id}/cancel", None, data.guest_headers
+
+
+def _pay(data, i):
+    body = {"booking_id": _insert_future_booking(data)}
+    return "POST", "/api/pay", body, {}
+
+
+def _create_review(data, i):
+    # Each review needs a fresh guest with a paid stay
+    with data.app.app_context():
+        user = data.add_user(f"bench-reviewer-{uuid.uuid4().hex}@example.com")
+        db.session.add(
+            Booking(
+                user_id=user.id,
+                campsite_id=data.campsite_id,
+                start_date=date.today() - timedelta(days=10),
+                end_date=date.today() - timedelta(days=8),
+                total_price=80.0,
+                status="paid",
+            )
+        )
+        db.session.commit()
+        headers = data.headers_for(user.id)
+    body = {"campsite_id": data.campsite_id, "rating": 5, "comment": "Great"}
+    return "POST", "/api/reviews", body, headers
+
+
+def _update_review(data, i):
+    body = {"rating": 1 + i % 5}
+    return "PUT", f"/api/reviews/{data.review_id}", body, data.guest_headers
+
+
+def _delete_review(data, i):
+    review_id = data.insert(
+        Review(user_id=data.guest_id, campsite_id=data.campsite_id, rating=3)
+    )
+    return "DELETE", f"/api/reviews/{review_id}", None, data.guest_headers
+
+
+def _stay_query(data, i):
+    start = date.today() + timedelta(days=7 + i % 60)
+    end = start + timedelta(days=2 + i % 5)
+    return f"start_date={start.isoformat()}&end_date={end.isoformat()}"
+
+
+def _near_query(data, i):
+    latitude, longitude = GEO_POINTS[i % len(GEO_POINTS)]
+    radius_km = (10, 50, 200)[i % 3]
+    return f"near={latitude},{longitude}&radius_km={radius_km}&limit=20"
+
+
+def _bbox_query(data, i):
+    # A map viewport panning and zooming around a point
+    latitude, longitude = GEO_POINTS[i % len(GEO_POINTS)]
+    half = (0.25, 1.0, 4.0)[i % 3]
+    latitude += (i % 7 - 3) * half / 4
+    return (
+        f"bbox={longitude - half},{latitude - half},"
+        f"{longitude + half},{latitude + half}&limit=50"
+    )
+
+
+def _create_pricing_rule(data, i):
+    start = date.today() + timedelta(days=30 + i % 200)
+    body = {
+        "kind": "season",
+        "multiplier": 1.25,
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=7)).isoformat(),
+    }
+    url = f"/api/campsites/{data.campsite_id}/pricing-rules"
+    return "POST", url, body, data.host_headers
+
+
+def _delete_pricing_rule(data, i):
+    rule_id = data.insert(
+        PricingRule(campsite_id=data.campsite_id, kind="weekend", multiplier=1.1)
+    )
+    url = f"/api/campsites/{data.campsite_id}/pricing-rules/{rule_id}"
+    return "DELETE", url, None, data.host_headers
+
+
+def _blackout_body(i):
+    # Two weeks of weekends inside the year, clear of far_future_stay
+    start = date.today() + timedelta(days=30 + i % 300)
+    return {
+        "recurring": [
+            {
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=14)).isoformat(),
+                "weekdays": [5, 6],
+            }
+        ]
+    }
+
+
+def _create_blackouts(data, i):
+    url = f"/api/campsites/{data.campsite_id}/blackouts"
+    return "POST", url, _blackout_body(i), data.host_headers
+
+
+def _delete_blackouts(data, i):
+    url = f"/api/campsites/{data.campsite_id}/blackouts"
+    return "DELETE", url, _blackout_body(i), data.host_headers
+
+
+def _join_waitlist(data, i):
+    # Joining needs a booked-out stay, so book one first
+    start, end = data.far_future_stay()
+    data.insert(
+        Booking(
+            user_id=data.host_id,
+            campsite_id=data.campsite_id,
+            start_date=start,
+            end_date=end,
+            total_price=80.0,
+            status="confirmed",
+        )
+    )
+    body = {
+        "campsite_id": data.campsite_id,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+    }
+    return "POST", "/api/waitlist", body, data.guest_headers
+
+
+def _insert_waitlist_entry(data, status="waiting"):
+    start, end = data.far_future_stay()
+    return data.insert(
+        WaitlistEntry(
+            user_id=data.guest_id,
+            campsite_id=data.campsite_id,
+            start_date=start,
+            end_date=end,
+            status=status,
+            hold_expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+    )
+
+
+def _leave_waitlist(data, i):
+    entry_id = _insert_waitlist_entry(data)
+    return "DELETE", f"/api/waitlist/{entry_id}", None, data.guest_headers
+
+
+def _book_hold(data, i):
+    entry_id = _insert_waitlist_entry(data, status="offered")
+    return "POST", f"/api/waitlist/{entry_id}/book", None, data.guest_headers
+
+
+SCENARIOS = [
+    Scenario("POST /api/register", "auth.register", _register, ok=(201,)),
+    Scenario("POST /api/login", "auth.login", _login),
+    Scenario(
+        "GET /api/profile",
+        "auth.get_profile",
+        lambda data, i: ("GET", "/api/profile", None, data.guest_headers),
+    ),
+    Scenario(
+        "POST /api/campsites",
+        "campsites.create_campsite",
+        _create_campsite,
+        ok=(201,),
+    ),
+    Scenario(
+        "GET /api/campsites",
+        "campsites.get_campsites",
+        lambda data, i: ("GET", "/api/campsites", None, {}),
+    ),
+    Scenario(
+        "GET /api/campsites?location&max_price",
+        "campsites.get_campsites",
+        lambda data, i: (
+            "GET",
+            "/api/campsites?location=california&max_price=100",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites?sort&limit",
+        "campsites.get_campsites",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites?sort={SORT_ORDERS[i % len(SORT_ORDERS)]}&limit=20",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites?near&radius_km",
+        "campsites.get_campsites",
+        lambda data, i: ("GET", f"/api/campsites?{_near_query(data, i)}", None, {}),
+    ),
+    Scenario(
+        "GET /api/campsites?bbox",
+        "campsites.get_campsites",
+        lambda data, i: ("GET", f"/api/campsites?{_bbox_query(data, i)}", None, {}),
+    ),
+    Scenario(
+        "GET /api/campsites?start_date&end_date",
+        "campsites.get_campsites",
+        lambda data, i: ("GET", f"/api/campsites?{_stay_query(data, i)}", None, {}),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>",
+        "campsites.get_campsite",
+        lambda data, i: ("GET", f"/api/campsites/{data.pick_campsite(i)}", None, {}),
+    ),
+    Scenario(
+        "GET /api/campsites?fields&limit",
+        "campsites.get_campsites",
+        lambda data, i: (
+            "GET",
+            "/api/campsites?fields=title,price,average_rating&limit=20",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>?include",
+        "campsites.get_campsite",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.pick_campsite(i)}"
+            "?include=reviews:5,host,availability",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/similar",
+        "campsites.get_similar_campsites",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.pick_campsite(i)}/similar",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/forecast",
+        "campsites.get_campsite_forecast",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.campsite_id}/forecast",
+            None,
+            data.host_headers,
+        ),
+    ),
+    Scenario("PUT /api/campsites/<id>", "campsites.update_campsite", _update_campsite),
+    Scenario(
+        "POST /api/campsites/bulk",
+        "campsites.import_campsites_bulk",
+        _import_campsites,
+        ok=(201,),
+    ),
+    Scenario(
+        "PATCH /api/campsites/bulk",
+        "campsites.update_campsites_bulk",
+        _update_campsites,
+    ),
+    Scenario(
+        "DELETE /api/campsites/<id>", "campsites.delete_campsite", _delete_campsite
+    ),
+    Scenario(
+        "POST /api/bookings", "bookings.create_booking", _create_booking, ok=(201,)
+    ),
+    Scenario(
+        "POST /api/bookings/batch",
+        "bookings.create_booking_batch",
+        _create_booking_batch,
+        ok=(201,),
+    ),
+    Scenario(
+        "GET /api/bookings",
+        "bookings.get_user_bookings",
+        lambda data, i: ("GET", "/api/bookings", None, data.guest_headers),
+    ),
+    Scenario(
+        "GET /api/bookings?include_archived",
+        "bookings.get_user_bookings",
+        lambda data, i: (
+            "GET",
+            "/api/bookings?include_archived=true",
+            None,
+            data.guest_headers,
+        ),
+    ),
+    Scenario(
+        "GET /api/bookings/<id>",
+        "bookings.get_booking",
+        lambda data, i: (
+            "GET",
+            f"/api/bookings/{data.booking_id}",
+            None,
+            data.guest_headers,
+        ),
+    ),
+    Scenario(
+        "PUT /api/bookings/<id>/cancel", "bookings.cancel_booking", _cancel_booking
+    ),
+    # The simulated gateway declines a quarter of payments with a 400
+    Scenario("POST /api/pay", "bookings.simulate_payment", _pay, ok=(200, 400)),
+    Scenario("POST /api/reviews", "reviews.create_review", _create_review, ok=(201,)),
+    Scenario(
+        "GET /api/reviews/<campsite_id>",
+        "reviews.get_campsite_reviews",
+        lambda data, i: ("GET", f"/api/reviews/{data.pick_campsite(i)}", None, {}),
+    ),
+    Scenario("PUT /api/reviews/<id>", "reviews.update_review", _update_review),
+    Scenario("DELETE /api/reviews/<id>", "reviews.delete_review", _delete_review),
+    Scenario(
+        "GET /api/changes",
+        "changes.get_changes",
+        lambda data, i: ("GET", f"/api/changes?since={i}&limit=100", None, {}),
+    ),
+    Scenario(
+        "GET /api/locations/suggest",
+        "locations.suggest_locations",
+        lambda data, i: (
+            "GET",
+            "/api/locations/suggest?prefix="
+            + LOCATION_PREFIXES[i % len(LOCATION_PREFIXES)],
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/pricing-rules",
+        "pricing.get_pricing_rules",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.campsite_id}/pricing-rules",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "POST /api/campsites/<id>/pricing-rules",
+        "pricing.create_pricing_rule",
+        _create_pricing_rule,
+        ok=(201,),
+    ),
+    Scenario(
+        "DELETE /api/campsites/<id>/pricing-rules/<id>",
+        "pricing.delete_pricing_rule",
+        _delete_pricing_rule,
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/blackouts",
+        "availability.get_blackouts",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.campsite_id}/blackouts",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "POST /api/campsites/<id>/blackouts",
+        "availability.create_blackouts",
+        _create_blackouts,
+    ),
+    Scenario(
+        "DELETE /api/campsites/<id>/blackouts",
+        "availability.delete_blackouts",
+        _delete_blackouts,
+    ),
+    Scenario(
+        "GET /api/bookings/<id>/history",
+        "audit.get_booking_history",
+        lambda data, i: (
+            "GET",
+            f"/api/bookings/{data.booking_id}/history",
+            None,
+            data.guest_headers,
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/booking-history",
+        "audit.get_campsite_booking_history",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.campsite_id}/booking-history?limit=50",
+            None,
+            data.host_headers,
+        ),
+    ),
+    Scenario(
+        "GET /api/export/bookings?format=csv",
+        "export.export_bookings",
+        lambda data, i: (
+            "GET",
+            "/api/export/bookings?format=csv",
+            None,
+            data.host_headers,
+        ),
+    ),
+    Scenario(
+        "GET /api/export/bookings?format=ndjson",
+        "export.export_bookings",
+        lambda data, i: (
+            "GET",
+            "/api/export/bookings?format=ndjson&include_archived=true",
+            None,
+            data.host_headers,
+        ),
+    ),
+    Scenario("POST /api/waitlist", "waitlist.join_waitlist", _join_waitlist, ok=(201,)),
+    Scenario(
+        "GET /api/waitlist",
+        "waitlist.get_waitlist",
+        lambda data, i: ("GET", "/api/waitlist", None, data.guest_headers),
+    ),
+    Scenario("DELETE /api/waitlist/<id>", "waitlist.leave_waitlist", _leave_waitlist),
+    Scenario(
+        "POST /api/waitlist/<id>/book",
+        "waitlist.book_hold",
+        _book_hold,
+        ok=(201,),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/availability",
+        "availability.get_availability",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.pick_campsite(i)}/availability",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites?start_date&end_date&available",
+        "campsites.get_campsites",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites?{_stay_query(data, i)}&available=true&limit=20",
+            None,
+            {},
+        ),
+    ),
+    Scenario(
+        "GET /api/campsites/<id>/quote",
+        "pricing.get_quote",
+        lambda data, i: (
+            "GET",
+            f"/api/campsites/{data.pick_campsite(i)}/quote?{_stay_query(data, i)}",
+            None,
+            {},
+        ),
+    ),
+]
+
+
+class InProcessClient:
+    """Sends requests through Flask's test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def send(self, method, url, body, headers):
+        response = self.client.open(url, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    """Sends requests over a keep-alive session to a local server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.session = requests.Session()
+
+    def send(self, method, url, body, headers):
+        response = self.session.request(
+            method, self.base_url + url, json=body, headers=headers
+        )
+        response.content
+        return response.status_code
+
+
+def start_local_server(app):
+    """Serve the app on a random localhost port from a daemon thread"""
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, wall_time):
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "throughput_rps": round(count / wall_time, 2) if wall_time else 0.0,
+    }
+
+
+def run_scenario(scenario, data, make_client, total, concurrency, warmup=0):
+    """Send `total` requests for one scenario across `concurrency` threads"""
+    # Requests (and any rows they consume) are built before the clock starts
+    specs = [scenario.prepare(data, i) for i in range(warmup + total)]
+    client = make_client()
+    for method, url, body, headers in specs[:warmup]:
+        client.send(method, url, body, headers)
+
+    pending = iter(specs[warmup:])
+    pending_lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    results_lock = threading.Lock()
+
+    def worker():
+        worker_client = make_client()
+        local_latencies = []
+        local_errors = 0
+        while True:
+            with pending_lock:
+                spec = next(pending, None)
+            if spec is None:
+                break
+            method, url, body, headers = spec
+            started = time.perf_counter()
+            try:
+                status = worker_client.send(method, url, body, headers)
+            except Exception:
+                status = None
+            local_latencies.append(time.perf_counter() - started)
+            if status not in scenario.ok:
+                local_errors += 1
+        with results_lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    return summarize(latencies, errors[0], wall_time)
+
+
+def uncovered_endpoints(app, scenarios=SCENARIOS):
+    """Blueprint routes with no scenario driving them"""
+    routed = {
+        rule.endpoint
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint.split(".")[0] in BLUEPRINTS
+    }
+    return sorted(routed - {scenario.endpoint for scenario in scenarios})
+
+
+def run_benchmark(
+    app,
+    requests_per_endpoint=200,
+    concurrency=8,
+    target="inprocess",
+    only=None,
+    warmup=10,
+    scenarios=SCENARIOS,
+):
+    """Run the selected scenarios against app and return the results document"""
+    data = BenchData(app)
+    server = None
+    if target == "http":
+        server, base_url = start_local_server(app)
+
+        def make_client():
+            return HttpClient(base_url)
+
+    else:
+
+        def make_client():
+            return InProcessClient(app)
+
+    selected = [s for s in scenarios if not only or any(o in s.name for o in only)]
+    endpoints = {}
+    try:
+        for scenario in selected:
+            endpoints[scenario.name] = run_scenario(
+                scenario, data, make_client, requests_per_endpoint, concurrency, warmup
+            )
+            print(_format_row(scenario.name, endpoints[scenario.name]))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "target": target,
+            "concurrency": concurrency,
+            "requests_per_endpoint": requests_per_endpoint,
+            "database": app.config["SQLALCHEMY_DATABASE_URI"],
+            "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def measure_cold_start(database, path="/api/campsites", runs=10):
+    """Time fresh worker processes from launch to their second request
+
+    Returns results in the same shape as run_benchmark, with one pseudo
+    endpoint per phase ("coldstart import", "coldstart first_request", ...)
+    so two runs can be checked with compare.
+    """
+    app = create_app({"SQLALCHEMY_DATABASE_URI": database})
+    with app.app_context():
+        db.create_all()
+
+    samples = {phase: [] for phase in COLDSTART_PHASES}
+    errors = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", COLDSTART_SCRIPT, database, path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples["process"].append(time.perf_counter() - started)
+        timings = json.loads(output.strip().splitlines()[-1])
+        errors += timings.pop("status") != 200
+        for phase, seconds in timings.items():
+            samples[phase].append(seconds)
+
+    endpoints = {}
+    for phase, latencies in samples.items():
+        name = f"coldstart {phase}"
+        endpoints[name] = summarize(latencies, errors, 0)
+        print(_format_row(name, endpoints[name]))
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "target": "coldstart",
+            "path": path,
+            "runs": runs,
+            "database": database,
+            "python": platform.python_version(),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def _format_row(name, stats):
+    return (
+        f"{name:<40} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+        f"p99 {stats['p99_ms']:>9.2f}ms  {stats['throughput_rps']:>9.1f} req/s"
+        + (f"  {stats['errors']} errors" if stats["errors"] else "")
+    )
+
+
+def compare_results(baseline, current, endpoints=None, metric="p95_ms", threshold=0.1):
+    """Relative change per endpoint; returns (rows, regressed endpoint names)
+
+    Latency metrics regress when they grow, throughput when it shrinks.
+    """
+    rows = []
+    regressed = []
+    names = endpoints or sorted(set(baseline["endpoints"]) & set(current["endpoints"]))
+    for name in names:
+        if name not in baseline["endpoints"] or name not in current["endpoints"]:
+            raise KeyError(f"Endpoint {name!r} missing from one of the results")
+        before = baseline["endpoints"][name][metric]
+        after = current["endpoints"][name][metric]
+        change = (after - before) / before if before else 0.0
+        worse = -change if metric == "throughput_rps" else change
+        if worse > threshold:
+            regressed.append(name)
+        rows.append((name, before, after, change))
+    return rows, regressed
+
+
+def _run_command(args):
+    config = {"SQLALCHEMY_DATABASE_URI": args.database}
+    if not args.skip_load:
+        seed_database(
+            counts={name: getattr(args, name) for name in BENCHMARK_COUNTS},
+            seed=args.seed,
+            config=config,
+        )
+    app = create_app(config)
+
+    missing = uncovered_endpoints(app)
+    if missing:
+        print(f"Warning: no benchmark scenario for {', '.join(missing)}")
+
+    results = run_benchmark(
+        app,
+        requests_per_endpoint=args.requests,
+        concurrency=args.concurrency,
+        target=args.target,
+        only=args.only,
+        warmup=args.warmup,
+    )
+    results["meta"]["dataset"] = {
+        name: getattr(args, name) for name in BENCHMARK_COUNTS
+    }
+    results["meta"]["seed"] = args.seed
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def _coldstart_command(args):
+    results = measure_cold_start(args.database, args.path, args.runs)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def _compare_command(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows, regressed = compare_results(
+        baseline, current, args.endpoint, args.metric, args.threshold
+    )
+    print(f"{'endpoint':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, before, after, change in rows:
+        flag = "  REGRESSED" if name in regressed else ""
+        print(f"{name:<40} {before:>10.2f} {after:>10.2f} {change:>+8.1%}{flag}")
+
+    if regressed:
+        print(
+            f"{len(regressed)} endpoint(s) regressed {args.metric} by more than "
+            f"{args.threshold:.0%}"
+        )
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Camping API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="benchmark every route")
+    run.add_argument("--database", default=BENCHMARK_DATABASE_URI)
+    run.add_argument("--skip-load", action="store_true", help="reuse the database")
+    for name, default in BENCHMARK_COUNTS.items():
+        run.add_argument(f"--{name}", type=int, default=default)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--requests", type=int, default=200, help="per endpoint")
+    run.add_argument("--concurrency", type=int, default=8)
+    run.add_argument("--warmup", type=int, default=10)
+    run.add_argument("--target", choices=("inprocess", "http"), default="inprocess")
+    run.add_argument(
+        "--only", action="append", help="run scenarios whose name contains this"
+    )
+    run.add_argument("--output", default="benchmark-results.json")
+
+    coldstart = commands.add_parser(
+        "coldstart", help="time worker boot and the first request"
+    )
+    coldstart.add_argument("--database", default=BENCHMARK_DATABASE_URI)
+    coldstart.add_argument("--path", default="/api/campsites")
+    coldstart.add_argument("--runs", type=int, default=10)
+    coldstart.add_argument("--output", default="coldstart-results.json")
+
+    compare = commands.add_parser("compare", help="compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--endpoint", action="append", help="endpoint to check (default: all)"
+    )
+    compare.add_argument("--metric", choices=METRICS, default="p95_ms")
+    compare.add_argument(
+        "--threshold", type=float, default=0.1, help="allowed relative regression"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "run":
+        sys.exit(_run_command(args))
+    if args.command == "coldstart":
+        sys.exit(_coldstart_command(args))
+    sys.exit(_compare_command(args))
@@ -0,0 +1,244 @@
+"""
+Campsite validation, and bulk import and update for large hosts
+
+create_campsite and update_campsite validate through campsite_values and
+campsite_changes, and so do the bulk routes, so a row in a bulk request
+passes or fails exactly as the same object sent on its own would.
+
+Bulk requests take a JSON array, or NDJSON (one object per line) read
+line by line as the body streams in. Valid rows are written
+BULK_CHUNK_SIZE at a time and each chunk is committed on its own; invalid
+rows are skipped and reported by their position in the input. A chunk
+that fails to write is rolled back and reported as the range of input
+positions it held, and the chunks after it are still written. New
+campsites go in with one bulk INSERT per chunk, returning their ids in
+row order, which bypasses the ORM flush, so their change events are
+recorded here. Updates load a chunk's campsites with one query and flush
+them together, so the usual flush listeners (change log, stats) see
+them, and only campsites that have a price calendar are repriced.
+"""
+
+from flask import current_app
+from sqlalchemy import insert
+
+from change_log import record_bulk_changes
+from geo import parse_coordinates
+from models import db, Campsite
+from pricing import priced_campsites, reprice_calendar
+
+REQUIRED_FIELDS = ("title", "description", "price", "location")
+TEXT_FIELDS = ("title", "description", "location", "image_url")
+
+BULK_CHUNK_SIZE = 1000
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson")
+
+
+def _text(data, field):
+    value = data[field]
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value.strip()
+
+
+def _price(raw):
+    try:
+        price = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid price format")
+    if price <= 0:
+        raise ValueError("Price must be greater than 0")
+    return price
+
+
+def campsite_values(data, host_id):
+    """Column values for a new campsite, raising ValueError"""
+    if not isinstance(data, dict) or not all(k in data for k in REQUIRED_FIELDS):
+        raise ValueError("Title, description, price, and location are required")
+
+    values = {field: _text(data, field) for field in TEXT_FIELDS if field in data}
+    values.setdefault("image_url", "")
+    values["price"] = _price(data["price"])
+    values["latitude"], values["longitude"], values["geo_band"] = parse_coordinates(
+        data.get("latitude"), data.get("longitude")
+    )
+    values["host_id"] = host_id
+    return values
+
+
+def campsite_changes(data):
+    """Attribute changes an update asks for, raising ValueError"""
+    changes = {field: _text(data, field) for field in TEXT_FIELDS if field in data}
+    if "price" in data:
+        changes["price"] = _price(data["price"])
+    if "latitude" in data or "longitude" in data:
+        position = parse_coordinates(data.get("latitude"), data.get("longitude"))
+        changes["latitude"], changes["longitude"], changes["geo_band"] = position
+    return changes
+
+
+def apply_changes(campsite, changes):
+    """Set changes on campsite, returning whether its price moved"""
+    repriced = "price" in changes and changes["price"] != campsite.price
+    for name, value in changes.items():
+        setattr(campsite, name, value)
+    return repriced
+
+
+def read_rows(request):
+    """(index, object) pairs from a JSON array or NDJSON request body
+
+    Raises ValueError if the body is neither. An NDJSON line that is not
+    valid JSON comes through with a ValueError in place of its object.
+    Blank NDJSON lines are skipped and not counted.
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        return _ndjson_rows(request.stream)
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        raise ValueError("Body must be a JSON array or NDJSON")
+    return enumerate(rows)
+
+
+def _ndjson_rows(stream):
+    index = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield index, current_app.json.loads(line)
+        except ValueError:
+            yield index, ValueError("Invalid JSON")
+        index += 1
+
+
+class BulkResult:
+    """Ids written and per-row errors of a bulk request"""
+
+    def __init__(self):
+        self.ids = []
+        self.errors = []
+        # Whether a chunk failed to write, as opposed to rows being invalid
+        self.write_failed = False
+
+    def fail(self, index, error):
+        self.errors.append({"index": index, "error": str(error)})
+
+    def status(self, success):
+        """success if anything was written, else 500 or 400 for bad rows"""
+        if self.ids:
+            return success
+        return 500 if self.write_failed else 400
+
+    def write(self, chunk, writer, *args):
+        """writer(chunk, *args, self), rolling back and reporting a failure
+
+        chunk is a list of rows whose first item is their input index.
+        """
+        try:
+            writer(chunk, *args, self)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Bulk campsite chunk failed")
+            self.write_failed = True
+            self.errors.append(
+                {
+                    "index": chunk[0][0],
+                    "end_index": chunk[-1][0],
+                    "error": "Failed to write rows",
+                }
+            )
+
+
+def import_campsites(rows, host_id):
+    """Insert every valid row as a campsite of host_id, in chunks"""
+    result = BulkResult()
+    chunk = []
+    for index, data in rows:
+        try:
+            if isinstance(data, ValueError):
+                raise data
+            chunk.append((index, campsite_values(data, host_id)))
+        except ValueError as e:
+            result.fail(index, e)
+            continue
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            result.write(chunk, _insert_chunk)
+            chunk = []
+    if chunk:
+        result.write(chunk, _insert_chunk)
+    return result
+
+
+def _insert_chunk(chunk, result):
+    statement = insert(Campsite).returning(Campsite.id, sort_by_parameter_order=True)
+    ids = db.session.scalars(statement, [values for _, values in chunk]).all()
+    record_bulk_changes(db.session.connection(), Campsite, ids, "create")
+    db.session.commit()
+    result.ids.extend(ids)
+
+
+def update_campsites(rows, host_id):
+    """Apply every valid row to the host_id campsite it names, in chunks
+
+    A campsite may be named by one row only; later rows naming it again
+    are reported as errors.
+    """
+    result = BulkResult()
+    chunk = []
+    seen = set()
+    for index, data in rows:
+        try:
+            if isinstance(data, ValueError):
+                raise data
+            campsite_id = data.get("id") if isinstance(data, dict) else None
+            # bool is a subclass of int, but true is not campsite 1
+            if not isinstance(campsite_id, int) or isinstance(campsite_id, bool):
+                raise ValueError("Campsite id is required")
+            if campsite_id in seen:
+                raise ValueError("Campsite id appears more than once")
+            changes = campsite_changes(data)
+            if not changes:
+                raise ValueError("No data provided")
+        except ValueError as e:
+            result.fail(index, e)
+            continue
+        seen.add(campsite_id)
+        chunk.append((index, campsite_id, changes))
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            result.write(chunk, _update_chunk, host_id)
+            chunk = []
+    if chunk:
+        result.write(chunk, _update_chunk, host_id)
+    return result
+
+
+def _update_chunk(chunk, host_id, result):
+    ids = {campsite_id for _, campsite_id, _ in chunk}
+    campsites = {
+        campsite.id: campsite
+        for campsite in Campsite.query.filter(Campsite.id.in_(sorted(ids)))
+    }
+
+    repriced = {}
+    updated = []
+    errors = []
+    for index, campsite_id, changes in chunk:
+        campsite = campsites.get(campsite_id)
+        if campsite is None:
+            errors.append((index, "Campsite not found"))
+        elif campsite.host_id != host_id:
+            errors.append((index, "Only the host can update this campsite"))
+        else:
+            if apply_changes(campsite, changes):
+                repriced[campsite_id] = campsite
+            updated.append(campsite_id)
+
+    if repriced:
+        for campsite_id in sorted(priced_campsites(repriced)):
+            reprice_calendar(repriced[campsite_id])
+    db.session.commit()
+    # Reported once committed, so a failed chunk is only its range
+    result.ids.extend(updated)
+    for index, error in errors:
+        result.fail(index, error)
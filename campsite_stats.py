@@ -0,0 +1,97 @@
+"""
+Stored review and booking aggregates on campsites
+
+Campsite.average_rating, review_count and booking_count back the rating
+and popularity sorts, so they have to be columns the database can index
+rather than values computed from each campsite's reviews. Every ORM flush
+that adds, changes or removes a review or booking recomputes the
+aggregates of the campsites involved with one UPDATE, in the same
+transaction. Bulk loads that bypass the ORM call refresh_campsite_stats
+themselves.
+"""
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session, attributes
+
+from models import db, ArchivedBooking, Campsite, Booking, Review
+
+STAT_COLUMNS = ("average_rating", "review_count", "booking_count")
+
+# Bookings that count towards popularity
+POPULAR_STATUSES = ("confirmed", "paid")
+
+# Attributes whose change moves a row's contribution to the aggregates
+_WATCHED = {Review: ("campsite_id", "rating"), Booking: ("campsite_id", "status")}
+
+
+def refresh_campsite_stats(connection, campsite_ids=None):
+    """Recompute stored aggregates for campsite_ids, or every campsite"""
+    statement = update(Campsite).values(
+        average_rating=select(func.coalesce(func.avg(Review.rating), 0))
+        .where(Review.campsite_id == Campsite.id)
+        .scalar_subquery(),
+        review_count=select(func.count(Review.id))
+        .where(Review.campsite_id == Campsite.id)
+        .scalar_subquery(),
+        # Archived bookings (archive.py) still count towards popularity
+        booking_count=select(func.count(Booking.id))
+        .where(
+            Booking.campsite_id == Campsite.id,
+            Booking.status.in_(POPULAR_STATUSES),
+        )
+        .scalar_subquery()
+        + select(func.count(ArchivedBooking.id))
+        .where(
+            ArchivedBooking.campsite_id == Campsite.id,
+            ArchivedBooking.status.in_(POPULAR_STATUSES),
+        )
+        .scalar_subquery(),
+    )
+    if campsite_ids is not None:
+        statement = statement.where(Campsite.id.in_(sorted(campsite_ids)))
+    connection.execute(statement)
+
+
+def _touched_campsites(session):
+    campsite_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        watched = _WATCHED.get(type(obj))
+        if watched is None:
+            continue
+        for name in watched:
+            history = attributes.get_history(obj, name)
+            if obj in session.new or obj in session.deleted or history.has_changes():
+                campsite_ids.add(obj.campsite_id)
+                # A row moved between campsites changes the old one too
+                campsite_ids.update(
+                    value
+                    for value in attributes.get_history(obj, "campsite_id").deleted
+                    if value is not None
+                )
+                break
+    return campsite_ids
+
+
+def _refresh_after_flush(session, flush_context):
+    campsite_ids = _touched_campsites(session)
+    if not campsite_ids:
+        return
+
+    refresh_campsite_stats(session.connection(), campsite_ids)
+
+    # The UPDATE bypassed the identity map, so reload loaded campsites
+    for obj in session.identity_map.values():
+        if isinstance(obj, Campsite) and obj.id in campsite_ids:
+            session.expire(obj, STAT_COLUMNS)
+
+
+def init_campsite_stats(app):
+    """Keep campsite aggregates in step with every flush"""
+    if not event.contains(Session, "after_flush", _refresh_after_flush):
+        event.listen(Session, "after_flush", _refresh_after_flush)
+
+    @app.cli.command("refresh-stats")
+    def refresh_stats():
+        """Recompute rating and booking aggregates for every campsite"""
+        refresh_campsite_stats(db.session.connection())
+        db.session.commit()
@@ -0,0 +1,166 @@
+"""
+Incremental change feed for campsites, bookings and reviews
+
+Every ORM flush that creates, updates or deletes one of the tracked models
+appends a ChangeEvent row on the same connection, so the event commits or
+rolls back together with the write itself. Consumers page through events
+with GET /api/changes?since=<cursor>.
+
+Old events are compacted in the background: once past the retention
+window, an event is dropped if a newer event exists for the same row.
+Consumers resuming from an old cursor still see the latest change of every
+row, just not each intermediate update.
+"""
+
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+
+from sqlalchemy import event, exists
+from sqlalchemy.orm import Session, aliased
+
+from models import db, Campsite, Booking, Review, ChangeEvent
+
+TRACKED_MODELS = (Campsite, Booking, Review)
+
+DEFAULT_RETENTION_DAYS = 7
+DEFAULT_COMPACT_INTERVAL = 3600
+COMPACT_BATCH_SIZE = 1000
+
+
+def _events_for(session):
+    rows = []
+    now = datetime.utcnow()
+    for action, objects in (
+        ("create", session.new),
+        ("update", session.dirty),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            if not isinstance(obj, TRACKED_MODELS):
+                continue
+            if action == "update" and not session.is_modified(
+                obj, include_collections=False
+            ):
+                continue
+            rows.append(
+                {
+                    "entity": obj.__tablename__,
+                    "entity_id": obj.id,
+                    "action": action,
+                    "created_at": now,
+                }
+            )
+    return rows
+
+
+def _record_changes(session, flush_context):
+    # Runs after the flush statements (so new rows have ids) but before the
+    # commit, on the same connection and therefore in the same transaction
+    rows = _events_for(session)
+    if rows:
+        rows.sort(key=lambda row: (row["entity"], row["entity_id"]))
+        session.connection().execute(ChangeEvent.__table__.insert(), rows)
+
+
+def record_bulk_changes(connection, model, ids, action):
+    """Record events for rows written by bulk statements, which skip flushes"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "entity": model.__tablename__,
+            "entity_id": entity_id,
+            "action": action,
+            "created_at": now,
+        }
+        for entity_id in sorted(ids)
+    ]
+    if rows:
+        connection.execute(ChangeEvent.__table__.insert(), rows)
+
+
+def compact_change_log(retention=timedelta(days=DEFAULT_RETENTION_DAYS)):
+    """Delete superseded events older than retention, in small batches
+
+    Returns the number of events removed. Needs an app context.
+    """
+    cutoff = datetime.utcnow() - retention
+    newer = aliased(ChangeEvent)
+    superseded = exists().where(
+        newer.entity == ChangeEvent.entity,
+        newer.entity_id == ChangeEvent.entity_id,
+        newer.id > ChangeEvent.id,
+    )
+
+    removed = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.session.query(ChangeEvent.id)
+            .filter(ChangeEvent.created_at < cutoff, superseded)
+            .order_by(ChangeEvent.id)
+            .limit(COMPACT_BATCH_SIZE)
+        ]
+        if not ids:
+            return removed
+        ChangeEvent.query.filter(ChangeEvent.id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+        removed += len(ids)
+
+
+class ChangeLogCompactor(Thread):
+    """Daemon thread running compact_change_log every interval seconds"""
+
+    def __init__(self, app, interval, retention):
+        super().__init__(name="change-log-compactor", daemon=True)
+        self.app = app
+        self.interval = interval
+        self.retention = retention
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    compact_change_log(self.retention)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Change log compaction failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def init_change_log(app):
+    """Record changes on every flush and compact the log in the background"""
+    app.config.setdefault("CHANGE_LOG_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+    app.config.setdefault("CHANGE_LOG_COMPACT_INTERVAL", DEFAULT_COMPACT_INTERVAL)
+
+    if not event.contains(Session, "after_flush", _record_changes):
+        event.listen(Session, "after_flush", _record_changes)
+
+    retention = timedelta(days=app.config["CHANGE_LOG_RETENTION_DAYS"])
+    interval = app.config["CHANGE_LOG_COMPACT_INTERVAL"]
+
+    @app.cli.command("compact-changes")
+    def compact_changes():
+        """Remove superseded change events past the retention window"""
+        print(f"Removed {compact_change_log(retention)} change events")
+
+    if not interval:
+        return
+
+    # Started by the first request so building an app never spawns threads
+    start_lock = Lock()
+
+    def start_compactor():
+        if "change_log_compactor" in app.extensions:
+            return
+        with start_lock:
+            if "change_log_compactor" not in app.extensions:
+                compactor = ChangeLogCompactor(app, interval, retention)
+                app.extensions["change_log_compactor"] = compactor
+                compactor.start()
+
+    app.before_request(start_compactor)
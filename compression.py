@@ -0,0 +1,173 @@
+"""
+Response compression negotiated by size and content type
+
+Compresses responses with gzip or deflate according to Accept-Encoding.
+Buffered responses are compressed only above COMPRESS_MIN_SIZE, get an
+ETag and answer If-None-Match with 304. Their compressed bodies are kept
+in a byte-bounded LRU keyed by ETag and encoding, so repeated payloads
+are not recompressed. Streamed responses are compressed chunk by chunk
+with a single compressor.
+"""
+
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+import zlib
+
+from flask import current_app, request
+
+from metrics import record_cache
+
+# zlib window bits selecting the container for each content coding
+ENCODINGS = {"gzip": 31, "deflate": 15}
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+)
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def is_compressible(mimetype):
+    return mimetype is not None and (
+        mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+    )
+
+
+def compress(body, encoding, level=DEFAULT_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODINGS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level=DEFAULT_LEVEL):
+    """Compress an iterable of chunks with one compressor for the whole body
+
+    Each chunk is sync-flushed so clients can decode it as soon as it
+    arrives rather than waiting for the end of the stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODINGS[encoding])
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def _compress_response(response):
+    config = current_app.config
+    if (
+        response.direct_passthrough
+        or "Content-Encoding" in response.headers
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or not is_compressible(response.mimetype)
+        or "no-transform" in response.headers.get("Cache-Control", "")
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(list(ENCODINGS))
+    level = config["COMPRESS_LEVEL"]
+
+    if response.is_streamed:
+        # Length is unknown up front, so streams are always compressed
+        if encoding:
+            response.response = compress_stream(response.response, encoding, level)
+            response.headers["Content-Encoding"] = encoding
+            response.headers.pop("Content-Length", None)
+        return response
+
+    body = response.get_data()
+    conditional = request.method in ("GET", "HEAD") and response.status_code == 200
+    if conditional and not response.get_etag()[0]:
+        response.set_etag(sha1(body).hexdigest())
+    etag, weak = response.get_etag()
+
+    if not encoding or len(body) < config["COMPRESS_MIN_SIZE"]:
+        if conditional:
+            response.make_conditional(request)
+        return response
+
+    # Each encoding is a separate representation with its own validator
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    if conditional:
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    cache = current_app.extensions["compression"]
+    compressed = cache.get((etag, encoding)) if etag else None
+    if etag:
+        record_cache("compressed_body", compressed is not None)
+    if compressed is None:
+        compressed = compress(body, encoding, level)
+        if etag:
+            cache.put((etag, encoding), compressed)
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    """Compress responses from app according to Accept-Encoding"""
+    app.config.setdefault("COMPRESS_ENABLED", True)
+    app.config.setdefault("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)
+    app.config.setdefault("COMPRESS_LEVEL", DEFAULT_LEVEL)
+    app.config.setdefault("COMPRESS_CACHE_BYTES", DEFAULT_CACHE_BYTES)
+    if not app.config["COMPRESS_ENABLED"]:
+        return
+
+    app.extensions["compression"] = CompressedBodyCache(
+        app.config["COMPRESS_CACHE_BYTES"]
+    )
+    app.after_request(_compress_response)
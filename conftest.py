@@ -0,0 +1,220 @@
+"""
+Shared fixtures for the in-process test suite
+
+These run the app through Flask's test client against an in-memory SQLite
+database, so no server or seed data is needed. The live-server tests in
+test_pytest.py and test_api.py do not use them.
+"""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from geo import band_of
+from models import db, User, Campsite, Booking, Review
+
+TEST_CONFIG = {
+    "TESTING": True,
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "JWT_SECRET_KEY": "test-jwt-secret-key-with-enough-bytes",
+    "METRICS_ENABLED": False,
+    "CHANGE_LOG_COMPACT_INTERVAL": 0,
+    "LOCATION_REFRESH_SECONDS": 0,
+    "WAITLIST_MATCH_INTERVAL": 0,
+    "OUTBOX_POLL_INTERVAL": 0,
+    "BOOKING_ARCHIVE_INTERVAL": 0,
+    "FORECAST_REFRESH_HOUR": None,
+}
+
+# First night of the stays tests book, far enough ahead to be bookable
+STAY_START = date.today() + timedelta(days=10)
+
+
+class QueryCounter:
+    """Collects every SQL statement executed while attached to an engine"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TEST_CONFIG)
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two apps on one database file, standing in for two worker processes"""
+    config = {**TEST_CONFIG, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/w.db"}
+    first, second = create_app(config), create_app(config)
+    with first.app_context():
+        db.create_all()
+    yield first, second
+    with first.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """Context manager counting SQL statements issued inside the block"""
+
+    @contextmanager
+    def counter():
+        with app.app_context():
+            engine = db.engine
+        queries = QueryCounter()
+        event.listen(engine, "before_cursor_execute", queries)
+        try:
+            yield queries
+        finally:
+            event.remove(engine, "before_cursor_execute", queries)
+
+    return counter
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Build an Authorization header for a user id"""
+
+    def make_headers(user_id):
+        with app.app_context():
+            token = create_access_token(identity=user_id)
+        return {"Authorization": f"Bearer {token}"}
+
+    return make_headers
+
+
+@pytest.fixture
+def seed(app):
+    """Insert users, campsites, bookings and reviews in one go
+
+    Returns the ids created so tests can address them. Passwords are not
+    hashed since the tests authenticate with tokens.
+    """
+
+    def seed_rows(
+        users=2, campsites=1, bookings_per_campsite=0, reviews_per_campsite=0
+    ):
+        with app.app_context():
+            start = db.session.query(db.func.count(User.id)).scalar()
+            user_rows = [
+                User(
+                    name=f"User {start + i}",
+                    email=f"user{start + i}@example.com",
+                    password_hash="unused",
+                )
+                for i in range(users)
+            ]
+            db.session.add_all(user_rows)
+            db.session.flush()
+
+            campsite_rows = [
+                Campsite(
+                    title=f"Campsite {i}",
+                    description="A quiet spot by the river.",
+                    price=20.0 + i,
+                    location="Yosemite, California",
+                    host_id=user_rows[i % len(user_rows)].id,
+                    image_url="",
+                    latitude=37.75 + i / 100,
+                    longitude=-119.59,
+                    geo_band=band_of(37.75 + i / 100),
+                )
+                for i in range(campsites)
+            ]
+            db.session.add_all(campsite_rows)
+            db.session.flush()
+
+            guests = user_rows[1:] or user_rows
+            first_night = date.today() + timedelta(days=30)
+            booking_rows = []
+            for campsite in campsite_rows:
+                for i in range(bookings_per_campsite):
+                    start_date = first_night + timedelta(days=3 * i)
+                    booking_rows.append(
+                        Booking(
+                            user_id=guests[i % len(guests)].id,
+                            campsite_id=campsite.id,
+                            start_date=start_date,
+                            end_date=start_date + timedelta(days=2),
+                            total_price=2 * campsite.price,
+                            status="paid",
+                        )
+                    )
+                for i in range(reviews_per_campsite):
+                    db.session.add(
+                        Review(
+                            user_id=guests[i % len(guests)].id,
+                            campsite_id=campsite.id,
+                            rating=1 + i % 5,
+                            comment="Lovely stay",
+                        )
+                    )
+            db.session.add_all(booking_rows)
+            db.session.commit()
+
+            return {
+                "users": [user.id for user in user_rows],
+                "campsites": [campsite.id for campsite in campsite_rows],
+                "bookings": [booking.id for booking in booking_rows],
+            }
+
+    return seed_rows
+
+
+@pytest.fixture
+def site(seed, auth_headers):
+    """Two campsites of a host, with a guest and a stranger to book them"""
+    ids = seed(users=3, campsites=2)
+    return {
+        "campsite_id": ids["campsites"][0],
+        "other_id": ids["campsites"][1],
+        "host_id": ids["users"][0],
+        "guest_id": ids["users"][1],
+        "host": auth_headers(ids["users"][0]),
+        "guest": auth_headers(ids["users"][1]),
+        "stranger": auth_headers(ids["users"][2]),
+    }
+
+
+def stay(offset=0, nights=2, campsite_id=None, start=STAY_START):
+    """Booking request fields for nights from offset days after start"""
+    first = start + timedelta(days=offset)
+    dates = {
+        "start_date": first.isoformat(),
+        "end_date": (first + timedelta(days=nights)).isoformat(),
+    }
+    return dates if campsite_id is None else {"campsite_id": campsite_id, **dates}
+
+
+def book(client, site, offset=0, nights=2, start=STAY_START):
+    """Book the site's first campsite as its guest, returning the response"""
+    return client.post(
+        "/api/bookings",
+        json=stay(offset, nights, site["campsite_id"], start),
+        headers=site["guest"],
+    )
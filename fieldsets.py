@@ -0,0 +1,315 @@
+"""
+Sparse fieldsets and embedded relations for read endpoints
+
+fields=title,price trims each serialized campsite, booking or review to
+the named fields (plus id), and the query loads only the columns those
+fields read: no other column is selected, and a relation such as the
+host behind host_name is joined only when one of its fields is asked for.
+Without fields= every field is returned, exactly as to_dict does.
+
+include=reviews:5,host embeds related data under the include's name.
+Each include is loaded for a batch of rows at a time, up to
+STREAM_BATCH_SIZE, with one query per include, so a page or a streamed
+list costs the same few extra queries however many rows it has. An
+include may take a parameter after a colon, such as how many reviews to
+embed per campsite.
+"""
+
+from collections import namedtuple
+from datetime import date, timedelta
+from itertools import islice
+from operator import attrgetter
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, load_only
+
+from availability import merge_ranges
+from availability_index import get_index
+from json_provider import STREAM_BATCH_SIZE
+from models import db, ArchivedBooking, Booking, Campsite, Review, User
+
+# columns: attributes the field reads; relation: relationship it follows,
+# joined in the same query; value: the serialized value of an object
+Field = namedtuple("Field", "columns relation value")
+
+# columns: attributes the include reads; load(objects, param) returns
+# {object id: embedded value}; param: (default, maximum) or None
+Include = namedtuple("Include", "columns load param")
+
+
+def _column(name):
+    return Field((name,), None, attrgetter(name))
+
+
+def _isoformat(name):
+    return Field((name,), None, lambda obj: getattr(obj, name).isoformat())
+
+
+def _related(column, relation, name):
+    return Field((column,), relation, lambda obj: getattr(getattr(obj, relation), name))
+
+
+CAMPSITE_FIELDS = {
+    "id": _column("id"),
+    "title": _column("title"),
+    "description": _column("description"),
+    "price": _column("price"),
+    "location": _column("location"),
+    "host_id": _column("host_id"),
+    "host_name": _related("host_id", "host", "name"),
+    "image_url": _column("image_url"),
+    "latitude": _column("latitude"),
+    "longitude": _column("longitude"),
+    "average_rating": Field(
+        ("average_rating",), None, lambda campsite: round(campsite.average_rating, 1)
+    ),
+    "review_count": _column("review_count"),
+    "created_at": _isoformat("created_at"),
+}
+
+BOOKING_FIELDS = {
+    "id": _column("id"),
+    "user_id": _column("user_id"),
+    "user_name": _related("user_id", "user", "name"),
+    "campsite_id": _column("campsite_id"),
+    "campsite_title": _related("campsite_id", "campsite", "title"),
+    "start_date": _isoformat("start_date"),
+    "end_date": _isoformat("end_date"),
+    "status": _column("status"),
+    "total_price": _column("total_price"),
+    "created_at": _isoformat("created_at"),
+}
+
+ARCHIVED_BOOKING_FIELDS = {
+    **BOOKING_FIELDS,
+    "archived": Field((), None, lambda booking: True),
+}
+
+REVIEW_FIELDS = {
+    "id": _column("id"),
+    "user_id": _column("user_id"),
+    "user_name": _related("user_id", "user", "name"),
+    "campsite_id": _column("campsite_id"),
+    "rating": _column("rating"),
+    "comment": _column("comment"),
+    "created_at": _isoformat("created_at"),
+}
+
+DEFAULT_REVIEWS = 5
+MAX_REVIEWS = 20
+
+DEFAULT_AVAILABILITY_DAYS = 90
+MAX_AVAILABILITY_DAYS = 366
+
+
+def _users(objects, column):
+    user_ids = {getattr(obj, column) for obj in objects}
+    names = dict(
+        db.session.execute(
+            select(User.id, User.name).where(User.id.in_(sorted(user_ids)))
+        ).all()
+    )
+    return {
+        obj.id: {"id": getattr(obj, column), "name": names.get(getattr(obj, column))}
+        for obj in objects
+    }
+
+
+def _load_host(campsites, param):
+    return _users(campsites, "host_id")
+
+
+def _load_user(objects, param):
+    return _users(objects, "user_id")
+
+
+def _load_campsite(objects, param):
+    campsite_ids = {obj.campsite_id for obj in objects}
+    campsites = {
+        campsite.id: campsite.to_dict()
+        for campsite in Campsite.query.options(joinedload(Campsite.host)).filter(
+            Campsite.id.in_(sorted(campsite_ids))
+        )
+    }
+    return {obj.id: campsites.get(obj.campsite_id) for obj in objects}
+
+
+def _load_reviews(campsites, limit):
+    """The latest limit reviews of each campsite, in one ranked query"""
+    campsite_ids = sorted(campsite.id for campsite in campsites)
+    ranked = (
+        select(
+            Review.id,
+            func.row_number()
+            .over(
+                partition_by=Review.campsite_id,
+                order_by=(Review.created_at.desc(), Review.id.desc()),
+            )
+            .label("rank"),
+        )
+        .where(Review.campsite_id.in_(campsite_ids))
+        .subquery()
+    )
+    reviews = {campsite_id: [] for campsite_id in campsite_ids}
+    for review in (
+        Review.query.options(joinedload(Review.user))
+        .join(ranked, ranked.c.id == Review.id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(Review.campsite_id, ranked.c.rank)
+    ):
+        reviews[review.campsite_id].append(review.to_dict())
+    return reviews
+
+
+def _load_availability(campsites, days):
+    """Taken ranges of each campsite over the next days, merged"""
+    start = date.today()
+    taken = get_index(current_app).taken_ranges(
+        {campsite.id: campsite.availability_version for campsite in campsites},
+        start,
+        start + timedelta(days=days),
+    )
+    return {
+        campsite.id: [
+            {"start_date": taken_start.isoformat(), "end_date": taken_end.isoformat()}
+            for taken_start, taken_end in merge_ranges(taken.get(campsite.id, []))
+        ]
+        for campsite in campsites
+    }
+
+
+BOOKING_INCLUDES = {
+    "campsite": Include(("campsite_id",), _load_campsite, None),
+    "user": Include(("user_id",), _load_user, None),
+}
+
+MODELS = {
+    Campsite: (
+        CAMPSITE_FIELDS,
+        {
+            "host": Include(("host_id",), _load_host, None),
+            "reviews": Include((), _load_reviews, (DEFAULT_REVIEWS, MAX_REVIEWS)),
+            "availability": Include(
+                ("availability_version",),
+                _load_availability,
+                (DEFAULT_AVAILABILITY_DAYS, MAX_AVAILABILITY_DAYS),
+            ),
+        },
+    ),
+    Booking: (BOOKING_FIELDS, BOOKING_INCLUDES),
+    ArchivedBooking: (ARCHIVED_BOOKING_FIELDS, BOOKING_INCLUDES),
+    Review: (
+        REVIEW_FIELDS,
+        {
+            "campsite": Include(("campsite_id",), _load_campsite, None),
+            "user": Include(("user_id",), _load_user, None),
+        },
+    ),
+}
+
+# Fields returned whatever fields= asks for
+ALWAYS = ("id", "archived")
+
+
+def _split(raw):
+    return [part.strip() for part in raw.split(",") if part.strip()]
+
+
+def _parse_includes(raw, includes):
+    parsed = {}
+    for part in _split(raw):
+        name, _, value = part.partition(":")
+        include = includes.get(name)
+        if include is None:
+            raise ValueError(f"Unknown include: {name}")
+        if include.param is None:
+            if value:
+                raise ValueError(f"include {name} takes no parameter")
+            parsed[name] = None
+            continue
+        default, maximum = include.param
+        try:
+            param = int(value) if value else default
+        except ValueError:
+            raise ValueError(f"Invalid {name} include parameter")
+        if param < 1 or param > maximum:
+            raise ValueError(f"include {name} must be between 1 and {maximum}")
+        parsed[name] = param
+    return parsed
+
+
+class Fieldset:
+    """The fields and includes a request asked for, for one model"""
+
+    def __init__(self, model, names=None, includes=None):
+        self.model = model
+        self.fields, self.available_includes = MODELS[model]
+        self.names = names
+        self.includes = includes or {}
+        self.embedded = {}
+
+    @classmethod
+    def from_args(cls, model, args):
+        """Fieldset from fields= and include= query arguments, raising ValueError"""
+        fields, includes = MODELS[model]
+        names = None
+        if "fields" in args:
+            requested = set(_split(args["fields"]))
+            unknown = sorted(requested - set(fields) - set(ALWAYS))
+            if unknown:
+                raise ValueError(f"Unknown field: {unknown[0]}")
+            names = [name for name in fields if name in requested or name in ALWAYS]
+        return cls(model, names, _parse_includes(args.get("include", ""), includes))
+
+    def options(self, *columns):
+        """Loader options for the query, also loading columns (attributes)"""
+        if self.names is None:
+            relations = {
+                field.relation for field in self.fields.values() if field.relation
+            }
+            return [joinedload(getattr(self.model, name)) for name in sorted(relations)]
+
+        selected = [self.fields[name] for name in self.names]
+        loaded = {"id", *(attr.key for attr in columns)}
+        for field in selected:
+            loaded.update(field.columns)
+        for name in self.includes:
+            loaded.update(self.available_includes[name].columns)
+        relations = {field.relation for field in selected if field.relation}
+        return [
+            load_only(*(getattr(self.model, name) for name in sorted(loaded))),
+            *(joinedload(getattr(self.model, name)) for name in sorted(relations)),
+        ]
+
+    def prefetch(self, objects):
+        """Load every include for objects, with one query per include"""
+        self.embedded = {obj.id: {} for obj in objects}
+        if not objects:
+            return
+        for name, param in self.includes.items():
+            values = self.available_includes[name].load(objects, param)
+            for obj in objects:
+                self.embedded[obj.id][name] = values.get(obj.id)
+
+    def batched(self, rows, key=None):
+        """Yield rows, prefetching includes for each batch of them first
+
+        key picks the object out of a row when rows carry extra columns.
+        """
+        if not self.includes:
+            yield from rows
+            return
+        rows = iter(rows)
+        while batch := list(islice(rows, STREAM_BATCH_SIZE)):
+            self.prefetch([key(row) if key else row for row in batch])
+            yield from batch
+
+    def serialize(self, obj):
+        if self.names is None:
+            data = obj.to_dict()
+        else:
+            data = {name: self.fields[name].value(obj) for name in self.names}
+        if self.includes:
+            data.update(self.embedded[obj.id])
+        return data
@@ -0,0 +1,363 @@
+"""
+Occupancy forecasts for the coming weeks, per campsite
+
+Booking history (live and archived, confirmed or paid) is loaded as three
+integer arrays: campsite row, first night and checkout day, as day
+offsets into a window running from SEASON_YEARS years back to
+HORIZON_DAYS ahead. The nightly occupancy matrix (campsites x days) is
+built from them without a loop over bookings: +1 at each first night, -1
+at each checkout, then a cumulative sum along the days.
+
+Each campsite's forecast for a night is its recent level for that
+weekday (the last LEVEL_WEEKS weeks, shrunk towards its overall recent
+rate), plus the seasonal shift seen around the same night in earlier
+years (364 days back, so weekdays line up): the week-smoothed occupancy
+then, less the level in the weeks leading up to it. Nights already
+booked count as certain. All campsites are forecast together, a block
+of BLOCK_SIZE campsites at a time to bound memory.
+
+Forecasts are cached per process. A background thread computes them
+after the first request and then nightly at FORECAST_REFRESH_HOUR; a
+campsite created since is forecast on its own on its first request and
+kept until the next refresh, and forecasts more than a day old are
+recomputed when read. NumPy is
+imported on first use, keeping it out of application start-up.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from threading import Event, Lock, Thread
+
+from sqlalchemy import String, select, type_coerce, union_all
+
+from availability import BLOCKING_STATUSES
+from models import db, ArchivedBooking, Booking, Campsite
+
+HORIZON_DAYS = 56
+LEVEL_WEEKS = 8
+SEASON_YEARS = 2
+# 52 weeks, so a night and its seasonal reference fall on the same weekday
+YEAR_DAYS = 364
+SMOOTHING_DAYS = 7
+# Weight, in weeks, pulling a weekday's level towards the campsite's mean
+SHRINKAGE_WEEKS = 4
+BLOCK_SIZE = 4096
+# Booking rows read from the database at a time
+STAYS_BATCH_SIZE = 50_000
+DEFAULT_REFRESH_HOUR = 3
+
+Forecasts = namedtuple("Forecasts", "today generated_at ids rows expected booked")
+
+_cache_lock = Lock()
+
+
+def occupancy_matrix(rows, starts, ends, n_rows, width):
+    """Nights occupied (1) or free (0) per row and day
+
+    rows, starts and ends are equal-length integer arrays; starts and ends
+    are day offsets with ends exclusive and may fall outside [0, width).
+    """
+    import numpy as np
+
+    starts = np.clip(starts, 0, width)
+    ends = np.clip(ends, 0, width)
+    keep = starts < ends
+    # One spare column takes the -1 of stays running past the window
+    stride = width + 1
+    size = n_rows * stride
+    offsets = rows[keep] * stride
+    deltas = np.bincount(offsets + starts[keep], minlength=size) - np.bincount(
+        offsets + ends[keep], minlength=size
+    )
+    occupied = np.cumsum(deltas.reshape(n_rows, stride), axis=1)[:, :width]
+    return np.minimum(occupied, 1).astype(np.float32)
+
+
+def forecast_occupancy(occupied, today, horizon=HORIZON_DAYS):
+    """Expected occupancy and booked nights for horizon days from today
+
+    occupied is an occupancy matrix whose column today is today's night;
+    it needs SEASON_YEARS years and LEVEL_WEEKS weeks (plus half the
+    smoothing window) of history before that. Returns two (rows, horizon)
+    arrays.
+    """
+    import numpy as np
+
+    days = np.arange(horizon)
+    level_days = LEVEL_WEEKS * 7
+
+    # level_days is whole weeks, so column k of the recent window falls on
+    # the weekday of today + k
+    recent = occupied[:, today - level_days : today]
+    by_weekday = recent.reshape(len(occupied), LEVEL_WEEKS, 7).sum(axis=1)
+    mean = recent.mean(axis=1, keepdims=True)
+    level = (by_weekday + SHRINKAGE_WEEKS * mean) / (LEVEL_WEEKS + SHRINKAGE_WEEKS)
+
+    totals = np.zeros((len(occupied), occupied.shape[1] + 1), dtype=np.float64)
+    np.cumsum(occupied, axis=1, out=totals[:, 1:])
+    half = SMOOTHING_DAYS // 2
+
+    seasonal = np.zeros((len(occupied), horizon), dtype=np.float64)
+    for year in range(1, SEASON_YEARS + 1):
+        then = today - year * YEAR_DAYS
+        nights = then + days
+        smoothed = (
+            totals[:, nights + half + 1] - totals[:, nights - half]
+        ) / SMOOTHING_DAYS
+        baseline = (totals[:, [then]] - totals[:, [then - level_days]]) / level_days
+        seasonal += smoothed - baseline
+    seasonal /= SEASON_YEARS
+
+    booked = occupied[:, today : today + horizon]
+    expected = np.clip(level[:, days % 7] + seasonal, 0.0, 1.0)
+    return np.maximum(expected, booked).astype(np.float32), booked > 0
+
+
+def _stays(first, last, campsite_ids=None):
+    """Campsite ids, first nights and checkout days of stays, as int arrays
+
+    Days are offsets from first. Rows are read STAYS_BATCH_SIZE at a time
+    and converted as they come, so the history is never held as tuples.
+    """
+    import numpy as np
+
+    # Dates as the driver returns them: ISO text on SQLite, which NumPy
+    # parses far faster than SQLAlchemy builds date objects
+    def stays(model):
+        return select(
+            model.campsite_id,
+            type_coerce(model.start_date, String),
+            type_coerce(model.end_date, String),
+        ).where(model.status.in_(BLOCKING_STATUSES), model.start_date < last)
+
+    # Archival keeps live bookings within the window, and bounding their
+    # end date would only steer the planner to a slower index scan
+    archived = stays(ArchivedBooking).where(ArchivedBooking.end_date > first)
+    live = stays(Booking)
+    if campsite_ids is not None:
+        live = live.where(Booking.campsite_id.in_(campsite_ids))
+        archived = archived.where(ArchivedBooking.campsite_id.in_(campsite_ids))
+    result = db.session.execute(
+        union_all(live, archived),
+        execution_options={"yield_per": STAYS_BATCH_SIZE},
+    )
+    origin = np.datetime64(first, "D")
+    batches = []
+    for rows in result.partitions():
+        campsite_ids, starts, ends = zip(*rows)
+        batches.append(
+            (
+                np.array(campsite_ids, dtype=np.int64),
+                (np.array(starts, dtype="datetime64[D]") - origin).astype(np.int64),
+                (np.array(ends, dtype="datetime64[D]") - origin).astype(np.int64),
+            )
+        )
+    if not batches:
+        return (np.zeros(0, dtype=np.int64),) * 3
+    return tuple(np.concatenate(arrays) for arrays in zip(*batches))
+
+
+def compute_forecasts(today=None, horizon=HORIZON_DAYS, campsite_ids=None):
+    """Forecasts from today for campsite_ids, or every campsite
+
+    Needs an app context.
+    """
+    import numpy as np
+
+    today = today or date.today()
+    generated_at = datetime.utcnow()
+    history = SEASON_YEARS * YEAR_DAYS + LEVEL_WEEKS * 7 + SMOOTHING_DAYS // 2
+    first = today - timedelta(days=history)
+    width = history + horizon
+
+    query = select(Campsite.id).order_by(Campsite.id)
+    if campsite_ids is not None:
+        campsite_ids = sorted(campsite_ids)
+        query = query.where(Campsite.id.in_(campsite_ids))
+    ids = np.array(db.session.scalars(query).all(), dtype=np.int64)
+    campsite_ids, starts, ends = _stays(
+        first, first + timedelta(days=width), campsite_ids
+    )
+
+    # Archived stays can outlive their campsite
+    positions = np.searchsorted(ids, campsite_ids)
+    known = positions < len(ids)
+    known[known] = ids[positions[known]] == campsite_ids[known]
+    positions, starts, ends = positions[known], starts[known], ends[known]
+
+    order = np.argsort(positions, kind="stable")
+    positions, starts, ends = positions[order], starts[order], ends[order]
+    bounds = np.searchsorted(positions, np.arange(0, len(ids) + BLOCK_SIZE, BLOCK_SIZE))
+
+    expected = np.zeros((len(ids), horizon), dtype=np.float32)
+    booked = np.zeros((len(ids), horizon), dtype=bool)
+    for block, block_start in enumerate(range(0, len(ids), BLOCK_SIZE)):
+        block_rows = min(BLOCK_SIZE, len(ids) - block_start)
+        chosen = slice(bounds[block], bounds[block + 1])
+        occupied = occupancy_matrix(
+            positions[chosen] - block_start,
+            starts[chosen],
+            ends[chosen],
+            block_rows,
+            width,
+        )
+        rows = slice(block_start, block_start + block_rows)
+        expected[rows], booked[rows] = forecast_occupancy(occupied, history, horizon)
+
+    return Forecasts(
+        today=today,
+        generated_at=generated_at,
+        ids=ids,
+        rows={int(campsite_id): row for row, campsite_id in enumerate(ids)},
+        expected=expected,
+        booked=booked,
+    )
+
+
+def _stale(forecasts):
+    return forecasts is None or date.today() - forecasts.today > timedelta(days=1)
+
+
+class ForecastCache:
+    """The latest forecasts for every campsite"""
+
+    def __init__(self):
+        self.forecasts = None
+        # {campsite_id: Forecasts} for campsites created since the refresh,
+        # replaced under the lock
+        self.added = {}
+        self._lock = Lock()
+
+    def refresh(self):
+        with self._lock:
+            self.forecasts = compute_forecasts()
+            self.added = {}
+        return self.forecasts
+
+    def get(self, campsite_id):
+        """Forecast dict for a campsite, or None if the campsite does not exist
+
+        Recomputes when the forecasts are stale, and forecasts a campsite
+        created since on its own. Needs an app context.
+        """
+        forecasts = self.forecasts
+        if _stale(forecasts):
+            with self._lock:
+                # Callers queued behind a refresh use its result
+                if _stale(self.forecasts):
+                    self.forecasts = compute_forecasts()
+                    self.added = {}
+                forecasts = self.forecasts
+
+        if campsite_id not in forecasts.rows:
+            forecasts = self.added.get(campsite_id)
+            if _stale(forecasts):
+                forecasts = compute_forecasts(campsite_ids=[campsite_id])
+                if not forecasts.rows:
+                    return None
+                # Replaced, not changed in place, so readers outside the
+                # lock never see it mid-update; a refresh since covers it
+                with self._lock:
+                    if campsite_id not in self.forecasts.rows:
+                        self.added = {**self.added, campsite_id: forecasts}
+        row = forecasts.rows[campsite_id]
+
+        # Forecasts from yesterday drop the night already past
+        skip = (date.today() - forecasts.today).days
+        expected = forecasts.expected[row, skip:].tolist()
+        booked = forecasts.booked[row, skip:].tolist()
+        first = forecasts.today + timedelta(days=skip)
+
+        nights = [
+            {
+                "date": (first + timedelta(days=offset)).isoformat(),
+                "booked": is_booked,
+                "expected_occupancy": round(occupancy, 3),
+            }
+            for offset, (occupancy, is_booked) in enumerate(zip(expected, booked))
+        ]
+        weeks = []
+        for offset in range(0, len(nights), 7):
+            week = expected[offset : offset + 7]
+            weeks.append(
+                {
+                    "start_date": nights[offset]["date"],
+                    "booked_nights": sum(booked[offset : offset + 7]),
+                    "expected_occupancy": round(sum(week) / len(week), 3),
+                }
+            )
+        return {
+            "campsite_id": campsite_id,
+            "generated_at": forecasts.generated_at.isoformat(),
+            "expected_occupancy": round(sum(expected) / max(len(expected), 1), 3),
+            "weeks": weeks,
+            "nights": nights,
+        }
+
+
+def get_forecasts(app):
+    """The app's forecast cache, created on first use"""
+    cache = app.extensions.get("forecast")
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get("forecast")
+            if cache is None:
+                cache = ForecastCache()
+                app.extensions["forecast"] = cache
+    return cache
+
+
+def _seconds_until(hour):
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class ForecastRefresher(Thread):
+    """Daemon thread computing forecasts, then again daily at a local hour"""
+
+    def __init__(self, app, hour):
+        super().__init__(name="forecast-refresher", daemon=True)
+        self.app = app
+        self.hour = hour
+        self.stopped = Event()
+
+    def run(self):
+        # Warm the cache at start-up, then refresh once a day
+        while True:
+            with self.app.app_context():
+                try:
+                    get_forecasts(self.app).refresh()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Forecast refresh failed")
+            if self.stopped.wait(_seconds_until(self.hour)):
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+
+def init_forecast(app):
+    """Refresh occupancy forecasts nightly"""
+    app.config.setdefault("FORECAST_REFRESH_HOUR", DEFAULT_REFRESH_HOUR)
+    hour = app.config["FORECAST_REFRESH_HOUR"]
+
+    if hour is None:
+        return
+
+    # Started by the first request so building an app never spawns threads
+    start_lock = Lock()
+
+    def start_refresher():
+        if "forecast_refresher" in app.extensions:
+            return
+        with start_lock:
+            if "forecast_refresher" not in app.extensions:
+                refresher = ForecastRefresher(app, hour)
+                app.extensions["forecast_refresher"] = refresher
+                refresher.start()
+
+    app.before_request(start_refresher)
@@ -0,0 +1,145 @@
+"""
+Latitude-band spatial index for radius and bounding-box search
+
+The globe is cut into BAND_DEGREES bands of latitude and each campsite
+stores the number of the band it sits in (Campsite.geo_band), indexed
+together with its longitude. A bounding box becomes a short list of bands
+with a longitude range inside each, so the database seeks straight to the
+box's slice of every band instead of reading all campsites at those
+latitudes or at those longitudes. An exact latitude check then trims the
+edge bands.
+
+Boxes spanning more than MAX_BANDS bands usually hold most campsites, so
+they are checked row by row while the query walks its sort order,
+stopping once a page is full rather than reading every match first.
+
+Distances use the equirectangular approximation, computed in SQL with
+plain arithmetic so they can filter and order the query. They are close
+to great-circle distances at search radii up to MAX_RADIUS_KM, but do not
+wrap at the antimeridian, so a radius search there misses the far side.
+"""
+
+import math
+
+from sqlalchemy import and_, or_
+
+from models import Campsite
+
+BAND_DEGREES = 0.1
+BAND_COUNT = int(180 / BAND_DEGREES)
+
+MAX_BANDS = 200
+MAX_RADIUS_KM = 500
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+
+def validate_point(latitude, longitude):
+    """Coordinates as floats, raising ValueError if out of range"""
+    latitude, longitude = float(latitude), float(longitude)
+    if not -90 <= latitude <= 90:
+        raise ValueError("Latitude must be between -90 and 90")
+    if not -180 <= longitude <= 180:
+        raise ValueError("Longitude must be between -180 and 180")
+    return latitude, longitude
+
+
+def band_of(latitude):
+    if latitude is None:
+        return None
+    return min(int((latitude + 90) / BAND_DEGREES), BAND_COUNT - 1)
+
+
+def parse_coordinates(latitude, longitude):
+    """(latitude, longitude, geo_band) of a position, all None to clear it
+
+    Raises ValueError.
+    """
+    if (latitude is None) != (longitude is None):
+        raise ValueError("latitude and longitude must be given together")
+    if latitude is not None:
+        try:
+            latitude, longitude = validate_point(latitude, longitude)
+        except TypeError:
+            raise ValueError("Invalid latitude or longitude format")
+    return latitude, longitude, band_of(latitude)
+
+
+def set_coordinates(campsite, latitude, longitude):
+    """Place a campsite, or clear its position with None, None"""
+    campsite.latitude, campsite.longitude, campsite.geo_band = parse_coordinates(
+        latitude, longitude
+    )
+
+
+def parse_bbox(raw):
+    """west,south,east,north (GeoJSON order), raising ValueError
+
+    west may exceed east for a box crossing the antimeridian.
+    """
+    try:
+        west, south, east, north = (float(part) for part in raw.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be west,south,east,north")
+    south, west = validate_point(south, west)
+    north, east = validate_point(north, east)
+    if south > north:
+        raise ValueError("bbox south must not exceed north")
+    return west, south, east, north
+
+
+def parse_near(raw, radius_raw):
+    """(latitude, longitude, radius_km) from near=lat,lng and radius_km"""
+    try:
+        latitude, longitude = (float(part) for part in raw.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("near must be latitude,longitude")
+    latitude, longitude = validate_point(latitude, longitude)
+
+    try:
+        radius_km = float(radius_raw) if radius_raw is not None else 50.0
+    except ValueError:
+        raise ValueError("Invalid radius_km format")
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f"radius_km must be between 0 and {MAX_RADIUS_KM}")
+    return latitude, longitude, radius_km
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Smallest west, south, east, north box containing the circle"""
+    spread = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - spread, -90.0), min(latitude + spread, 90.0)
+    cos_latitude = math.cos(math.radians(max(abs(south), abs(north))))
+    if cos_latitude * 180 <= spread:
+        return -180.0, south, 180.0, north
+    span = spread / cos_latitude
+    west = (longitude - span + 180) % 360 - 180
+    east = (longitude + span + 180) % 360 - 180
+    return west, south, east, north
+
+
+def within_bbox(west, south, east, north):
+    """Filter for campsites inside the box, through the band index"""
+    if west <= east:
+        longitude = Campsite.longitude.between(west, east)
+    else:
+        longitude = or_(Campsite.longitude >= west, Campsite.longitude <= east)
+
+    bands = range(band_of(south), band_of(north) + 1)
+    if len(bands) > MAX_BANDS:
+        # Adding 0 keeps the planner off the band index
+        return and_((Campsite.latitude + 0).between(south, north), longitude)
+    return and_(
+        Campsite.geo_band.in_(bands),
+        longitude,
+        Campsite.latitude.between(south, north),
+    )
+
+
+def distance_sq_km(latitude, longitude):
+    """SQL expression for the squared distance in km from a point"""
+    scale = math.cos(math.radians(latitude))
+    dx = (Campsite.longitude - longitude) * (scale * KM_PER_DEGREE)
+    dy = (Campsite.latitude - latitude) * KM_PER_DEGREE
+    return dx * dx + dy * dy
@@ -0,0 +1,251 @@
+"""
+Priority classes, concurrency limits and load shedding for requests
+
+Every request falls in a class: checkout (creating bookings, paying,
+booking a hold), browse (public reads such as searches) or standard
+(everything else). Each class has its own concurrency limit and a short,
+bounded queue. A request that cannot start within its class's queue
+timeout, or finds the queue full, is shed with 503 and Retry-After, so a
+flood of searches waits or fails in its own queue instead of taking the
+threads and database time that checkout needs.
+
+Limits adapt to checkout's health. Checkout latency and queue time are
+tracked as moving averages; when either misses its target
+(LOAD_SHED_LATENCY_TARGET, LOAD_SHED_QUEUE_TARGET), the browse limit is
+halved, and once browse is at its minimum so is the standard limit.
+Once checkout is back under target, limits grow by one per adjustment
+interval up to their maximum. Checkout's own limit never shrinks.
+
+Limits are per process; with a threaded server (the default for
+python app.py) they bound the requests served at once.
+"""
+
+from collections import namedtuple
+from math import ceil
+from threading import Condition, Lock
+import time
+
+from flask import g, jsonify, request
+
+from metrics import registry
+
+# max_limit and min_limit bound the adaptive limit; queue_timeout is in
+# seconds, and a class's Retry-After is at least one second
+ClassPolicy = namedtuple(
+    "ClassPolicy", "max_limit min_limit queue_size queue_timeout retry_after"
+)
+
+CLASSES = {
+    "checkout": ClassPolicy(32, 32, 64, 5.0, 1),
+    "standard": ClassPolicy(32, 4, 32, 1.0, 1),
+    "browse": ClassPolicy(32, 2, 16, 0.25, 2),
+}
+
+# Shrunk in this order while checkout misses its targets
+DEGRADE_ORDER = ("browse", "standard")
+
+CHECKOUT_ENDPOINTS = frozenset(
+    (
+        "bookings.create_booking",
+        "bookings.create_booking_batch",
+        "bookings.simulate_payment",
+        "waitlist.book_hold",
+    )
+)
+BROWSE_BLUEPRINTS = frozenset(
+    ("campsites", "locations", "reviews", "pricing", "availability")
+)
+EXEMPT_ENDPOINTS = frozenset(("health", "metrics", "static"))
+
+DEFAULT_LATENCY_TARGET = 0.5
+DEFAULT_QUEUE_TARGET = 0.05
+DEFAULT_ADJUST_INTERVAL = 1.0
+
+# Weight of the newest sample in the moving averages
+SMOOTHING = 0.2
+
+# Checkout averages older than this no longer hold limits down
+CHECKOUT_IDLE_SECONDS = 10
+
+
+def classify(endpoint, method, blueprint):
+    """The priority class of a request, or None if it is never limited"""
+    if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+        return None
+    if endpoint in CHECKOUT_ENDPOINTS:
+        return "checkout"
+    if method in ("GET", "HEAD") and blueprint in BROWSE_BLUEPRINTS:
+        return "browse"
+    return "standard"
+
+
+class Limiter:
+    """Concurrency limit with a bounded queue of timed waiters"""
+
+    def __init__(self, limit, queue_size):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self._condition = Condition()
+
+    def acquire(self, timeout):
+        """Seconds spent queued before starting, or None if shed"""
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return 0.0
+            if self.waiting >= self.queue_size:
+                return None
+
+            started = time.monotonic()
+            deadline = started + timeout
+            self.waiting += 1
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            return time.monotonic() - started
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def set_limit(self, limit):
+        with self._condition:
+            raised = limit > self.limit
+            self.limit = limit
+            if raised:
+                self._condition.notify_all()
+
+
+class LoadShedder:
+    """Per-class limiters whose limits follow checkout latency"""
+
+    def __init__(
+        self,
+        classes=CLASSES,
+        latency_target=DEFAULT_LATENCY_TARGET,
+        queue_target=DEFAULT_QUEUE_TARGET,
+        adjust_interval=DEFAULT_ADJUST_INTERVAL,
+    ):
+        self.classes = classes
+        self.latency_target = latency_target
+        self.queue_target = queue_target
+        self.adjust_interval = adjust_interval
+        self.limiters = {
+            name: Limiter(policy.max_limit, policy.queue_size)
+            for name, policy in classes.items()
+        }
+        self.checkout_latency = 0.0
+        self.checkout_queue = 0.0
+        self.checkout_seen_at = 0.0
+        self.adjusted_at = time.monotonic()
+        self._lock = Lock()
+        for name, limiter in self.limiters.items():
+            registry.concurrency_limit.set((name,), limiter.limit)
+
+    def acquire(self, name):
+        queued = self.limiters[name].acquire(self.classes[name].queue_timeout)
+        if queued is None:
+            registry.load_shed.inc((name,))
+        else:
+            registry.queue_time.observe((name,), queued)
+        return queued
+
+    def release(self, name, latency, queued):
+        self.limiters[name].release()
+        self.record(name, latency, queued)
+
+    def record(self, name, latency, queued):
+        """Feed a finished request into the averages and adjust limits"""
+        now = time.monotonic()
+        with self._lock:
+            if name == "checkout":
+                self.checkout_latency += SMOOTHING * (latency - self.checkout_latency)
+                self.checkout_queue += SMOOTHING * (queued - self.checkout_queue)
+                self.checkout_seen_at = now
+            if now - self.adjusted_at < self.adjust_interval:
+                return
+            self.adjusted_at = now
+
+            # Without recent checkout traffic there is nothing to protect
+            recent = now - self.checkout_seen_at < CHECKOUT_IDLE_SECONDS
+            overloaded = recent and (
+                self.checkout_latency > self.latency_target
+                or self.checkout_queue > self.queue_target
+            )
+            if overloaded:
+                self._degrade()
+            else:
+                self._recover()
+
+    def _degrade(self):
+        for name in DEGRADE_ORDER:
+            limiter = self.limiters[name]
+            floor = self.classes[name].min_limit
+            if limiter.limit > floor:
+                self._set_limit(name, max(floor, limiter.limit // 2))
+                return
+
+    def _recover(self):
+        for name in reversed(DEGRADE_ORDER):
+            if self.limiters[name].limit < self.classes[name].max_limit:
+                self._set_limit(name, self.limiters[name].limit + 1)
+
+    def _set_limit(self, name, limit):
+        self.limiters[name].set_limit(limit)
+        registry.concurrency_limit.set((name,), limit)
+
+    def retry_after(self, name):
+        policy = self.classes[name]
+        return max(policy.retry_after, ceil(policy.queue_timeout))
+
+
+def init_load_shedding(app):
+    """Limit concurrent requests per priority class and shed the excess"""
+    app.config.setdefault("LOAD_SHEDDING_ENABLED", True)
+    app.config.setdefault("LOAD_SHED_CLASSES", CLASSES)
+    app.config.setdefault("LOAD_SHED_LATENCY_TARGET", DEFAULT_LATENCY_TARGET)
+    app.config.setdefault("LOAD_SHED_QUEUE_TARGET", DEFAULT_QUEUE_TARGET)
+    app.config.setdefault("LOAD_SHED_ADJUST_INTERVAL", DEFAULT_ADJUST_INTERVAL)
+    if not app.config["LOAD_SHEDDING_ENABLED"]:
+        return
+
+    shedder = LoadShedder(
+        app.config["LOAD_SHED_CLASSES"],
+        app.config["LOAD_SHED_LATENCY_TARGET"],
+        app.config["LOAD_SHED_QUEUE_TARGET"],
+        app.config["LOAD_SHED_ADJUST_INTERVAL"],
+    )
+    app.extensions["load_shedder"] = shedder
+
+    def admit():
+        name = classify(request.endpoint, request.method, request.blueprint)
+        if name is None:
+            return None
+        queued = shedder.acquire(name)
+        if queued is None:
+            response = jsonify({"error": "Server is busy, please retry shortly"})
+            response.headers["Retry-After"] = str(shedder.retry_after(name))
+            return response, 503
+        g.load_class = name
+        g.load_queued = queued
+        g.load_started = time.perf_counter()
+        return None
+
+    def finish(exception=None):
+        # Streamed responses reach teardown once their body has been sent
+        name = g.pop("load_class", None)
+        if name is not None:
+            latency = time.perf_counter() - g.pop("load_started")
+            shedder.release(name, latency, g.pop("load_queued"))
+
+    app.before_request(admit)
+    app.teardown_request(finish)
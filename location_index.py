@@ -0,0 +1,176 @@
+"""
+In-memory prefix index of campsite locations for autocomplete
+
+Every campsite location is normalized (case-folded, whitespace collapsed)
+and counted both as a whole ("yosemite, california") and by each of its
+comma-separated parts ("california"), so a prefix matches towns as well as
+regions. The distinct keys live in a sorted list: a prefix is answered by
+bisecting for the range of keys that start with it and keeping the most
+common locations in that range.
+
+The index is built on first use, keeping app start-up free of database
+access. Writes are picked up from the change feed (change_log.py), at
+most once per LOCATION_REFRESH_SECONDS, so a suggestion is normally
+answered from memory without touching the database.
+"""
+
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+import heapq
+import re
+from threading import Lock
+import time
+
+from models import db, Campsite, ChangeEvent
+
+REFRESH_SECONDS = 1.0
+
+LAST_CHARACTER = chr(0x10FFFF)
+
+# Prefixes this short match too many keys to rank per request, so their
+# top TOP_SIZE are ranked once per rebuild instead
+SHORT_PREFIX = 2
+TOP_SIZE = 50
+
+# keys sorted; ranks and labels aligned with them, ranks as negated counts
+LocationSnapshot = namedtuple("LocationSnapshot", "keys ranks labels top")
+
+_index_lock = Lock()
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", (text or "").strip().casefold())
+
+
+def location_keys(location):
+    """The whole location and each of its comma-separated parts"""
+    parts = [part.strip() for part in location.split(",")]
+    keys = {normalize(location): location.strip()}
+    # The first part is already a prefix of the whole location
+    for part in parts[1:]:
+        if part:
+            keys.setdefault(normalize(part), part)
+    return keys
+
+
+class LocationIndex:
+    """Sorted array of normalized locations with campsite counts"""
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.cursor = 0
+        self.snapshot = None
+        self.counts = Counter()
+        self.labels = {}
+        self.locations = {}  # campsite id -> location string
+        self.refreshed_at = 0.0
+        self._lock = Lock()
+
+    def suggest(self, prefix, limit):
+        """Up to limit (location, count) pairs starting with prefix"""
+        self.refresh()
+        prefix = normalize(prefix)
+        snapshot = self.snapshot
+
+        if len(prefix) <= SHORT_PREFIX and limit <= TOP_SIZE:
+            positions = snapshot.top.get(prefix, [])[:limit]
+        else:
+            # Every key starting with prefix sorts between these two bounds
+            start = bisect_left(snapshot.keys, prefix)
+            end = bisect_left(snapshot.keys, prefix + LAST_CHARACTER, start)
+            # nsmallest is stable, so equal counts stay in key order
+            positions = heapq.nsmallest(
+                limit, range(start, end), key=snapshot.ranks.__getitem__
+            )
+        return [(snapshot.labels[p], -snapshot.ranks[p]) for p in positions]
+
+    def refresh(self):
+        """Build the index, or apply recent writes from the change feed"""
+        if (
+            self.snapshot is not None
+            and time.monotonic() - self.refreshed_at < self.refresh_seconds
+        ):
+            return
+
+        with self._lock:
+            if self.snapshot is None:
+                self.build()
+            else:
+                self._catch_up()
+            self.refreshed_at = time.monotonic()
+
+    def build(self):
+        # Read the cursor first so writes during the scan are replayed later
+        self.cursor = db.session.query(db.func.max(ChangeEvent.id)).scalar() or 0
+        self.locations = dict(db.session.query(Campsite.id, Campsite.location))
+
+        counts, labels = Counter(), {}
+        for location in self.locations.values():
+            for key, label in location_keys(location).items():
+                counts[key] += 1
+                labels.setdefault(key, label)
+        self._publish(counts, labels)
+
+    def _catch_up(self):
+        events = db.session.query(ChangeEvent.id, ChangeEvent.entity_id).filter(
+            ChangeEvent.id > self.cursor, ChangeEvent.entity == "campsite"
+        )
+        changed = set()
+        for event_id, campsite_id in events:
+            changed.add(campsite_id)
+            self.cursor = max(self.cursor, event_id)
+        if not changed:
+            return
+
+        current = dict(
+            db.session.query(Campsite.id, Campsite.location).filter(
+                Campsite.id.in_(changed)
+            )
+        )
+        counts, labels = Counter(self.counts), dict(self.labels)
+        for campsite_id in changed:
+            before = self.locations.pop(campsite_id, None)
+            after = current.get(campsite_id)
+            if before is not None:
+                counts.subtract(location_keys(before).keys())
+            if after is not None:
+                self.locations[campsite_id] = after
+                for key, label in location_keys(after).items():
+                    counts[key] += 1
+                    labels.setdefault(key, label)
+        self._publish(counts, labels)
+
+    def _publish(self, counts, labels):
+        counts = +counts  # drops keys no campsite uses any more
+        self.counts = counts
+        self.labels = labels = {key: labels[key] for key in counts}
+
+        keys = sorted(counts)
+        ranks = [-counts[key] for key in keys]
+        # Walk keys from most to least common, filling each short prefix
+        top = defaultdict(list)
+        for position in sorted(range(len(keys)), key=ranks.__getitem__):
+            key = keys[position]
+            for length in range(1, min(len(key), SHORT_PREFIX) + 1):
+                positions = top[key[:length]]
+                if len(positions) < TOP_SIZE:
+                    positions.append(position)
+
+        # Readers never lock, so swap in a complete snapshot at once
+        self.snapshot = LocationSnapshot(
+            keys, ranks, [labels[key] for key in keys], top
+        )
+
+
+def get_index(app):
+    """The app's location index, created on first use"""
+    index = app.extensions.get("locations")
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get("locations")
+            if index is None:
+                index = LocationIndex(
+                    app.config.get("LOCATION_REFRESH_SECONDS", REFRESH_SECONDS)
+                )
+                app.extensions["locations"] = index
+    return index
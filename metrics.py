@@ -0,0 +1,331 @@
+"""
+Request instrumentation and Prometheus exporter
+
+Records per-endpoint latency, response size and SQL statement count/time
+for every request, plus cache hit/miss counters, notification outbox
+depth and lag, and load shedding (load_shedding.py), and serves them in
+the Prometheus text exposition format at /metrics.
+"""
+
+from bisect import bisect_left
+from threading import Lock
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DELIVERY_LAG_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(
+                f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+            )
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, label_values, value):
+        # Counts are stored per bucket and only made cumulative on export,
+        # so an observation is a bisect plus three increments under the lock
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                    0,
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted(
+                (key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()
+            )
+        for label_values, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    self.labels + ("le",), label_values + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """Last set value keyed by a tuple of label values"""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def set(self, label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def value(self, label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} gauge",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(
+                f"{self.name}{_format_labels(self.labels, label_values)} "
+                f"{_format_value(value)}"
+            )
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric exported at /metrics"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "camp_http_request_duration_seconds",
+            "Request latency by endpoint",
+            ("endpoint", "method"),
+            LATENCY_BUCKETS,
+        )
+        self.requests_total = Counter(
+            "camp_http_requests_total",
+            "Requests by endpoint and status code",
+            ("endpoint", "method", "status"),
+        )
+        self.response_size = Histogram(
+            "camp_http_response_size_bytes",
+            "Response body size by endpoint",
+            ("endpoint",),
+            SIZE_BUCKETS,
+        )
+        self.sql_statements = Histogram(
+            "camp_db_statements_per_request",
+            "SQL statements executed per request",
+            ("endpoint",),
+            SQL_COUNT_BUCKETS,
+        )
+        self.sql_duration = Histogram(
+            "camp_db_duration_seconds_per_request",
+            "Time spent executing SQL per request",
+            ("endpoint",),
+            LATENCY_BUCKETS,
+        )
+        self.cache_requests = Counter(
+            "camp_cache_requests_total",
+            "Cache lookups by cache name and result",
+            ("cache", "result"),
+        )
+        self.outbox_depth = Gauge(
+            "camp_outbox_depth",
+            "Notifications waiting in the outbox by status",
+            ("status",),
+        )
+        self.outbox_lag = Gauge(
+            "camp_outbox_lag_seconds",
+            "Age of the oldest pending notification",
+            (),
+        )
+        self.outbox_deliveries = Counter(
+            "camp_outbox_deliveries_total",
+            "Notification delivery attempts by topic and result",
+            ("topic", "result"),
+        )
+        self.outbox_delivery_lag = Histogram(
+            "camp_outbox_delivery_lag_seconds",
+            "Time from a change to its notification being delivered",
+            ("topic",),
+            DELIVERY_LAG_BUCKETS,
+        )
+        self.load_shed = Counter(
+            "camp_load_shed_total",
+            "Requests rejected with 503 by priority class",
+            ("class",),
+        )
+        self.concurrency_limit = Gauge(
+            "camp_concurrency_limit",
+            "Current concurrent request limit by priority class",
+            ("class",),
+        )
+        self.queue_time = Histogram(
+            "camp_load_queue_seconds",
+            "Time admitted requests waited for a slot by priority class",
+            ("class",),
+            LATENCY_BUCKETS,
+        )
+
+    def all(self):
+        return [
+            self.request_duration,
+            self.requests_total,
+            self.response_size,
+            self.sql_statements,
+            self.sql_duration,
+            self.cache_requests,
+            self.outbox_depth,
+            self.outbox_lag,
+            self.outbox_deliveries,
+            self.outbox_delivery_lag,
+            self.load_shed,
+            self.concurrency_limit,
+            self.queue_time,
+        ]
+
+    def render(self):
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def record_cache(cache_name, hit):
+    """Count a cache lookup so hit rates show up at /metrics"""
+    registry.cache_requests.inc((cache_name, "hit" if hit else "miss"))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    if has_request_context() and "metrics_start" in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+
+
+def _endpoint_label():
+    return request.endpoint or "unmatched"
+
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+
+
+def _record_request(response):
+    if "metrics_start" not in g or request.endpoint == "metrics":
+        return response
+
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = _endpoint_label()
+
+    registry.request_duration.observe((endpoint, request.method), elapsed)
+    registry.requests_total.inc((endpoint, request.method, str(response.status_code)))
+    registry.sql_statements.observe((endpoint,), g.sql_count)
+    registry.sql_duration.observe((endpoint,), g.sql_time)
+
+    # Streamed bodies have no length up front and are skipped
+    size = response.calculate_content_length()
+    if size is not None:
+        registry.response_size.observe((endpoint,), size)
+
+    return response
+
+
+def export_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """Attach request instrumentation and the /metrics endpoint to an app"""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    # Listeners live on the Engine class so they cover engines created
+    # lazily after this call, and are only attached once per process
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule("/metrics", "metrics", export_metrics)
@@ -18,6 +18,7 @@ class User(db.Model):
     # Relationships
     campsites = db.relationship("Campsite", backref="host", lazy=True)
     bookings = db.relationship("Booking", backref="user", lazy=True)
+    archived_bookings = db.relationship("ArchivedBooking", backref="user", lazy=True)
     reviews = db.relationship("Review", backref="user", lazy=True)
 
     def set_password(self, password):
@@ -49,10 +50,39 @@ class Campsite(db.Model):
     image_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Optional position; geo_band is derived from it (see geo.py)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_band = db.Column(db.Integer)
+
+    # Aggregates kept up to date by campsite_stats.py, for sorting
+    average_rating = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    booking_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )  # confirmed and paid bookings
+
+    # Bumped by availability_index.py whenever the nights taken change
+    availability_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+
     # Relationships
     bookings = db.relationship("Booking", backref="campsite", lazy=True)
+    archived_bookings = db.relationship(
+        "ArchivedBooking", backref="campsite", lazy=True
+    )
     reviews = db.relationship("Review", backref="campsite", lazy=True)
 
+    # One index per sort option; id breaks ties for cursor pagination
+    __table_args__ = (
+        db.Index("ix_campsite_price", "price", "id"),
+        db.Index("ix_campsite_rating", "average_rating", "id"),
+        db.Index("ix_campsite_popularity", "booking_count", "id"),
+        db.Index("ix_campsite_created", "created_at", "id"),
+        db.Index("ix_campsite_geo", "geo_band", "longitude"),
+    )
+
     def get_average_rating(self):
         """Calculate average rating from reviews"""
         if not self.reviews:
@@ -69,8 +99,10 @@ class Campsite(db.Model):
             "host_id": self.host_id,
             "host_name": self.host.name,
             "image_url": self.image_url,
-            "average_rating": round(self.get_average_rating(), 1),
-            "review_count": len(self.reviews),
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "average_rating": round(self.average_rating, 1),
+            "review_count": self.review_count,
             "created_at": self.created_at.isoformat(),
         }
 
@@ -89,6 +121,50 @@ class Booking(db.Model):
     total_price = db.Column(db.Float, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Availability checks and the booking_count aggregate filter on both;
+    # archival (archive.py) scans by end_date
+    __table_args__ = (
+        db.Index("ix_booking_campsite_status", "campsite_id", "status"),
+        db.Index("ix_booking_end_date", "end_date"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "user_name": self.user.name,
+            "campsite_id": self.campsite_id,
+            "campsite_title": self.campsite.title,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "status": self.status,
+            "total_price": self.total_price,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class ArchivedBooking(db.Model):
+    """A finished booking moved out of the booking table (see archive.py)
+
+    Rows keep the id, columns and meaning they had as a Booking and are
+    read only when a request asks for history.
+    """
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20))
+    total_price = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_archived_booking_user", "user_id", "created_at"),
+        db.Index("ix_archived_booking_campsite_status", "campsite_id", "status"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -101,6 +177,7 @@ class Booking(db.Model):
             "status": self.status,
             "total_price": self.total_price,
             "created_at": self.created_at.isoformat(),
+            "archived": True,
         }
 
 
@@ -109,7 +186,9 @@ class Review(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), nullable=False)
+    campsite_id = db.Column(
+        db.Integer, db.ForeignKey("campsite.id"), nullable=False, index=True
+    )
     rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -124,3 +203,201 @@ class Review(db.Model):
             "comment": self.comment,
             "created_at": self.created_at.isoformat(),
         }
+
+
+class ChangeEvent(db.Model):
+    """Append-only log of campsite, booking and review writes
+
+    Rows are added in the same transaction as the write they describe (see
+    change_log.py); the id is the cursor consumers resume from.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # campsite, booking, review
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index("ix_change_event_entity", "entity", "entity_id", "id"),)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "entity": self.entity,
+            "entity_id": self.entity_id,
+            "action": self.action,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class PricingRule(db.Model):
+    """Host-defined adjustment to a campsite's nightly price
+
+    weekend and season rules multiply the price of the nights they cover
+    and are materialized into the campsite's PriceNight calendar;
+    length_of_stay rules multiply the total of stays of at least min_nights.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    campsite_id = db.Column(
+        db.Integer, db.ForeignKey("campsite.id"), nullable=False, index=True
+    )
+    kind = db.Column(db.String(20), nullable=False)  # weekend, season, length_of_stay
+    multiplier = db.Column(db.Float, nullable=False)
+    start_date = db.Column(db.Date)  # season only, inclusive
+    end_date = db.Column(db.Date)  # season only, exclusive
+    min_nights = db.Column(db.Integer)  # length_of_stay only
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "campsite_id": self.campsite_id,
+            "kind": self.kind,
+            "multiplier": self.multiplier,
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "end_date": self.end_date.isoformat() if self.end_date else None,
+            "min_nights": self.min_nights,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class PriceCalendar(db.Model):
+    """Range of nights materialized in a campsite's PriceNight rows"""
+
+    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), primary_key=True)
+    first_night = db.Column(db.Date, nullable=False)
+    last_night = db.Column(db.Date, nullable=False)
+
+
+class PriceNight(db.Model):
+    """One night of a campsite's materialized price calendar
+
+    cumulative is the sum of the prices of every earlier night in the
+    calendar, so a stay costs end.cumulative - start.cumulative.
+    """
+
+    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    cumulative = db.Column(db.Float, nullable=False)
+
+
+class Blackout(db.Model):
+    """Nights a host has blocked on a campsite, from start_date to end_date
+
+    A campsite's ranges are kept merged, so they never overlap or touch
+    (see availability.py).
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)  # inclusive
+    end_date = db.Column(db.Date, nullable=False)  # exclusive
+
+    __table_args__ = (db.Index("ix_blackout_campsite_end", "campsite_id", "end_date"),)
+
+    def to_dict(self):
+        return {
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+        }
+
+
+class WaitlistEntry(db.Model):
+    """A guest waiting for a booked-out stay at a campsite
+
+    waiting entries are offered a hold when their nights free up (see
+    waitlist.py); an offered entry holds the nights until hold_expires_at.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("user.id"), nullable=False, index=True
+    )
+    campsite_id = db.Column(db.Integer, db.ForeignKey("campsite.id"), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    status = db.Column(
+        db.String(20), default="waiting"
+    )  # waiting, offered, booked, expired, cancelled
+    hold_expires_at = db.Column(db.DateTime)
+    booking_id = db.Column(db.Integer, db.ForeignKey("booking.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_waitlist_match", "campsite_id", "status", "start_date"),
+        db.Index("ix_waitlist_hold", "status", "hold_expires_at"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "campsite_id": self.campsite_id,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "status": self.status,
+            "hold_expires_at": (
+                self.hold_expires_at.isoformat() if self.hold_expires_at else None
+            ),
+            "booking_id": self.booking_id,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class OutboxMessage(db.Model):
+    """A notification waiting to be delivered
+
+    Rows are added in the same transaction as the booking, payment, review
+    or waitlist change they announce (see outbox.py) and deleted once every
+    sink has accepted them. Messages that keep failing are left as dead.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(40), nullable=False)  # e.g. booking.confirmed
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(10), nullable=False, default="pending")  # or dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index("ix_outbox_due", "status", "next_attempt_at", "id"),)
+
+
+class BookingTransition(db.Model):
+    """Append-only record of a booking's status changing
+
+    Rows are added in the same transaction as the change (see audit_log.py)
+    and never updated. booking_id and campsite_id carry no foreign keys so
+    the history outlives the rows it describes.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False)
+    campsite_id = db.Column(db.Integer, nullable=False)
+    actor_id = db.Column(db.Integer)  # user making the request, if any
+    source = db.Column(db.String(60), nullable=False)  # endpoint, or "system"
+    from_status = db.Column(db.String(20))  # None when the booking is created
+    to_status = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_booking_transition_booking", "booking_id", "id"),
+        db.Index("ix_booking_transition_campsite", "campsite_id", "id"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "booking_id": self.booking_id,
+            "campsite_id": self.campsite_id,
+            "actor_id": self.actor_id,
+            "source": self.source,
+            "from_status": self.from_status,
+            "to_status": self.to_status,
+            "amount": self.amount,
+            "created_at": self.created_at.isoformat(),
+        }
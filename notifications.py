@@ -0,0 +1,156 @@
+"""
+Notification sinks fed by the outbox worker (outbox.py)
+
+A sink takes one message at a time, a dict with id, topic, created_at,
+recipient (the email address of the user it concerns, if any) and
+payload, and raises to have it retried. close() is called after every
+batch, so a sink can keep a connection open across one batch.
+
+Without SMTP_HOST, emails go to DebugSink, which logs them and keeps the
+last few in memory, instead of a mail server. NOTIFY_WEBHOOK_URL adds a
+WebhookSink posting every message as JSON.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import smtplib
+from collections import deque
+from email.message import EmailMessage
+
+import requests
+
+DEFAULT_SMTP_PORT = 25
+DEFAULT_SENDER = "no-reply@camping-api.local"
+DEFAULT_WEBHOOK_TIMEOUT = 5
+DEBUG_HISTORY = 100
+
+SUBJECTS = {
+    "booking.confirmed": "Booking #{booking_id} is confirmed",
+    "booking.cancelled": "Booking #{booking_id} was cancelled",
+    "payment.received": "Payment received for booking #{booking_id}",
+    "review.created": "New {rating}-star review of campsite #{campsite_id}",
+    "waitlist.offered": "Campsite #{campsite_id} is on hold for you",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def render_email(message):
+    """Subject and plain-text body for a message"""
+    payload = message["payload"]
+    subject = SUBJECTS.get(message["topic"], message["topic"]).format(**payload)
+    body = "\n".join(
+        f"{key.replace('_', ' ')}: {value}"
+        for key, value in payload.items()
+        if key != "recipient_id" and value is not None
+    )
+    return subject, body
+
+
+class Sink:
+    def send(self, message):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class DebugSink(Sink):
+    """Logs emails instead of sending them, keeping the most recent"""
+
+    def __init__(self):
+        self.sent = deque(maxlen=DEBUG_HISTORY)
+
+    def send(self, message):
+        if not message["recipient"]:
+            return
+        subject, body = render_email(message)
+        self.sent.append({"to": message["recipient"], "subject": subject, "body": body})
+        logger.info("Email to %s: %s\n%s", message["recipient"], subject, body)
+
+
+class SMTPSink(Sink):
+    """Sends emails over one SMTP connection per batch"""
+
+    def __init__(self, host, port=DEFAULT_SMTP_PORT, sender=DEFAULT_SENDER):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self._smtp = None
+
+    def send(self, message):
+        if not message["recipient"]:
+            return
+        subject, body = render_email(message)
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message["recipient"]
+        email["Subject"] = subject
+        email["Message-ID"] = f"<outbox-{message['id']}@{self.sender.split('@')[-1]}>"
+        email.set_content(body)
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP(self.host, self.port, timeout=10)
+        self._smtp.send_message(email)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+
+class WebhookSink(Sink):
+    """POSTs each message as JSON, signed with HMAC-SHA256 when given a secret"""
+
+    def __init__(self, url, secret=None, timeout=DEFAULT_WEBHOOK_TIMEOUT):
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, message):
+        body = json.dumps(message, separators=(",", ":")).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-Outbox-Message-Id": str(message["id"]),
+            "X-Outbox-Topic": message["topic"],
+        }
+        if self.secret:
+            digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Outbox-Signature"] = f"sha256={digest}"
+        response = self.session.post(
+            self.url, data=body, headers=headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+def sinks_from_config(config):
+    """Sinks for an app's config, falling back to the environment"""
+
+    def setting(name, default=None):
+        return config.get(name) or os.environ.get(name) or default
+
+    sender = setting("MAIL_SENDER", DEFAULT_SENDER)
+    smtp_host = setting("SMTP_HOST")
+    if smtp_host:
+        sinks = [
+            SMTPSink(smtp_host, int(setting("SMTP_PORT", DEFAULT_SMTP_PORT)), sender)
+        ]
+    else:
+        sinks = [DebugSink()]
+
+    webhook_url = setting("NOTIFY_WEBHOOK_URL")
+    if webhook_url:
+        sinks.append(
+            WebhookSink(
+                webhook_url,
+                setting("NOTIFY_WEBHOOK_SECRET"),
+                float(setting("NOTIFY_WEBHOOK_TIMEOUT", DEFAULT_WEBHOOK_TIMEOUT)),
+            )
+        )
+    return sinks
@@ -0,0 +1,362 @@
+"""
+Transactional outbox for booking, payment, review and waitlist notifications
+
+Every ORM flush that confirms, cancels or pays for a booking, adds a
+review or offers a waitlist hold appends an OutboxMessage on the same
+connection, so a notification is queued if and only if the change itself
+commits, and no request waits on a mail server or webhook.
+
+A worker drains the outbox in batches of OUTBOX_BATCH_SIZE, oldest due
+first, handing each message to every sink (notifications.py). Delivered
+messages are deleted; failed ones are retried with exponential backoff
+starting at OUTBOX_RETRY_SECONDS and marked dead after
+OUTBOX_MAX_ATTEMPTS. Delivery is at least once: sinks may see a message
+again after a retry or a worker crash and should dedupe on its id.
+
+The worker runs on a background thread every OUTBOX_POLL_INTERVAL
+seconds, or as its own process with `flask --app app drain-outbox --watch`
+(set OUTBOX_POLL_INTERVAL=0 on the web processes then). Queue depth and
+lag are exported at /metrics.
+"""
+
+import json
+import time
+from datetime import date, datetime, timedelta
+from threading import Event, Lock, Thread
+
+import click
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.orm import Session, attributes
+
+from metrics import registry
+from models import db, Booking, Campsite, OutboxMessage, Review, User, WaitlistEntry
+from notifications import sinks_from_config
+
+DEFAULT_POLL_INTERVAL = 2
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_RETRY_SECONDS = 10
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+# A claimed batch is not handed to another worker for this long, and is
+# picked up again after it if the worker died while delivering it
+LEASE = timedelta(minutes=10)
+
+BOOKING_TOPICS = {
+    "confirmed": "booking.confirmed",
+    "cancelled": "booking.cancelled",
+    "paid": "payment.received",
+}
+
+
+def _status_changed_to(session, obj):
+    """The status obj was created with or changed to in this flush, if any"""
+    if obj in session.new:
+        return obj.status
+    if attributes.get_history(obj, "status").has_changes():
+        return obj.status
+    return None
+
+
+def _stay(obj):
+    return {
+        "campsite_id": obj.campsite_id,
+        "start_date": obj.start_date,
+        "end_date": obj.end_date,
+    }
+
+
+def _messages_for(session):
+    messages = []
+    reviews = []
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Booking):
+            topic = BOOKING_TOPICS.get(_status_changed_to(session, obj))
+            if topic:
+                payload = {"booking_id": obj.id, "recipient_id": obj.user_id}
+                payload.update(_stay(obj), total_price=obj.total_price)
+                messages.append((topic, payload))
+        elif isinstance(obj, WaitlistEntry):
+            if _status_changed_to(session, obj) == "offered":
+                payload = {"entry_id": obj.id, "recipient_id": obj.user_id}
+                payload.update(_stay(obj), hold_expires_at=obj.hold_expires_at)
+                messages.append(("waitlist.offered", payload))
+        elif isinstance(obj, Review) and obj in session.new:
+            reviews.append(obj)
+
+    if reviews:
+        # Reviews notify the campsite's host
+        hosts = dict(
+            session.connection()
+            .execute(
+                select(Campsite.id, Campsite.host_id).where(
+                    Campsite.id.in_({review.campsite_id for review in reviews})
+                )
+            )
+            .all()
+        )
+        for review in reviews:
+            payload = {
+                "review_id": review.id,
+                "recipient_id": hosts.get(review.campsite_id),
+                "campsite_id": review.campsite_id,
+                "rating": review.rating,
+                "comment": review.comment,
+            }
+            messages.append(("review.created", payload))
+    return messages
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _record_messages(session, flush_context):
+    # Runs after the flush statements (so new rows have ids) but before the
+    # commit, on the same connection and therefore in the same transaction
+    messages = _messages_for(session)
+    if not messages:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "topic": topic,
+            "payload": json.dumps(payload, default=_encode),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for topic, payload in messages
+    ]
+    session.connection().execute(OutboxMessage.__table__.insert(), rows)
+
+
+def retry_delay(attempts, base):
+    """Backoff before the next try of a message that has failed attempts times"""
+    return min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+class OutboxWorker:
+    """Delivers outbox messages to sinks in batches"""
+
+    def __init__(self, sinks, batch_size, max_attempts, retry_base):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self._lock = Lock()
+
+    def _claim(self):
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            select(
+                OutboxMessage.id,
+                OutboxMessage.topic,
+                OutboxMessage.payload,
+                OutboxMessage.attempts,
+                OutboxMessage.created_at,
+            )
+            .where(
+                OutboxMessage.status == "pending",
+                OutboxMessage.next_attempt_at <= now,
+            )
+            .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if rows:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_([row.id for row in rows]))
+                .values(next_attempt_at=now + LEASE)
+            )
+        return rows
+
+    def _recipients(self, payloads):
+        user_ids = {p["recipient_id"] for p in payloads if p.get("recipient_id")}
+        if not user_ids:
+            return {}
+        return dict(db.session.query(User.id, User.email).filter(User.id.in_(user_ids)))
+
+    def _deliver(self, message):
+        for sink in self.sinks:
+            sink.send(message)
+
+    def run_once(self):
+        """Deliver one batch of due messages; returns how many were claimed"""
+        with self._lock:
+            rows = self._claim()
+            payloads = [json.loads(row.payload) for row in rows]
+            emails = self._recipients(payloads)
+            # Commit the claim so slow sinks never hold a database transaction
+            db.session.commit()
+
+            delivered, failed = [], []
+            try:
+                for row, payload in zip(rows, payloads):
+                    message = {
+                        "id": row.id,
+                        "topic": row.topic,
+                        "created_at": row.created_at.isoformat(),
+                        "recipient": emails.get(payload.get("recipient_id")),
+                        "payload": payload,
+                    }
+                    try:
+                        self._deliver(message)
+                    except Exception as e:
+                        failed.append((row, f"{type(e).__name__}: {e}"))
+                    else:
+                        delivered.append(row)
+            finally:
+                for sink in self.sinks:
+                    sink.close()
+
+            self._finish(delivered, failed)
+            return len(rows)
+
+    def _finish(self, delivered, failed):
+        now = datetime.utcnow()
+        if delivered:
+            OutboxMessage.query.filter(
+                OutboxMessage.id.in_([row.id for row in delivered])
+            ).delete(synchronize_session=False)
+        if failed:
+            table = OutboxMessage.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(
+                    attempts=bindparam("attempts"),
+                    status=bindparam("status"),
+                    next_attempt_at=bindparam("retry_at"),
+                    last_error=bindparam("error"),
+                ),
+                [
+                    {
+                        "row_id": row.id,
+                        "attempts": row.attempts + 1,
+                        "status": (
+                            "dead"
+                            if row.attempts + 1 >= self.max_attempts
+                            else "pending"
+                        ),
+                        "retry_at": now
+                        + retry_delay(row.attempts + 1, self.retry_base),
+                        "error": error[:1000],
+                    }
+                    for row, error in failed
+                ],
+            )
+        db.session.commit()
+
+        for row in delivered:
+            registry.outbox_deliveries.inc((row.topic, "delivered"))
+            registry.outbox_delivery_lag.observe(
+                (row.topic,), (now - row.created_at).total_seconds()
+            )
+        for row, error in failed:
+            dead = row.attempts + 1 >= self.max_attempts
+            registry.outbox_deliveries.inc((row.topic, "dead" if dead else "retry"))
+
+    def drain(self):
+        """Deliver batches until none are due, then record depth and lag"""
+        while self.run_once() == self.batch_size:
+            pass
+        record_queue_metrics()
+
+
+def record_queue_metrics():
+    """Export outbox depth by status and the age of the oldest pending message"""
+    depth = {"pending": 0, "dead": 0}
+    oldest = None
+    for status, count, first in db.session.query(
+        OutboxMessage.status,
+        db.func.count(OutboxMessage.id),
+        db.func.min(OutboxMessage.created_at),
+    ).group_by(OutboxMessage.status):
+        depth[status] = count
+        if status == "pending":
+            oldest = first
+    db.session.commit()
+
+    for status, count in depth.items():
+        registry.outbox_depth.set((status,), count)
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    registry.outbox_lag.set((), lag)
+
+
+class OutboxWorkerThread(Thread):
+    """Daemon thread draining the outbox every interval seconds"""
+
+    def __init__(self, app, worker, interval):
+        super().__init__(name="outbox-worker", daemon=True)
+        self.app = app
+        self.worker = worker
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.worker.drain()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Outbox delivery failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def get_outbox_worker(app):
+    return app.extensions["outbox_worker"]
+
+
+def init_outbox(app):
+    """Queue notifications on every flush and deliver them in the background"""
+    app.config.setdefault("OUTBOX_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)
+    app.config.setdefault("OUTBOX_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    app.config.setdefault("OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    app.config.setdefault("OUTBOX_RETRY_SECONDS", DEFAULT_RETRY_SECONDS)
+
+    if not event.contains(Session, "after_flush", _record_messages):
+        event.listen(Session, "after_flush", _record_messages)
+
+    worker = OutboxWorker(
+        sinks_from_config(app.config),
+        batch_size=app.config["OUTBOX_BATCH_SIZE"],
+        max_attempts=app.config["OUTBOX_MAX_ATTEMPTS"],
+        retry_base=timedelta(seconds=app.config["OUTBOX_RETRY_SECONDS"]),
+    )
+    app.extensions["outbox_worker"] = worker
+    interval = app.config["OUTBOX_POLL_INTERVAL"]
+
+    @app.cli.command("drain-outbox")
+    @click.option("--watch", is_flag=True, help="Keep polling as a worker process")
+    def drain_outbox(watch):
+        """Deliver due notifications, once or continuously"""
+        while True:
+            worker.drain()
+            if not watch:
+                break
+            time.sleep(interval or DEFAULT_POLL_INTERVAL)
+
+    if not interval:
+        return
+
+    # Started by the first request so building an app never spawns threads
+    start_lock = Lock()
+
+    def start_worker():
+        if "outbox_worker_thread" in app.extensions:
+            return
+        with start_lock:
+            if "outbox_worker_thread" not in app.extensions:
+                thread = OutboxWorkerThread(app, worker, interval)
+                app.extensions["outbox_worker_thread"] = thread
+                thread.start()
+
+    app.before_request(start_worker)
@@ -0,0 +1,42 @@
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the sort key of the last row of a page, encoded as opaque
+URL-safe text. The next page is the rows strictly after that key in sort
+order, which an index on the sort columns answers without counting or
+skipping earlier rows, unlike OFFSET.
+"""
+
+import base64
+from datetime import datetime
+import json
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(*values):
+    def default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+    raw = json.dumps(values, default=default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Values encoded by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after_key(columns, values, descending=False):
+    """Filter for rows after values in (columns...) order"""
+    key = tuple_(*columns)
+    return key < tuple(values) if descending else key > tuple(values)
@@ -0,0 +1,324 @@
+"""
+Per-night pricing with precomputed price calendars
+
+A campsite's nightly price is its base price multiplied by every weekend
+or season rule covering that night. Campsites with such rules get a price
+calendar: one PriceNight row per night holding the price and the prefix
+sum of all earlier nights, so the total of any stay inside the calendar is
+end.cumulative - start.cumulative, whatever its length. Campsites without
+a calendar cost their base price every night. Length-of-stay rules then
+scale the whole total.
+
+Calendars cover CALENDAR_DAYS from when they are built and are extended on
+demand when a stay ends past them. Changing a rule reprices only the
+nights it covers and shifts the prefix sums after them in one UPDATE.
+Booking, quotes and search all read totals through this module.
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, insert, select, union
+from sqlalchemy.orm import aliased
+
+from models import db, Campsite, PricingRule, PriceCalendar, PriceNight
+
+NIGHTLY_KINDS = ("weekend", "season")
+RULE_KINDS = NIGHTLY_KINDS + ("length_of_stay",)
+
+# Friday and Saturday nights, as date.weekday() values
+WEEKEND_NIGHTS = (4, 5)
+
+CALENDAR_DAYS = 365
+ONE_NIGHT = timedelta(days=1)
+
+
+def parse_stay(start_raw, end_raw):
+    """Parse and validate YYYY-MM-DD stay dates, raising ValueError"""
+    try:
+        start = datetime.strptime(start_raw, "%Y-%m-%d").date()
+        end = datetime.strptime(end_raw, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD")
+
+    if start >= end:
+        raise ValueError("End date must be after start date")
+    if start < date.today():
+        raise ValueError("Start date cannot be in the past")
+    return start, end
+
+
+def parse_season(start_raw, end_raw):
+    """Parse a season rule's YYYY-MM-DD dates, raising ValueError"""
+    try:
+        start = datetime.strptime(start_raw, "%Y-%m-%d").date()
+        end = datetime.strptime(end_raw, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError("Season rules need start_date and end_date as YYYY-MM-DD")
+
+    if start >= end:
+        raise ValueError("End date must be after start date")
+    return start, end
+
+
+def parse_min_nights(raw):
+    """Parse a length of stay rule's min_nights, raising ValueError"""
+    try:
+        min_nights = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError("Length of stay rules need integer min_nights")
+
+    if min_nights < 1:
+        raise ValueError("Minimum nights must be at least 1")
+    return min_nights
+
+
+def rule_values(data):
+    """Column values for a new pricing rule, raising ValueError"""
+    if not isinstance(data, dict) or "kind" not in data or "multiplier" not in data:
+        raise ValueError("Kind and multiplier are required")
+    if data["kind"] not in RULE_KINDS:
+        raise ValueError(f"Kind must be one of: {', '.join(RULE_KINDS)}")
+    try:
+        multiplier = float(data["multiplier"])
+    except (TypeError, ValueError):
+        raise ValueError("Invalid multiplier format")
+    if multiplier <= 0:
+        raise ValueError("Multiplier must be greater than 0")
+
+    values = {"kind": data["kind"], "multiplier": multiplier}
+    if values["kind"] == "season":
+        values["start_date"], values["end_date"] = parse_season(
+            data.get("start_date"), data.get("end_date")
+        )
+    if values["kind"] == "length_of_stay":
+        values["min_nights"] = parse_min_nights(data.get("min_nights"))
+    return values
+
+
+def night_price(base_price, rules, night):
+    price = base_price
+    for rule in rules:
+        if rule.kind == "weekend" and night.weekday() in WEEKEND_NIGHTS:
+            price *= rule.multiplier
+        elif rule.kind == "season" and rule.start_date <= night < rule.end_date:
+            price *= rule.multiplier
+    return round(price, 2)
+
+
+def length_of_stay_multiplier(rules, nights):
+    """Multiplier of the longest length_of_stay tier the stay reaches"""
+    tiers = [
+        rule
+        for rule in rules
+        if rule.kind == "length_of_stay" and rule.min_nights <= nights
+    ]
+    if not tiers:
+        return 1
+    return max(tiers, key=lambda rule: (rule.min_nights, rule.id)).multiplier
+
+
+def stay_total(base_price, nights, start_cumulative, end_cumulative, multiplier):
+    """Total of a stay from its calendar bounds, or flat without a calendar"""
+    if start_cumulative is None or end_cumulative is None:
+        total = nights * base_price
+    else:
+        total = end_cumulative - start_cumulative
+    return round(total * (multiplier or 1), 2)
+
+
+def _nightly_rules(campsite_id):
+    return PricingRule.query.filter(
+        PricingRule.campsite_id == campsite_id,
+        PricingRule.kind.in_(NIGHTLY_KINDS),
+    ).all()
+
+
+def _calendar_rows(campsite, rules, first, last, cumulative):
+    rows = []
+    night = first
+    while night <= last:
+        price = night_price(campsite.price, rules, night)
+        rows.append(
+            {
+                "campsite_id": campsite.id,
+                "night": night,
+                "price": price,
+                "cumulative": cumulative,
+            }
+        )
+        cumulative += price
+        night += ONE_NIGHT
+    return rows
+
+
+def extend_calendar(campsite, through):
+    """Materialize nights up to and including through, if not there yet"""
+    calendar = db.session.get(PriceCalendar, campsite.id)
+    if calendar is None or calendar.last_night >= through:
+        return
+
+    last = db.session.get(PriceNight, (campsite.id, calendar.last_night))
+    last_night = max(through, date.today() + timedelta(days=CALENDAR_DAYS))
+    rows = _calendar_rows(
+        campsite,
+        _nightly_rules(campsite.id),
+        calendar.last_night + ONE_NIGHT,
+        last_night,
+        last.cumulative + last.price,
+    )
+    db.session.execute(insert(PriceNight), rows)
+    calendar.last_night = last_night
+
+
+def extend_calendars(through):
+    """Extend every calendar ending before through, ahead of a search"""
+    short = PriceCalendar.query.filter(PriceCalendar.last_night < through).all()
+    for calendar in short:
+        extend_calendar(db.session.get(Campsite, calendar.campsite_id), through)
+    if short:
+        db.session.commit()
+
+
+def priced_campsites(campsite_ids):
+    """Ids among campsite_ids whose calendar a price change must reprice"""
+    campsite_ids = sorted(campsite_ids)
+    calendars = select(PriceCalendar.campsite_id).where(
+        PriceCalendar.campsite_id.in_(campsite_ids)
+    )
+    rules = select(PricingRule.campsite_id).where(
+        PricingRule.campsite_id.in_(campsite_ids),
+        PricingRule.kind.in_(NIGHTLY_KINDS),
+    )
+    return set(db.session.scalars(union(calendars, rules)))
+
+
+def reprice_calendar(campsite, start=None, end=None):
+    """Recompute nights in [start, end) after the campsite's rules changed
+
+    Builds the calendar if the campsite has nightly rules but none yet.
+    Past nights are left alone. Call before committing the rule change.
+    """
+    calendar = db.session.get(PriceCalendar, campsite.id)
+    rules = _nightly_rules(campsite.id)
+
+    if calendar is None:
+        if not rules:
+            return
+        first = date.today()
+        calendar = PriceCalendar(
+            campsite_id=campsite.id,
+            first_night=first,
+            last_night=first + timedelta(days=CALENDAR_DAYS),
+        )
+        db.session.add(calendar)
+        db.session.execute(
+            insert(PriceNight),
+            _calendar_rows(campsite, rules, first, calendar.last_night, 0.0),
+        )
+        return
+
+    start = max(start or calendar.first_night, calendar.first_night, date.today())
+    end = min(end or calendar.last_night + ONE_NIGHT, calendar.last_night + ONE_NIGHT)
+    if start >= end:
+        return
+
+    nights = (
+        PriceNight.query.filter(
+            PriceNight.campsite_id == campsite.id,
+            PriceNight.night >= start,
+            PriceNight.night < end,
+        )
+        .order_by(PriceNight.night)
+        .all()
+    )
+    cumulative = nights[0].cumulative
+    delta = 0.0
+    for row in nights:
+        price = night_price(campsite.price, rules, row.night)
+        delta += price - row.price
+        row.price = price
+        row.cumulative = cumulative
+        cumulative += price
+
+    # Every later prefix sum moves by the same amount
+    if delta:
+        PriceNight.query.filter(
+            PriceNight.campsite_id == campsite.id, PriceNight.night >= end
+        ).update(
+            {PriceNight.cumulative: PriceNight.cumulative + delta},
+            synchronize_session=False,
+        )
+
+
+def rule_range(rule):
+    """Nights a rule's creation or removal reprices, None for all of them"""
+    if rule.kind == "season":
+        return rule.start_date, rule.end_date
+    return None, None
+
+
+def delete_pricing(campsite_id):
+    """Remove a campsite's rules and calendar ahead of deleting it"""
+    for model in (PriceNight, PriceCalendar, PricingRule):
+        model.query.filter(model.campsite_id == campsite_id).delete(
+            synchronize_session=False
+        )
+
+
+def stay_price(campsite, start, end):
+    """Total price of staying at campsite from start to end"""
+    rules = PricingRule.query.filter_by(campsite_id=campsite.id).all()
+    if any(rule.kind in NIGHTLY_KINDS for rule in rules):
+        extend_calendar(campsite, end)
+
+    bounds = dict(
+        db.session.query(PriceNight.night, PriceNight.cumulative).filter(
+            PriceNight.campsite_id == campsite.id,
+            PriceNight.night.in_((start, end)),
+        )
+    )
+    nights = (end - start).days
+    return stay_total(
+        campsite.price,
+        nights,
+        bounds.get(start),
+        bounds.get(end),
+        length_of_stay_multiplier(rules, nights),
+    )
+
+
+def with_stay_prices(query, start, end):
+    """Add each campsite's calendar bounds and stay multiplier to query
+
+    Rows gain start_cumulative, end_cumulative and stay_multiplier after
+    the campsite, ready for stay_total. Run extend_calendars(end) first.
+    """
+    start_night = aliased(PriceNight)
+    end_night = aliased(PriceNight)
+    multiplier = (
+        select(PricingRule.multiplier)
+        .where(
+            PricingRule.campsite_id == Campsite.id,
+            PricingRule.kind == "length_of_stay",
+            PricingRule.min_nights <= (end - start).days,
+        )
+        .order_by(PricingRule.min_nights.desc(), PricingRule.id.desc())
+        .limit(1)
+        .correlate(Campsite)
+        .scalar_subquery()
+    )
+    return (
+        query.outerjoin(
+            start_night,
+            and_(start_night.campsite_id == Campsite.id, start_night.night == start),
+        )
+        .outerjoin(
+            end_night,
+            and_(end_night.campsite_id == Campsite.id, end_night.night == end),
+        )
+        .add_columns(
+            start_night.cumulative.label("start_cumulative"),
+            end_night.cumulative.label("end_cumulative"),
+            multiplier.label("stay_multiplier"),
+        )
+    )
@@ -0,0 +1,106 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, ArchivedBooking, Booking, BookingTransition, Campsite
+
+audit_bp = Blueprint("audit", __name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@audit_bp.route("/bookings/<int:booking_id>/history", methods=["GET"])
+@jwt_required()
+def get_booking_history(booking_id):
+    """Get a booking's status transitions, oldest first (guest or host)"""
+    try:
+        user_id = get_jwt_identity()
+        # History outlives archival, so fall back to the archived row
+        booking = db.session.get(Booking, booking_id) or db.session.get(
+            ArchivedBooking, booking_id
+        )
+
+        if not booking:
+            return jsonify({"error": "Booking not found"}), 404
+
+        host_id = (
+            db.session.query(Campsite.host_id)
+            .filter_by(id=booking.campsite_id)
+            .scalar()
+        )
+        if user_id not in (booking.user_id, host_id):
+            return jsonify({"error": "Access denied"}), 403
+
+        transitions = (
+            BookingTransition.query.filter_by(booking_id=booking_id)
+            .order_by(BookingTransition.id)
+            .all()
+        )
+
+        return (
+            jsonify({"transitions": [t.to_dict() for t in transitions]}),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get booking history"}), 500
+
+
+@audit_bp.route("/campsites/<int:campsite_id>/booking-history", methods=["GET"])
+@jwt_required()
+def get_campsite_booking_history(campsite_id):
+    """Get transitions of a campsite's bookings after a cursor (host only)"""
+    try:
+        user_id = get_jwt_identity()
+        campsite = Campsite.query.get(campsite_id)
+
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        if campsite.host_id != user_id:
+            return (
+                jsonify({"error": "Only the host can view this campsite's history"}),
+                403,
+            )
+
+        # Validate cursor and page size
+        try:
+            since = int(request.args.get("since", 0))
+            limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"error": "since and limit must be integers"}), 400
+
+        if since < 0:
+            return jsonify({"error": "since cannot be negative"}), 400
+
+        if limit < 1 or limit > MAX_LIMIT:
+            return (
+                jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}),
+                400,
+            )
+
+        # Fetch one extra row to know whether another page follows
+        transitions = (
+            BookingTransition.query.filter(
+                BookingTransition.campsite_id == campsite_id,
+                BookingTransition.id > since,
+            )
+            .order_by(BookingTransition.id)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(transitions) > limit
+        transitions = transitions[:limit]
+
+        return (
+            jsonify(
+                {
+                    "transitions": [t.to_dict() for t in transitions],
+                    "next_cursor": transitions[-1].id if transitions else since,
+                    "has_more": has_more,
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get booking history"}), 500
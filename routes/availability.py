@@ -0,0 +1,152 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, Blackout, Campsite
+from availability import (
+    add_blackouts,
+    parse_blackouts,
+    remove_blackouts,
+    unavailable_ranges,
+)
+from datetime import date, datetime, timedelta
+
+availability_bp = Blueprint("availability", __name__)
+
+DEFAULT_CALENDAR_DAYS = 90
+MAX_CALENDAR_DAYS = 366
+
+
+@availability_bp.route("/campsites/<int:campsite_id>/blackouts", methods=["GET"])
+def get_blackouts(campsite_id):
+    """Get a campsite's blackout ranges"""
+    try:
+        campsite = Campsite.query.get(campsite_id)
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        blackouts = (
+            Blackout.query.filter_by(campsite_id=campsite_id)
+            .order_by(Blackout.start_date)
+            .all()
+        )
+
+        return jsonify({"blackouts": [b.to_dict() for b in blackouts]}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get blackouts"}), 500
+
+
+def _change_blackouts(campsite_id, apply, verb):
+    user_id = get_jwt_identity()
+    campsite = Campsite.query.get(campsite_id)
+
+    if not campsite:
+        return jsonify({"error": "Campsite not found"}), 404
+
+    if campsite.host_id != user_id:
+        return jsonify({"error": "Only the host can change blackouts"}), 403
+
+    try:
+        ranges = parse_blackouts(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    apply(campsite_id, ranges)
+    db.session.commit()
+
+    blackouts = (
+        Blackout.query.filter_by(campsite_id=campsite_id)
+        .order_by(Blackout.start_date)
+        .all()
+    )
+
+    return (
+        jsonify(
+            {
+                "message": f"Blackouts {verb} successfully",
+                "blackouts": [b.to_dict() for b in blackouts],
+            }
+        ),
+        200,
+    )
+
+
+@availability_bp.route("/campsites/<int:campsite_id>/blackouts", methods=["POST"])
+@jwt_required()
+def create_blackouts(campsite_id):
+    """Block ranges or recurring weekdays on a campsite (host only)"""
+    try:
+        return _change_blackouts(campsite_id, add_blackouts, "added")
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to add blackouts"}), 500
+
+
+@availability_bp.route("/campsites/<int:campsite_id>/blackouts", methods=["DELETE"])
+@jwt_required()
+def delete_blackouts(campsite_id):
+    """Unblock ranges or recurring weekdays on a campsite (host only)"""
+    try:
+        return _change_blackouts(campsite_id, remove_blackouts, "removed")
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to remove blackouts"}), 500
+
+
+@availability_bp.route("/campsites/<int:campsite_id>/availability", methods=["GET"])
+def get_availability(campsite_id):
+    """Get the booked and blacked-out ranges of a campsite's calendar"""
+    try:
+        campsite = Campsite.query.get(campsite_id)
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        try:
+            start_date = (
+                datetime.strptime(request.args["start_date"], "%Y-%m-%d").date()
+                if "start_date" in request.args
+                else date.today()
+            )
+            end_date = (
+                datetime.strptime(request.args["end_date"], "%Y-%m-%d").date()
+                if "end_date" in request.args
+                else start_date + timedelta(days=DEFAULT_CALENDAR_DAYS)
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+        if start_date >= end_date:
+            return jsonify({"error": "End date must be after start date"}), 400
+
+        if (end_date - start_date).days > MAX_CALENDAR_DAYS:
+            return (
+                jsonify(
+                    {"error": f"Calendars may span at most {MAX_CALENDAR_DAYS} days"}
+                ),
+                400,
+            )
+
+        ranges = unavailable_ranges(campsite_id, start_date, end_date)
+
+        return (
+            jsonify(
+                {
+                    "campsite_id": campsite_id,
+                    "start_date": start_date.isoformat(),
+                    "end_date": end_date.isoformat(),
+                    "unavailable": [
+                        {
+                            "start_date": start.isoformat(),
+                            "end_date": end.isoformat(),
+                            "reason": reason,
+                        }
+                        for start, end, reason in ranges
+                    ],
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get availability"}), 500
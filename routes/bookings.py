@@ -1,24 +1,48 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Booking, Campsite, User
+from models import db, ArchivedBooking, Booking, Campsite, User
+from fieldsets import Fieldset
+from json_provider import STREAM_BATCH_SIZE, stream_json_list
+from pricing import (
+    extend_calendars,
+    parse_stay,
+    stay_price,
+    stay_total,
+    with_stay_prices,
+)
+from availability import overlaps
+from availability_index import AvailabilityConflict, get_index
 from datetime import datetime, date
+from itertools import chain
 
 bookings_bp = Blueprint("bookings", __name__)
 
+MAX_BATCH_SIZE = 50
 
-def check_availability(campsite_id, start_date, end_date, exclude_booking_id=None):
+
+def include_archived():
+    """Whether the request asks for archived bookings too"""
+    return request.args.get("include_archived", "").lower() == "true"
+
+
+def check_availability(campsite, start_date, end_date, exclude_booking_id=None):
     """Check if campsite is available for given dates"""
-    query = Booking.query.filter(
-        Booking.campsite_id == campsite_id,
-        Booking.status.in_(["confirmed", "paid"]),
-        Booking.start_date < end_date,
-        Booking.end_date > start_date,
+    # Blackouts and holds block a stay the same way overlapping bookings do
+    return get_index(current_app).is_available(
+        campsite.id,
+        campsite.availability_version,
+        start_date,
+        end_date,
+        exclude_booking_id,
     )
 
-    if exclude_booking_id:
-        query = query.filter(Booking.id != exclude_booking_id)
 
-    return query.first() is None
+def availability_conflict():
+    """Response for nights taken between checking and booking them"""
+    return (
+        jsonify({"error": "Availability changed while booking, please retry"}),
+        409,
+    )
 
 
 @bookings_bp.route("/bookings", methods=["POST"])
@@ -59,15 +83,19 @@ def create_booking():
             return jsonify({"error": "Start date cannot be in the past"}), 400
 
         # Check availability
-        if not check_availability(campsite.id, start_date, end_date):
+        if not check_availability(campsite, start_date, end_date):
             return (
-                jsonify({"error": "Campsite is not available for selected dates"}),
+                jsonify(
+                    {
+                        "error": "Campsite is not available for selected dates",
+                        "waitlist": "/api/waitlist",
+                    }
+                ),
                 400,
             )
 
-        # Calculate total price
-        nights = (end_date - start_date).days
-        total_price = nights * campsite.price
+        # Price the stay from the campsite's price calendar
+        total_price = stay_price(campsite, start_date, end_date)
 
         # Create booking
         booking = Booking(
@@ -92,33 +120,191 @@ def create_booking():
             201,
         )
 
+    except AvailabilityConflict:
+        db.session.rollback()
+        return availability_conflict()
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to create booking"}), 500
 
 
-@bookings_bp.route("/bookings", methods=["GET"])
+@bookings_bp.route("/bookings/batch", methods=["POST"])
 @jwt_required()
-def get_user_bookings():
-    """Get all bookings for current user"""
+def create_booking_batch():
+    """Book several campsites at once, all or nothing unless partial is set"""
     try:
         user_id = get_jwt_identity()
-        bookings = (
-            Booking.query.filter_by(user_id=user_id)
-            .order_by(Booking.created_at.desc())
-            .all()
-        )
+        data = request.get_json(silent=True)
+        items = data.get("bookings") if isinstance(data, dict) else None
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "bookings must be a non-empty list"}), 400
+
+        if len(items) > MAX_BATCH_SIZE:
+            return (
+                jsonify({"error": f"At most {MAX_BATCH_SIZE} bookings per batch"}),
+                400,
+            )
+
+        partial = data.get("partial", False)
+        if not isinstance(partial, bool):
+            return jsonify({"error": "partial must be true or false"}), 400
+
+        # Validate each item on its own first
+        errors = {}
+        stays = {}
+        for index, item in enumerate(items):
+            campsite_id = item.get("campsite_id") if isinstance(item, dict) else None
+            # bool is a subclass of int, but true is not campsite 1
+            if not isinstance(campsite_id, int) or isinstance(campsite_id, bool):
+                errors[index] = "Campsite ID is required"
+                continue
+            try:
+                start_date, end_date = parse_stay(
+                    item.get("start_date"), item.get("end_date")
+                )
+            except ValueError as e:
+                errors[index] = str(e)
+                continue
+            stays[index] = (campsite_id, start_date, end_date)
+
+        # Load and price the campsites, one query per distinct stay. Keeping
+        # the campsites referenced lets to_dict find them in the session.
+        campsites, prices = {}, {}
+        if stays:
+            extend_calendars(max(end for _, _, end in stays.values()))
+        by_dates = {}
+        for campsite_id, start_date, end_date in stays.values():
+            by_dates.setdefault((start_date, end_date), set()).add(campsite_id)
+        for (start_date, end_date), campsite_ids in by_dates.items():
+            rows = with_stay_prices(
+                Campsite.query.filter(Campsite.id.in_(campsite_ids)),
+                start_date,
+                end_date,
+            )
+            for row in rows:
+                campsite = row[0]
+                campsites[campsite.id] = campsite
+                prices[campsite.id, start_date, end_date] = stay_total(
+                    campsite.price,
+                    (end_date - start_date).days,
+                    row.start_cumulative,
+                    row.end_cumulative,
+                    row.stay_multiplier,
+                )
+
+        # Check every stay against existing bookings, blackouts and holds, and
+        # against earlier stays in the same batch
+        taken = {}
+        if stays:
+            taken = get_index(current_app).taken_ranges(
+                {c.id: c.availability_version for c in campsites.values()},
+                min(start for _, start, _ in stays.values()),
+                max(end for _, _, end in stays.values()),
+            )
+        bookings = {}
+        for index, (campsite_id, start_date, end_date) in stays.items():
+            if (campsite_id, start_date, end_date) not in prices:
+                errors[index] = "Campsite not found"
+            elif overlaps(taken[campsite_id], start_date, end_date):
+                errors[index] = "Campsite is not available for selected dates"
+            else:
+                taken[campsite_id].append((start_date, end_date))
+                bookings[index] = Booking(
+                    user_id=user_id,
+                    campsite_id=campsite_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    total_price=prices[campsite_id, start_date, end_date],
+                    status="confirmed",
+                )
+
+        if errors and not partial:
+            bookings = {}
+
+        created = {}
+        if bookings:
+            db.session.add_all(bookings.values())
+            db.session.flush()
+            # Serialized before the commit expires them
+            created = {index: b.to_dict() for index, b in bookings.items()}
+            db.session.commit()
+
+        results = []
+        for index in range(len(items)):
+            if index in created:
+                results.append(
+                    {"index": index, "status": "created", "booking": created[index]}
+                )
+            elif index in errors:
+                results.append(
+                    {"index": index, "status": "failed", "error": errors[index]}
+                )
+            else:
+                results.append({"index": index, "status": "skipped"})
 
         return (
             jsonify(
                 {
-                    "bookings": [booking.to_dict() for booking in bookings],
-                    "total": len(bookings),
+                    "message": f"{len(created)} of {len(items)} bookings created",
+                    "results": results,
                 }
             ),
-            200,
+            201 if created else 400,
         )
 
+    except AvailabilityConflict:
+        db.session.rollback()
+        return availability_conflict()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to create bookings"}), 500
+
+
+@bookings_bp.route("/bookings", methods=["GET"])
+@jwt_required()
+def get_user_bookings():
+    """Get all bookings for current user"""
+    try:
+        user_id = get_jwt_identity()
+        try:
+            fieldset = Fieldset.from_args(Booking, request.args)
+            archived_fieldset = Fieldset.from_args(ArchivedBooking, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        bookings = fieldset.batched(
+            Booking.query.options(*fieldset.options(Booking.created_at))
+            .filter_by(user_id=user_id)
+            .order_by(Booking.created_at.desc())
+            .yield_per(STREAM_BATCH_SIZE)
+        )
+
+        def serialize_either(booking):
+            if isinstance(booking, ArchivedBooking):
+                return archived_fieldset.serialize(booking)
+            return fieldset.serialize(booking)
+
+        # Archived stays ended long ago, so they follow every current one
+        archived = include_archived()
+        if archived:
+            bookings = chain(
+                bookings,
+                archived_fieldset.batched(
+                    ArchivedBooking.query.options(
+                        *archived_fieldset.options(ArchivedBooking.created_at)
+                    )
+                    .filter_by(user_id=user_id)
+                    .order_by(ArchivedBooking.created_at.desc())
+                    .yield_per(STREAM_BATCH_SIZE)
+                ),
+            )
+        serialize = serialize_either if archived else fieldset.serialize
+
+        return stream_json_list("bookings", bookings, serialize), 200
+
     except Exception as e:
         return jsonify({"error": "Failed to get bookings"}), 500
 
@@ -129,7 +315,28 @@ def get_booking(booking_id):
     """Get specific booking details"""
     try:
         user_id = get_jwt_identity()
-        booking = Booking.query.get(booking_id)
+        try:
+            fieldset = Fieldset.from_args(Booking, request.args)
+            if include_archived():
+                archived_fieldset = Fieldset.from_args(ArchivedBooking, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # The access check below reads user_id and campsite_id
+        booking = db.session.get(
+            Booking,
+            booking_id,
+            options=fieldset.options(Booking.user_id, Booking.campsite_id),
+        )
+        if not booking and include_archived():
+            fieldset = archived_fieldset
+            booking = db.session.get(
+                ArchivedBooking,
+                booking_id,
+                options=fieldset.options(
+                    ArchivedBooking.user_id, ArchivedBooking.campsite_id
+                ),
+            )
 
         if not booking:
             return jsonify({"error": "Booking not found"}), 404
@@ -138,7 +345,8 @@ def get_booking(booking_id):
         if booking.user_id != user_id and booking.campsite.host_id != user_id:
             return jsonify({"error": "Access denied"}), 403
 
-        return jsonify({"booking": booking.to_dict()}), 200
+        fieldset.prefetch([booking])
+        return jsonify({"booking": fieldset.serialize(booking)}), 200
 
     except Exception as e:
         return jsonify({"error": "Failed to get booking"}), 500
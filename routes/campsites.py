@@ -1,10 +1,47 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Campsite, User
+from availability import available_filter, delete_blackouts
+from waitlist import delete_waitlist
+from campsite_bulk import (
+    apply_changes,
+    campsite_changes,
+    campsite_values,
+    import_campsites,
+    read_rows,
+    update_campsites,
+)
+from geo import distance_sq_km, parse_bbox, parse_near, radius_bbox, within_bbox
+from fieldsets import Fieldset
+from json_provider import STREAM_BATCH_SIZE, stream_json_list
+from pagination import after_key, decode_cursor, encode_cursor
+from pricing import (
+    delete_pricing,
+    extend_calendars,
+    parse_stay,
+    reprice_calendar,
+    stay_total,
+    with_stay_prices,
+)
 from sqlalchemy import or_
+from datetime import datetime
+import math
+from sqlalchemy.orm import joinedload
 
 campsites_bp = Blueprint("campsites", __name__)
 
+# sort parameter: (column, descending, parser for the cursor value)
+SORTS = {
+    "price": (Campsite.price, False, float),
+    "-price": (Campsite.price, True, float),
+    "rating": (Campsite.average_rating, True, float),
+    "popularity": (Campsite.booking_count, True, int),
+    "newest": (Campsite.created_at, True, datetime.fromisoformat),
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
 
 @campsites_bp.route("/campsites", methods=["POST"])
 @jwt_required()
@@ -14,33 +51,10 @@ def create_campsite():
         user_id = get_jwt_identity()
         data = request.get_json()
 
-        # Validate required fields
-        required_fields = ["title", "description", "price", "location"]
-        if not data or not all(k in data for k in required_fields):
-            return (
-                jsonify(
-                    {"error": "Title, description, price, and location are required"}
-                ),
-                400,
-            )
-
-        # Validate data types
         try:
-            price = float(data["price"])
-            if price <= 0:
-                return jsonify({"error": "Price must be greater than 0"}), 400
-        except ValueError:
-            return jsonify({"error": "Invalid price format"}), 400
-
-        # Create campsite
-        campsite = Campsite(
-            title=data["title"].strip(),
-            description=data["description"].strip(),
-            price=price,
-            location=data["location"].strip(),
-            host_id=user_id,
-            image_url=data.get("image_url", "").strip(),
-        )
+            campsite = Campsite(**campsite_values(data, user_id))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         db.session.add(campsite)
         db.session.commit()
@@ -60,6 +74,60 @@ def create_campsite():
         return jsonify({"error": "Failed to create campsite"}), 500
 
 
+@campsites_bp.route("/campsites/bulk", methods=["POST"])
+@jwt_required()
+def import_campsites_bulk():
+    """Create many campsites from a JSON array or NDJSON body (host only)"""
+    try:
+        user_id = get_jwt_identity()
+        try:
+            rows = read_rows(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        result = import_campsites(rows, user_id)
+        if not result.ids and not result.errors:
+            return jsonify({"error": "No campsites provided"}), 400
+
+        return (
+            jsonify(
+                {"created": len(result.ids), "ids": result.ids, "errors": result.errors}
+            ),
+            result.status(201),
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to import campsites"}), 500
+
+
+@campsites_bp.route("/campsites/bulk", methods=["PATCH"])
+@jwt_required()
+def update_campsites_bulk():
+    """Update many of the host's campsites, one object with an id per row"""
+    try:
+        user_id = get_jwt_identity()
+        try:
+            rows = read_rows(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        result = update_campsites(rows, user_id)
+        if not result.ids and not result.errors:
+            return jsonify({"error": "No campsites provided"}), 400
+
+        return (
+            jsonify(
+                {"updated": len(result.ids), "ids": result.ids, "errors": result.errors}
+            ),
+            result.status(200),
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to update campsites"}), 500
+
+
 @campsites_bp.route("/campsites", methods=["GET"])
 def get_campsites():
     """Get all campsites with optional search filters"""
@@ -69,13 +137,41 @@ def get_campsites():
         max_price = request.args.get("max_price")
         min_price = request.args.get("min_price")
 
-        # Start with base query
+        try:
+            fieldset = Fieldset.from_args(Campsite, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         query = Campsite.query
 
         # Apply filters
         if location:
             query = query.filter(Campsite.location.ilike(f"%{location}%"))
 
+        bbox = request.args.get("bbox")
+        if bbox is not None:
+            try:
+                query = query.filter(within_bbox(*parse_bbox(bbox)))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # Radius search: the circle's bounding box narrows rows through the
+        # band index before the exact distance is computed
+        distance_sq = None
+        near = request.args.get("near")
+        if near is not None:
+            try:
+                latitude, longitude, radius_km = parse_near(
+                    near, request.args.get("radius_km")
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            distance_sq = distance_sq_km(latitude, longitude)
+            query = query.filter(
+                within_bbox(*radius_bbox(latitude, longitude, radius_km)),
+                distance_sq <= radius_km * radius_km,
+            ).add_columns(distance_sq.label("distance_sq"))
+
         if min_price:
             try:
                 min_price = float(min_price)
@@ -90,14 +186,133 @@ def get_campsites():
             except ValueError:
                 return jsonify({"error": "Invalid max_price format"}), 400
 
-        # Execute query
-        campsites = query.all()
+        # Order by the sort column, then id so every row has a unique key
+        sort = request.args.get("sort", "distance" if near is not None else None)
+        if sort == "distance":
+            if distance_sq is None:
+                return jsonify({"error": "sort=distance requires near"}), 400
+            column, descending, parse_value = distance_sq, False, float
+        elif sort is not None and sort not in SORTS:
+            return (
+                jsonify(
+                    {"error": f"sort must be one of: {', '.join(SORTS)}, distance"}
+                ),
+                400,
+            )
+        else:
+            column, descending, parse_value = SORTS.get(sort, (None, False, None))
+        columns = [Campsite.id] if column is None else [column, Campsite.id]
+        query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+
+        limit = request.args.get("limit")
+        cursor = request.args.get("cursor")
+        if limit is not None or cursor is not None:
+            try:
+                limit = int(limit or DEFAULT_PAGE_SIZE)
+            except ValueError:
+                return jsonify({"error": "Invalid limit format"}), 400
+            if limit < 1 or limit > MAX_PAGE_SIZE:
+                return (
+                    jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}),
+                    400,
+                )
+
+        if cursor is not None:
+            # A cursor only continues the sort it was issued for
+            try:
+                values = decode_cursor(cursor)
+                if len(values) != len(columns) + 1 or values[0] != sort:
+                    raise ValueError("Invalid cursor")
+                key = [int(values[-1])]
+                if parse_value:
+                    key.insert(0, parse_value(values[1]))
+            except (TypeError, ValueError):
+                return jsonify({"error": "Invalid cursor"}), 400
+            query = query.filter(after_key(columns, key, descending))
+
+        # With stay dates, price each result from its calendar
+        nights = None
+        if request.args.get("start_date") or request.args.get("end_date"):
+            try:
+                start_date, end_date = parse_stay(
+                    request.args.get("start_date"), request.args.get("end_date")
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            extend_calendars(end_date)
+            query = with_stay_prices(query, start_date, end_date)
+            nights = (end_date - start_date).days
+
+            if request.args.get("available", "").lower() == "true":
+                query = query.filter(available_filter(start_date, end_date))
+        elif request.args.get("available"):
+            return (
+                jsonify({"error": "available needs start_date and end_date"}),
+                400,
+            )
+
+        # Load only what the requested fields, the cursor and pricing read
+        extra = [] if column is None or column is distance_sq else [column]
+        if nights is not None:
+            extra.append(Campsite.price)
+        query = query.options(*fieldset.options(*extra))
+
+        # Rows carry extra columns after the campsite when pricing or
+        # measuring distance
+        def whole_row(row):
+            return row
+
+        def first_column(row):
+            return row[0]
+
+        def serialize_row(row):
+            campsite = row[0]
+            data = fieldset.serialize(campsite)
+            if nights is not None:
+                data["total_price"] = stay_total(
+                    campsite.price,
+                    nights,
+                    row.start_cumulative,
+                    row.end_cumulative,
+                    row.stay_multiplier,
+                )
+            if distance_sq is not None:
+                data["distance_km"] = round(math.sqrt(row.distance_sq), 2)
+            return data
+
+        extras = nights is not None or distance_sq is not None
+        campsite_of = first_column if extras else whole_row
+        serialize = serialize_row if extras else fieldset.serialize
+
+        if limit is None:
+            # Stream rows out as they are fetched
+            campsites = fieldset.batched(
+                query.yield_per(STREAM_BATCH_SIZE), campsite_of
+            )
+            return stream_json_list("campsites", campsites, serialize), 200
+
+        # Fetch one row past the page to know whether another follows
+        rows = query.limit(limit + 1).all()
+        page, has_more = rows[:limit], len(rows) > limit
+        fieldset.prefetch([campsite_of(row) for row in page])
+        next_cursor = None
+        if has_more:
+            last = campsite_of(page[-1])
+            if column is None:
+                key = [last.id]
+            elif column is distance_sq:
+                key = [page[-1].distance_sq, last.id]
+            else:
+                key = [getattr(last, column.key), last.id]
+            next_cursor = encode_cursor(sort, *key)
 
         return (
             jsonify(
                 {
-                    "campsites": [campsite.to_dict() for campsite in campsites],
-                    "total": len(campsites),
+                    "campsites": [serialize(row) for row in page],
+                    "total": len(page),
+                    "next_cursor": next_cursor,
                 }
             ),
             200,
@@ -111,17 +326,89 @@ def get_campsites():
 def get_campsite(campsite_id):
     """Get single campsite details"""
     try:
-        campsite = Campsite.query.get(campsite_id)
+        try:
+            fieldset = Fieldset.from_args(Campsite, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        campsite = db.session.get(Campsite, campsite_id, options=fieldset.options())
 
         if not campsite:
             return jsonify({"error": "Campsite not found"}), 404
 
-        return jsonify({"campsite": campsite.to_dict()}), 200
+        fieldset.prefetch([campsite])
+        return jsonify({"campsite": fieldset.serialize(campsite)}), 200
 
     except Exception as e:
         return jsonify({"error": "Failed to get campsite"}), 500
 
 
+@campsites_bp.route("/campsites/<int:campsite_id>/similar", methods=["GET"])
+def get_similar_campsites(campsite_id):
+    """Get the campsites most similar to a campsite"""
+    try:
+        try:
+            k = int(request.args.get("k", 10))
+        except ValueError:
+            return jsonify({"error": "Invalid k format"}), 400
+
+        if k < 1 or k > 50:
+            return jsonify({"error": "k must be between 1 and 50"}), 400
+
+        # NumPy and SciPy load on first use rather than at start-up
+        from similarity import get_index
+
+        matches = get_index(current_app).similar(campsite_id, k)
+        if matches is None:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        scores = dict(matches)
+        campsites = {
+            campsite.id: campsite
+            for campsite in Campsite.query.options(joinedload(Campsite.host)).filter(
+                Campsite.id.in_(scores)
+            )
+        }
+
+        similar = []
+        for similar_id, score in matches:
+            # Skip rows deleted since the index last caught up
+            if similar_id in campsites:
+                similar.append({**campsites[similar_id].to_dict(), "similarity": score})
+
+        return jsonify({"campsite_id": campsite_id, "similar": similar}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get similar campsites"}), 500
+
+
+@campsites_bp.route("/campsites/<int:campsite_id>/forecast", methods=["GET"])
+@jwt_required()
+def get_campsite_forecast(campsite_id):
+    """Get expected occupancy for the coming weeks (host only)"""
+    try:
+        user_id = get_jwt_identity()
+        campsite = Campsite.query.get(campsite_id)
+
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        if campsite.host_id != user_id:
+            return jsonify({"error": "Only the host can view forecasts"}), 403
+
+        # NumPy loads with the first forecast rather than at start-up
+        from forecast import get_forecasts
+
+        forecast = get_forecasts(current_app).get(campsite_id)
+        if forecast is None:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        return jsonify(forecast), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get forecast"}), 500
+
+
 @campsites_bp.route("/campsites/<int:campsite_id>", methods=["PUT"])
 @jwt_required()
 def update_campsite(campsite_id):
@@ -141,23 +428,12 @@ def update_campsite(campsite_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        # Update fields if provided
-        if "title" in data:
-            campsite.title = data["title"].strip()
-        if "description" in data:
-            campsite.description = data["description"].strip()
-        if "price" in data:
-            try:
-                price = float(data["price"])
-                if price <= 0:
-                    return jsonify({"error": "Price must be greater than 0"}), 400
-                campsite.price = price
-            except ValueError:
-                return jsonify({"error": "Invalid price format"}), 400
-        if "location" in data:
-            campsite.location = data["location"].strip()
-        if "image_url" in data:
-            campsite.image_url = data["image_url"].strip()
+        try:
+            changes = campsite_changes(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if apply_changes(campsite, changes):
+            reprice_calendar(campsite)
 
         db.session.commit()
 
@@ -191,6 +467,9 @@ def delete_campsite(campsite_id):
         if campsite.host_id != user_id:
             return jsonify({"error": "Only the host can delete this campsite"}), 403
 
+        delete_pricing(campsite.id)
+        delete_blackouts(campsite.id)
+        delete_waitlist(campsite.id)
         db.session.delete(campsite)
         db.session.commit()
 
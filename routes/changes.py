@@ -0,0 +1,53 @@
+from flask import Blueprint, request, jsonify
+from models import ChangeEvent
+
+changes_bp = Blueprint("changes", __name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@changes_bp.route("/changes", methods=["GET"])
+def get_changes():
+    """Get change events after a cursor, oldest first"""
+    try:
+        # Validate cursor and page size
+        try:
+            since = int(request.args.get("since", 0))
+            limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"error": "since and limit must be integers"}), 400
+
+        if since < 0:
+            return jsonify({"error": "since cannot be negative"}), 400
+
+        if limit < 1 or limit > MAX_LIMIT:
+            return (
+                jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}),
+                400,
+            )
+
+        query = ChangeEvent.query.filter(ChangeEvent.id > since)
+
+        entity = request.args.get("entity")
+        if entity:
+            query = query.filter(ChangeEvent.entity == entity)
+
+        # Fetch one extra row to know whether another page follows
+        events = query.order_by(ChangeEvent.id).limit(limit + 1).all()
+        has_more = len(events) > limit
+        events = events[:limit]
+
+        return (
+            jsonify(
+                {
+                    "changes": [change.to_dict() for change in events],
+                    "next_cursor": events[-1].id if events else since,
+                    "has_more": has_more,
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get changes"}), 500
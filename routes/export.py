@@ -0,0 +1,63 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select
+from models import db, Campsite
+from export import FORMATS, export_rows, stream_export
+from datetime import datetime
+
+export_bp = Blueprint("export", __name__)
+
+
+def _parse_date(name):
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    return datetime.strptime(raw, "%Y-%m-%d").date()
+
+
+@export_bp.route("/export/bookings", methods=["GET"])
+@jwt_required()
+def export_bookings():
+    """Stream bookings as CSV or NDJSON (hosts: their campsites; admins: all)"""
+    try:
+        user_id = get_jwt_identity()
+
+        format = request.args.get("format", "csv")
+        if format not in FORMATS:
+            return jsonify({"error": "format must be csv or ndjson"}), 400
+
+        try:
+            start = _parse_date("from")
+            end = _parse_date("to")
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+
+        try:
+            since = int(request.args.get("since", 0))
+        except ValueError:
+            return jsonify({"error": "since must be an integer"}), 400
+
+        if since < 0:
+            return jsonify({"error": "since cannot be negative"}), 400
+
+        campsite_ids = None
+        if user_id not in current_app.config["ADMIN_USER_IDS"]:
+            hosted = db.session.query(Campsite.id).filter_by(host_id=user_id).first()
+            if not hosted:
+                return (
+                    jsonify({"error": "Only hosts and admins can export bookings"}),
+                    403,
+                )
+            campsite_ids = select(Campsite.id).where(Campsite.host_id == user_id)
+
+        rows = export_rows(
+            campsite_ids,
+            start,
+            end,
+            since,
+            archived=request.args.get("include_archived", "").lower() == "true",
+        )
+        return stream_export(rows, format), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to export bookings"}), 500
@@ -0,0 +1,44 @@
+from flask import Blueprint, current_app, request, jsonify
+from location_index import get_index
+
+locations_bp = Blueprint("locations", __name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+@locations_bp.route("/locations/suggest", methods=["GET"])
+def suggest_locations():
+    """Suggest campsite locations starting with a prefix"""
+    try:
+        prefix = request.args.get("prefix", "").strip()
+        if not prefix:
+            return jsonify({"error": "prefix is required"}), 400
+
+        try:
+            limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            return jsonify({"error": "Invalid limit format"}), 400
+
+        if limit < 1 or limit > MAX_LIMIT:
+            return (
+                jsonify({"error": f"limit must be between 1 and {MAX_LIMIT}"}),
+                400,
+            )
+
+        suggestions = get_index(current_app).suggest(prefix, limit)
+
+        return (
+            jsonify(
+                {
+                    "suggestions": [
+                        {"location": location, "count": count}
+                        for location, count in suggestions
+                    ]
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to suggest locations"}), 500
@@ -0,0 +1,140 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, Campsite, PricingRule
+from pricing import parse_stay, reprice_calendar, rule_range, rule_values, stay_price
+
+pricing_bp = Blueprint("pricing", __name__)
+
+
+@pricing_bp.route("/campsites/<int:campsite_id>/pricing-rules", methods=["GET"])
+def get_pricing_rules(campsite_id):
+    """Get all pricing rules for a campsite"""
+    try:
+        campsite = Campsite.query.get(campsite_id)
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        rules = (
+            PricingRule.query.filter_by(campsite_id=campsite_id)
+            .order_by(PricingRule.id)
+            .all()
+        )
+
+        return (
+            jsonify(
+                {
+                    "base_price": campsite.price,
+                    "rules": [rule.to_dict() for rule in rules],
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get pricing rules"}), 500
+
+
+@pricing_bp.route("/campsites/<int:campsite_id>/pricing-rules", methods=["POST"])
+@jwt_required()
+def create_pricing_rule(campsite_id):
+    """Add a pricing rule to a campsite (host only)"""
+    try:
+        user_id = get_jwt_identity()
+        campsite = Campsite.query.get(campsite_id)
+
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        if campsite.host_id != user_id:
+            return jsonify({"error": "Only the host can change pricing"}), 403
+
+        try:
+            values = rule_values(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        rule = PricingRule(campsite_id=campsite.id, **values)
+        db.session.add(rule)
+        if rule.kind != "length_of_stay":
+            reprice_calendar(campsite, *rule_range(rule))
+        db.session.commit()
+
+        return (
+            jsonify(
+                {
+                    "message": "Pricing rule created successfully",
+                    "rule": rule.to_dict(),
+                }
+            ),
+            201,
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to create pricing rule"}), 500
+
+
+@pricing_bp.route(
+    "/campsites/<int:campsite_id>/pricing-rules/<int:rule_id>", methods=["DELETE"]
+)
+@jwt_required()
+def delete_pricing_rule(campsite_id, rule_id):
+    """Remove a pricing rule from a campsite (host only)"""
+    try:
+        user_id = get_jwt_identity()
+        rule = PricingRule.query.filter_by(id=rule_id, campsite_id=campsite_id).first()
+
+        if not rule:
+            return jsonify({"error": "Pricing rule not found"}), 404
+
+        campsite = Campsite.query.get(campsite_id)
+        if campsite.host_id != user_id:
+            return jsonify({"error": "Only the host can change pricing"}), 403
+
+        db.session.delete(rule)
+        if rule.kind != "length_of_stay":
+            reprice_calendar(campsite, *rule_range(rule))
+        db.session.commit()
+
+        return jsonify({"message": "Pricing rule deleted successfully"}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to delete pricing rule"}), 500
+
+
+@pricing_bp.route("/campsites/<int:campsite_id>/quote", methods=["GET"])
+def get_quote(campsite_id):
+    """Price a stay at a campsite"""
+    try:
+        campsite = Campsite.query.get(campsite_id)
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        try:
+            start_date, end_date = parse_stay(
+                request.args.get("start_date"), request.args.get("end_date")
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        total_price = stay_price(campsite, start_date, end_date)
+        # Extending the calendar may have written rows
+        db.session.commit()
+
+        return (
+            jsonify(
+                {
+                    "campsite_id": campsite_id,
+                    "start_date": start_date.isoformat(),
+                    "end_date": end_date.isoformat(),
+                    "nights": (end_date - start_date).days,
+                    "total_price": total_price,
+                }
+            ),
+            200,
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to price stay"}), 500
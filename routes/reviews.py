@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Review, Campsite, Booking
+from models import db, ArchivedBooking, Review, Campsite, Booking
+from fieldsets import Fieldset
+from json_provider import STREAM_BATCH_SIZE, stream_json_list
 
 reviews_bp = Blueprint("reviews", __name__)
 
@@ -36,9 +38,14 @@ def create_review():
             return jsonify({"error": "Invalid rating format"}), 400
 
         # Check if user has stayed at this campsite
-        booking = Booking.query.filter_by(
-            user_id=user_id, campsite_id=campsite_id, status="paid"
-        ).first()
+        booking = (
+            Booking.query.filter_by(
+                user_id=user_id, campsite_id=campsite_id, status="paid"
+            ).first()
+            or ArchivedBooking.query.filter_by(
+                user_id=user_id, campsite_id=campsite_id, status="paid"
+            ).first()
+        )
 
         if not booking:
             return (
@@ -82,37 +89,40 @@ def create_review():
 def get_campsite_reviews(campsite_id):
     """Get all reviews for a specific campsite"""
     try:
+        try:
+            fieldset = Fieldset.from_args(Review, request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         # Validate campsite exists
         campsite = Campsite.query.get(campsite_id)
         if not campsite:
             return jsonify({"error": "Campsite not found"}), 404
 
-        reviews = (
-            Review.query.filter_by(campsite_id=campsite_id)
+        # Ratings are tallied below whichever fields are returned
+        reviews = fieldset.batched(
+            Review.query.options(*fieldset.options(Review.rating, Review.created_at))
+            .filter_by(campsite_id=campsite_id)
             .order_by(Review.created_at.desc())
-            .all()
+            .yield_per(STREAM_BATCH_SIZE)
         )
 
-        # Calculate rating statistics
-        if reviews:
-            ratings = [review.rating for review in reviews]
-            avg_rating = sum(ratings) / len(ratings)
-            rating_counts = {i: ratings.count(i) for i in range(1, 6)}
-        else:
-            avg_rating = 0
-            rating_counts = {i: 0 for i in range(1, 6)}
+        # Rating statistics are tallied as the reviews stream past
+        rating_counts = {i: 0 for i in range(1, 6)}
 
-        return (
-            jsonify(
-                {
-                    "reviews": [review.to_dict() for review in reviews],
-                    "total_reviews": len(reviews),
-                    "average_rating": round(avg_rating, 1),
-                    "rating_breakdown": rating_counts,
-                }
-            ),
-            200,
-        )
+        def serialize(review):
+            rating_counts[review.rating] = rating_counts.get(review.rating, 0) + 1
+            return fieldset.serialize(review)
+
+        def rating_summary(count):
+            total = sum(rating * n for rating, n in rating_counts.items())
+            return {
+                "total_reviews": count,
+                "average_rating": round(total / count, 1) if count else 0,
+                "rating_breakdown": rating_counts,
+            }
+
+        return stream_json_list("reviews", reviews, serialize, rating_summary), 200
 
     except Exception as e:
         return jsonify({"error": "Failed to get reviews"}), 500
@@ -0,0 +1,200 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, Booking, Campsite, WaitlistEntry
+from availability import MAX_HOLD_NIGHTS
+from availability_index import AvailabilityConflict, get_index
+from pricing import parse_stay, stay_price
+from routes.bookings import availability_conflict
+from waitlist import get_matcher, match_waitlist
+from datetime import datetime
+
+waitlist_bp = Blueprint("waitlist", __name__)
+
+
+@waitlist_bp.route("/waitlist", methods=["POST"])
+@jwt_required()
+def join_waitlist():
+    """Wait for a booked-out stay to free up"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json()
+
+        required_fields = ["campsite_id", "start_date", "end_date"]
+        if not data or not all(k in data for k in required_fields):
+            return (
+                jsonify(
+                    {"error": "Campsite ID, start date, and end date are required"}
+                ),
+                400,
+            )
+
+        campsite = Campsite.query.get(data["campsite_id"])
+        if not campsite:
+            return jsonify({"error": "Campsite not found"}), 404
+
+        try:
+            start_date, end_date = parse_stay(data["start_date"], data["end_date"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if (end_date - start_date).days > MAX_HOLD_NIGHTS:
+            return (
+                jsonify(
+                    {"error": f"Waitlist stays may be at most {MAX_HOLD_NIGHTS} nights"}
+                ),
+                400,
+            )
+
+        if get_index(current_app).is_available(
+            campsite.id, campsite.availability_version, start_date, end_date
+        ):
+            return jsonify({"error": "Campsite is available, book it instead"}), 400
+
+        duplicate = WaitlistEntry.query.filter(
+            WaitlistEntry.user_id == user_id,
+            WaitlistEntry.campsite_id == campsite.id,
+            WaitlistEntry.start_date == start_date,
+            WaitlistEntry.end_date == end_date,
+            WaitlistEntry.status.in_(["waiting", "offered"]),
+        ).first()
+        if duplicate:
+            return jsonify({"error": "Already on the waitlist for these dates"}), 400
+
+        entry = WaitlistEntry(
+            user_id=user_id,
+            campsite_id=campsite.id,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        db.session.add(entry)
+        db.session.commit()
+
+        return (
+            jsonify({"message": "Added to the waitlist", "entry": entry.to_dict()}),
+            201,
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to join waitlist"}), 500
+
+
+@waitlist_bp.route("/waitlist", methods=["GET"])
+@jwt_required()
+def get_waitlist():
+    """Get the current user's waitlist entries and holds"""
+    try:
+        user_id = get_jwt_identity()
+        entries = (
+            WaitlistEntry.query.filter_by(user_id=user_id)
+            .order_by(WaitlistEntry.created_at.desc())
+            .all()
+        )
+
+        return jsonify({"entries": [entry.to_dict() for entry in entries]}), 200
+
+    except Exception as e:
+        return jsonify({"error": "Failed to get waitlist"}), 500
+
+
+@waitlist_bp.route("/waitlist/<int:entry_id>", methods=["DELETE"])
+@jwt_required()
+def leave_waitlist(entry_id):
+    """Leave the waitlist, releasing any hold to the next guest"""
+    try:
+        user_id = get_jwt_identity()
+        entry = WaitlistEntry.query.get(entry_id)
+
+        if not entry:
+            return jsonify({"error": "Waitlist entry not found"}), 404
+
+        if entry.user_id != user_id:
+            return jsonify({"error": "Only the guest can leave the waitlist"}), 403
+
+        if entry.status not in ("waiting", "offered"):
+            return jsonify({"error": f"Waitlist entry is already {entry.status}"}), 400
+
+        released = entry.status == "offered"
+        entry.status = "cancelled"
+        if released:
+            db.session.flush()
+            match_waitlist(
+                entry.campsite_id,
+                entry.start_date,
+                entry.end_date,
+                get_matcher(current_app).hold,
+            )
+        db.session.commit()
+
+        return jsonify({"message": "Left the waitlist"}), 200
+
+    except AvailabilityConflict:
+        db.session.rollback()
+        return availability_conflict()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to leave waitlist"}), 500
+
+
+@waitlist_bp.route("/waitlist/<int:entry_id>/book", methods=["POST"])
+@jwt_required()
+def book_hold(entry_id):
+    """Turn an offered hold into a confirmed booking"""
+    try:
+        user_id = get_jwt_identity()
+        entry = WaitlistEntry.query.get(entry_id)
+
+        if not entry:
+            return jsonify({"error": "Waitlist entry not found"}), 404
+
+        if entry.user_id != user_id:
+            return jsonify({"error": "Only the guest can book this hold"}), 403
+
+        if entry.status != "offered" or entry.hold_expires_at <= datetime.utcnow():
+            return jsonify({"error": "No active hold for this entry"}), 400
+
+        campsite = db.session.get(Campsite, entry.campsite_id)
+        if not get_index(current_app).is_available(
+            campsite.id,
+            campsite.availability_version,
+            entry.start_date,
+            entry.end_date,
+            exclude_entry_id=entry.id,
+        ):
+            return (
+                jsonify({"error": "Campsite is not available for selected dates"}),
+                400,
+            )
+
+        booking = Booking(
+            user_id=user_id,
+            campsite_id=entry.campsite_id,
+            start_date=entry.start_date,
+            end_date=entry.end_date,
+            total_price=stay_price(campsite, entry.start_date, entry.end_date),
+            status="confirmed",
+        )
+        db.session.add(booking)
+        db.session.flush()
+        entry.status = "booked"
+        entry.booking_id = booking.id
+        db.session.commit()
+
+        return (
+            jsonify(
+                {
+                    "message": "Booking created successfully",
+                    "booking": booking.to_dict(),
+                }
+            ),
+            201,
+        )
+
+    except AvailabilityConflict:
+        db.session.rollback()
+        return availability_conflict()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to book hold"}), 500
@@ -1,144 +1,538 @@
 """
-Seed script to populate the database with sample data for testing
-Run this after setting up the database: python seed_data.py
+Deterministic synthetic data generator for the Camping API
+
+Run with the defaults for a small demo dataset: python seed_data.py
+Or at production scale:
+
+    python seed_data.py --users 100000 --campsites 50000 \\
+        --bookings 5000000 --reviews 1000000 --seed 42
+
+The same --seed and --today always produce the same rows, apart from the
+salt in the shared password hash. Existing rows are deleted first (the
+schema is left in place) and everything is written with bulk statements:
+COPY on PostgreSQL, executemany elsewhere.
 """
 
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
 from app import create_app
 from models import db, User, Campsite, Booking, Review
-from datetime import date, timedelta
+from campsite_stats import refresh_campsite_stats
+from geo import band_of
+
+DEFAULT_COUNTS = {"users": 50, "campsites": 20, "bookings": 200, "reviews": 60}
+DEFAULT_SEED = 42
+CHUNK_SIZE = 10000
+
+# Every generated account can log in with this password
+DEMO_PASSWORD = "password123"
+
+# Bookings span two years of history and six months ahead
+HISTORY_DAYS = 730
+HORIZON_DAYS = 180
+
+USER_COLUMNS = ("id", "name", "email", "password_hash", "created_at")
+CAMPSITE_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "price",
+    "location",
+    "host_id",
+    "image_url",
+    "created_at",
+    "latitude",
+    "longitude",
+    "geo_band",
+)
+BOOKING_COLUMNS = (
+    "id",
+    "user_id",
+    "campsite_id",
+    "start_date",
+    "end_date",
+    "status",
+    "total_price",
+    "created_at",
+)
+REVIEW_COLUMNS = ("id", "user_id", "campsite_id", "rating", "comment", "created_at")
+
+# fmt: off
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael",
+    "Linda", "David", "Elizabeth", "William", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Maria", "Wei", "Mei",
+    "Aarav", "Priya", "Omar", "Fatima", "Lucas", "Sofia", "Noah", "Emma",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson",
+    "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee",
+    "Chen", "Wang", "Patel", "Singh", "Khan", "Nguyen", "Kim", "Silva",
+    "Cohen", "Murphy",
+]
+# fmt: on
+
+# (location, relative popularity, (latitude, longitude) of its centre) -
+# weighted roughly by park visitor numbers
+LOCATIONS = [
+    ("Great Smoky Mountains, Tennessee", 13.0, (35.61, -83.49)),
+    ("Grand Canyon, Arizona", 6.0, (36.06, -112.14)),
+    ("Zion National Park, Utah", 5.0, (37.3, -113.03)),
+    ("Rocky Mountain National Park, Colorado", 4.5, (40.34, -105.68)),
+    ("Acadia National Park, Maine", 4.0, (44.34, -68.27)),
+    ("Yosemite, California", 4.0, (37.75, -119.59)),
+    ("Yellowstone, Wyoming", 4.0, (44.43, -110.59)),
+    ("Joshua Tree, California", 3.0, (33.87, -115.9)),
+    ("Olympic National Park, Washington", 3.0, (47.8, -123.6)),
+    ("Glacier National Park, Montana", 3.0, (48.7, -113.72)),
+    ("Grand Teton, Wyoming", 3.0, (43.79, -110.68)),
+    ("Lake Tahoe, California", 3.0, (39.1, -120.03)),
+    ("Big Sur, California", 2.5, (36.27, -121.81)),
+    ("Cuyahoga Valley, Ohio", 2.5, (41.28, -81.57)),
+    ("Indiana Dunes, Indiana", 2.5, (41.65, -87.05)),
+    ("Bryce Canyon, Utah", 2.0, (37.59, -112.19)),
+    ("Hot Springs, Arkansas", 2.0, (34.5, -93.06)),
+    ("Mount Rainier, Washington", 1.7, (46.85, -121.73)),
+    ("Shenandoah, Virginia", 1.5, (38.53, -78.44)),
+    ("Arches, Utah", 1.5, (38.73, -109.59)),
+    ("Outer Banks, North Carolina", 1.5, (35.56, -75.47)),
+    ("Adirondacks, New York", 1.5, (44.11, -74.26)),
+    ("Sequoia, California", 1.2, (36.49, -118.57)),
+    ("Everglades, Florida", 1.0, (25.29, -80.9)),
+    ("Humboldt County, California", 1.0, (40.75, -123.87)),
+    ("Phoenix, Arizona", 1.0, (33.45, -112.07)),
+    ("Ozark Mountains, Missouri", 1.0, (37.1, -92.5)),
+    ("Black Hills, South Dakota", 1.0, (43.99, -103.75)),
+    ("Boundary Waters, Minnesota", 0.8, (47.95, -91.5)),
+    ("Big Bend, Texas", 0.5, (29.25, -103.25)),
+]
+
+# (kind, median nightly price, share of listings)
+SITE_KINDS = [
+    ("Tent Site", 28, 40),
+    ("RV Spot", 48, 25),
+    ("Cabin", 115, 15),
+    ("Glamping Tent", 150, 10),
+    ("Yurt", 90, 6),
+    ("Treehouse", 185, 4),
+]
+# fmt: off
+ADJECTIVES = [
+    "Secluded", "Rustic", "Cozy", "Shaded", "Sunny", "Quiet", "Spacious",
+    "Hidden", "Scenic", "Peaceful",
+]
+FEATURES = [
+    "Lakeside", "Riverside", "Mountain View", "Forest", "Meadow", "Canyon",
+    "Oceanfront", "Hilltop", "Creekside", "Desert",
+]
+# fmt: on
+DESCRIPTION_SENTENCES = [
+    "Wake up to birdsong and stunning views.",
+    "Fire pit and picnic table included.",
+    "Clean restrooms and hot showers are a short walk away.",
+    "Direct access to hiking and biking trails.",
+    "Great for stargazing on clear nights.",
+    "Kayak and canoe rentals available nearby.",
+    "Pets are welcome on a leash.",
+    "Full water and electric hookups.",
+    "Firewood is sold at the camp store.",
+    "Perfect base for exploring the national park.",
+    "Level site with plenty of shade in the afternoon.",
+    "Quiet hours are enforced from 10pm to 7am.",
+    "Fishing is allowed with a state license.",
+    "Wood stove and bunk beds for chilly nights.",
+    "Private deck overlooking the water.",
+]
+COMMENTS = {
+    1: ["Not as described.", "Noisy and dirty, would not return."],
+    2: ["Facilities needed work.", "Okay location but overpriced."],
+    3: ["Decent spot for a night.", "Nice views, basic amenities."],
+    4: ["Great stay, would come back.", "Lovely site and a helpful host."],
+    5: ["Absolutely perfect trip!", "Best campsite we have stayed at."],
+}
+
+# Relative booking demand by month, January first
+MONTH_DEMAND = [0.45, 0.5, 0.7, 0.85, 1.1, 1.5, 1.8, 1.7, 1.2, 0.9, 0.6, 0.55]
+STAY_NIGHTS = [1, 2, 3, 4, 5, 6, 7, 10, 14]
+STAY_WEIGHTS = [18, 32, 20, 10, 7, 4, 6, 2, 1]
+MEAN_STAY = sum(n * w for n, w in zip(STAY_NIGHTS, STAY_WEIGHTS)) / sum(STAY_WEIGHTS)
+
+PAST_STATUSES = ["paid", "cancelled"]
+PAST_STATUS_WEIGHTS = [88, 12]
+FUTURE_STATUSES = ["confirmed", "paid", "pending", "cancelled"]
+FUTURE_STATUS_WEIGHTS = [45, 35, 8, 12]
+
+
+def cumulative(weights):
+    """Running totals for random.choices(cum_weights=...)"""
+    totals = []
+    running = 0
+    for weight in weights:
+        running += weight
+        totals.append(running)
+    return totals
+
+
+class DataGenerator:
+    """Produces rows as tuples in the column order declared above"""
+
+    def __init__(self, counts, seed=DEFAULT_SEED, today=None):
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.geo_rng = random.Random(seed + 1)
+        self.today = today or date.today()
+        self.now = datetime.combine(self.today, datetime.min.time())
+        self.campsite_prices = []
+        self.campsite_quality = []
+        self.campsite_popularity = []
+        self.reviews_written = 0
+
+    def random_time_before(self, moment, max_days):
+        return moment - timedelta(seconds=self.rng.randrange(max_days * 86400))
+
+    def users(self):
+        rng = self.rng
+        password_hash = generate_password_hash(DEMO_PASSWORD)
+        for user_id in range(1, self.counts["users"] + 1):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            yield (
+                user_id,
+                f"{first} {last}",
+                f"{first}.{last}{user_id}@example.com".lower(),
+                password_hash,
+                self.random_time_before(self.now, 3 * 365),
+            )
+
+    def campsites(self):
+        rng = self.rng
+        user_count = self.counts["users"]
+        # A tenth of users host, and a few large operators own most sites
+        host_count = max(1, user_count // 10)
+        host_weights = cumulative(rng.paretovariate(1.2) for _ in range(host_count))
+        location_weights = cumulative(weight for _, weight, _ in LOCATIONS)
+        kind_weights = cumulative(share for _, _, share in SITE_KINDS)
+
+        for campsite_id in range(1, self.counts["campsites"] + 1):
+            location, location_popularity, centre = rng.choices(
+                LOCATIONS, cum_weights=location_weights
+            )[0]
+            # Scatter sites around the centre, from their own stream so the
+            # rest of the data matches earlier seeds
+            latitude = round(centre[0] + self.geo_rng.gauss(0, 0.2), 5)
+            longitude = round(centre[1] + self.geo_rng.gauss(0, 0.2), 5)
+            kind, median_price, _ = rng.choices(SITE_KINDS, cum_weights=kind_weights)[0]
+            price = round(median_price * rng.lognormvariate(0, 0.35))
+            host_id = rng.choices(range(1, host_count + 1), cum_weights=host_weights)[0]
+            description = " ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(2, 4)))
+
+            self.campsite_prices.append(max(price, 5))
+            self.campsite_quality.append(min(5.0, rng.gauss(4.1, 0.5)))
+            self.campsite_popularity.append(
+                rng.lognormvariate(0, 0.8) * location_popularity**0.5
+            )
+
+            yield (
+                campsite_id,
+                f"{rng.choice(ADJECTIVES)} {rng.choice(FEATURES)} {kind}",
+                description,
+                float(max(price, 5)),
+                location,
+                host_id,
+                f"https://example.com/campsites/{campsite_id}.jpg",
+                self.random_time_before(self.now, 3 * 365),
+                latitude,
+                longitude,
+                band_of(latitude),
+            )
+
+    def booking_counts(self):
+        """Split the booking total across campsites by popularity"""
+        total = self.counts["bookings"]
+        weight_sum = sum(self.campsite_popularity)
+        expected = [total * w / weight_sum for w in self.campsite_popularity]
+        counts = [int(e) for e in expected]
+        # Hand the rounding remainder to the largest fractional parts
+        by_fraction = sorted(
+            range(len(expected)), key=lambda i: counts[i] - expected[i]
+        )
+        for i in by_fraction[: total - sum(counts)]:
+            counts[i] += 1
+        return counts
+
+    def bookings(self, reviews):
+        """Yield booking rows, appending review rows for some past stays
+
+        Each campsite's confirmed stays are laid out one after another, so
+        they never overlap, with shorter gaps in high-demand months.
+        """
+        rng = self.rng
+        user_count = self.counts["users"]
+        window_start = self.today - timedelta(days=HISTORY_DAYS)
+        window_end = self.today + timedelta(days=HORIZON_DAYS)
+        nights_weights = cumulative(STAY_WEIGHTS)
+        past_weights = cumulative(PAST_STATUS_WEIGHTS)
+        future_weights = cumulative(FUTURE_STATUS_WEIGHTS)
 
+        # Share of bookings that are finished paid stays, i.e. reviewable
+        eligible_share = (
+            HISTORY_DAYS
+            / (HISTORY_DAYS + HORIZON_DAYS)
+            * PAST_STATUS_WEIGHTS[0]
+            / sum(PAST_STATUS_WEIGHTS)
+        )
+        total_bookings = self.counts["bookings"]
+
+        booking_id = 0
+        for index, count in enumerate(self.booking_counts()):
+            campsite_id = index + 1
+            price = self.campsite_prices[index]
+            quality = self.campsite_quality[index]
+            reviewers = set()
+            cursor = window_start
+
+            for remaining in range(count, 0, -1):
+                mean_gap = (window_end - cursor).days / remaining - MEAN_STAY
+                gap = 0
+                if mean_gap > 0:
+                    gap = rng.expovariate(1 / mean_gap) / MONTH_DEMAND[cursor.month - 1]
+                start = cursor + timedelta(days=int(gap))
+                if rng.random() < 0.35:
+                    # Snap forward to a Friday arrival
+                    start += timedelta(days=(4 - start.weekday()) % 7)
+                nights = rng.choices(STAY_NIGHTS, cum_weights=nights_weights)[0]
+                end = start + timedelta(days=nights)
+                cursor = end
+
+                if end <= self.today:
+                    status = rng.choices(PAST_STATUSES, cum_weights=past_weights)[0]
+                else:
+                    status = rng.choices(FUTURE_STATUSES, cum_weights=future_weights)[0]
+
+                user_id = rng.randint(1, user_count)
+                booked_at = datetime.combine(start, datetime.min.time()) - timedelta(
+                    days=rng.expovariate(1 / 30)
+                )
+                booking_id += 1
+                yield (
+                    booking_id,
+                    user_id,
+                    campsite_id,
+                    start,
+                    end,
+                    status,
+                    float(nights * price),
+                    min(booked_at, self.now),
+                )
+
+                if status != "paid" or end > self.today or user_id in reviewers:
+                    continue
+
+                # Re-aim at the review target as bookings go by
+                reviews_left = self.counts["reviews"] - self.reviews_written
+                eligible_left = (total_bookings - booking_id + 1) * eligible_share
+                if reviews_left > 0 and rng.random() * eligible_left < reviews_left:
+                    reviewers.add(user_id)
+                    reviews.append(self.review(user_id, campsite_id, quality, end))
+
+    def review(self, user_id, campsite_id, quality, checkout):
+        rng = self.rng
+        rating = int(min(5, max(1, round(rng.gauss(quality, 0.8)))))
+        reviewed_at = datetime.combine(checkout, datetime.min.time()) + timedelta(
+            days=rng.expovariate(1 / 5)
+        )
+        self.reviews_written += 1
+        return (
+            self.reviews_written,
+            user_id,
+            campsite_id,
+            rating,
+            rng.choice(COMMENTS[rating]),
+            min(reviewed_at, self.now),
+        )
+
+
+class BulkWriter:
+    """Buffers rows per table and writes them in chunked bulk statements
+
+    Uses COPY on PostgreSQL (psycopg2) and DBAPI executemany elsewhere,
+    bypassing the ORM entirely.
+    """
+
+    def __init__(self, connection, chunk_size=CHUNK_SIZE):
+        self.connection = connection
+        self.dialect = connection.dialect
+        self.chunk_size = chunk_size
+        self.cursor = connection.connection.cursor()
+        self.use_copy = self.dialect.name == "postgresql" and hasattr(
+            self.cursor, "copy_expert"
+        )
+        self.written = {}
 
-def seed_database():
-    app = create_app()
+    def quote(self, name):
+        return self.dialect.identifier_preparer.quote(name)
+
+    def write(self, table, columns, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.flush(table, columns, chunk)
+                chunk = []
+        if chunk:
+            self.flush(table, columns, chunk)
+
+    def flush(self, table, columns, rows):
+        if not rows:
+            return
+        column_list = ", ".join(self.quote(c) for c in columns)
+        if self.use_copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            self.cursor.copy_expert(
+                f"COPY {self.quote(table.name)} ({column_list}) FROM STDIN WITH CSV",
+                buffer,
+            )
+        else:
+            if self.dialect.name == "sqlite":
+                # sqlite3 stores dates as text; match SQLAlchemy's format
+                rows = [
+                    tuple(str(v) if isinstance(v, date) else v for v in row)
+                    for row in rows
+                ]
+            placeholders = ", ".join(
+                self.placeholder(position, column)
+                for position, column in enumerate(columns, 1)
+            )
+            self.cursor.executemany(
+                f"INSERT INTO {self.quote(table.name)} ({column_list}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+        self.written[table.name] = self.written.get(table.name, 0) + len(rows)
+
+    def placeholder(self, position, column):
+        """Bind marker for the 1-based position'th column, in the driver's style"""
+        style = self.dialect.paramstyle
+        if style == "qmark":
+            return "?"
+        if style == "numeric":
+            return f":{position}"
+        if style == "named":
+            return f":{column}"
+        return "%s"
+
+    def reset_sequences(self, tables):
+        """Move PostgreSQL id sequences past the explicitly inserted ids"""
+        if self.dialect.name != "postgresql":
+            return
+        for table in tables:
+            name = self.quote(table.name)
+            self.cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {name}), 1))"
+            )
+
+
+def seed_database(
+    counts=None, seed=DEFAULT_SEED, today=None, chunk_size=CHUNK_SIZE, config=None
+):
+    counts = dict(DEFAULT_COUNTS, **(counts or {}))
+    if counts["campsites"] and not counts["users"]:
+        raise ValueError("Campsites need at least one user to host them")
+    if counts["bookings"] and not counts["campsites"]:
+        raise ValueError("Bookings need at least one campsite")
+
+    app = create_app(config)
+    generator = DataGenerator(counts, seed=seed, today=today)
+    started = time.perf_counter()
 
     with app.app_context():
-        # Clear existing data
-        db.drop_all()
         db.create_all()
+        with db.engine.begin() as connection:
+            if connection.dialect.name == "sqlite":
+                connection.exec_driver_sql("PRAGMA synchronous = OFF")
+
+            # Clear existing rows, children first, leaving the schema alone
+            for table in reversed(db.metadata.sorted_tables):
+                connection.execute(table.delete())
+
+            writer = BulkWriter(connection, chunk_size)
+            writer.write(User.__table__, USER_COLUMNS, generator.users())
+            writer.write(Campsite.__table__, CAMPSITE_COLUMNS, generator.campsites())
+
+            # Reviews are drawn from finished stays as bookings stream past
+            reviews = []
+
+            def bookings_flushing_reviews():
+                for row in generator.bookings(reviews):
+                    yield row
+                    if len(reviews) >= chunk_size:
+                        writer.flush(Review.__table__, REVIEW_COLUMNS, reviews)
+                        del reviews[:]
+
+            writer.write(
+                Booking.__table__, BOOKING_COLUMNS, bookings_flushing_reviews()
+            )
+            writer.flush(Review.__table__, REVIEW_COLUMNS, reviews)
+            refresh_campsite_stats(connection)
+            writer.reset_sequences(
+                [
+                    User.__table__,
+                    Campsite.__table__,
+                    Booking.__table__,
+                    Review.__table__,
+                ]
+            )
+
+    elapsed = time.perf_counter() - started
+    written = writer.written
+    print("Database seeded successfully!")
+    print(
+        f"Created {written.get('user', 0)} users, "
+        f"{written.get('campsite', 0)} campsites, "
+        f"{written.get('booking', 0)} bookings, and "
+        f"{written.get('review', 0)} reviews in {elapsed:.1f}s"
+    )
+    return written
+
 
-        # Create sample users
-        users = [
-            User(name="John Doe", email="john@example.com"),
-            User(name="Jane Smith", email="jane@example.com"),
-            User(name="Mike Johnson", email="mike@example.com"),
-            User(name="Sarah Wilson", email="sarah@example.com"),
-        ]
-
-        for user in users:
-            user.set_password("password123")
-            db.session.add(user)
-
-        db.session.commit()
-
-        # Create sample campsites
-        campsites = [
-            Campsite(
-                title="Mountain View Tent Site",
-                description="Beautiful tent camping with stunning mountain views. Perfect for hikers and nature lovers.",
-                price=25.0,
-                location="Rocky Mountain National Park, Colorado",
-                host_id=1,
-                image_url="https://example.com/mountain-tent.jpg",
-            ),
-            Campsite(
-                title="Lakeside Cabin Retreat",
-                description="Cozy cabin by the lake with fishing access and kayak rentals available.",
-                price=85.0,
-                location="Lake Tahoe, California",
-                host_id=2,
-                image_url="https://example.com/lakeside-cabin.jpg",
-            ),
-            Campsite(
-                title="Desert RV Paradise",
-                description="Full hookup RV site in the beautiful Sonoran Desert with hiking trails nearby.",
-                price=45.0,
-                location="Phoenix, Arizona",
-                host_id=1,
-                image_url="https://example.com/desert-rv.jpg",
-            ),
-            Campsite(
-                title="Forest Glamping Pod",
-                description="Luxury glamping experience in the heart of the redwood forest.",
-                price=120.0,
-                location="Humboldt County, California",
-                host_id=3,
-                image_url="https://example.com/forest-pod.jpg",
-            ),
-            Campsite(
-                title="Beach Camping Spot",
-                description="Oceanfront camping with direct beach access and fire pits.",
-                price=35.0,
-                location="Big Sur, California",
-                host_id=2,
-                image_url="https://example.com/beach-camp.jpg",
-            ),
-        ]
-
-        for campsite in campsites:
-            db.session.add(campsite)
-
-        db.session.commit()
-
-        # Create sample bookings
-        today = date.today()
-        bookings = [
-            Booking(
-                user_id=3,
-                campsite_id=1,
-                start_date=today + timedelta(days=7),
-                end_date=today + timedelta(days=10),
-                total_price=75.0,
-                status="paid",
-            ),
-            Booking(
-                user_id=4,
-                campsite_id=2,
-                start_date=today + timedelta(days=14),
-                end_date=today + timedelta(days=16),
-                total_price=170.0,
-                status="confirmed",
-            ),
-            Booking(
-                user_id=3,
-                campsite_id=4,
-                start_date=today - timedelta(days=30),
-                end_date=today - timedelta(days=28),
-                total_price=240.0,
-                status="paid",
-            ),
-        ]
-
-        for booking in bookings:
-            db.session.add(booking)
-
-        db.session.commit()
-
-        # Create sample reviews
-        reviews = [
-            Review(
-                user_id=3,
-                campsite_id=4,
-                rating=5,
-                comment="Amazing glamping experience! The pod was clean and comfortable with great forest views.",
-            ),
-            Review(
-                user_id=4,
-                campsite_id=1,
-                rating=4,
-                comment="Great mountain views and well-maintained site. Could use better bathroom facilities.",
-            ),
-        ]
-
-        for review in reviews:
-            db.session.add(review)
-
-        db.session.commit()
-
-        print("Database seeded successfully!")
-        print(
-            f"Created {len(users)} users, {len(campsites)} campsites, {len(bookings)} bookings, and {len(reviews)} reviews"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic dataset"
+    )
+    for name, default in DEFAULT_COUNTS.items():
+        parser.add_argument(
+            f"--{name}", type=int, default=default, help=f"default {default}"
         )
+    parser.add_argument(
+        "--seed", type=int, default=DEFAULT_SEED, help="random seed (default 42)"
+    )
+    parser.add_argument(
+        "--today",
+        type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+        help="anchor date for booking history, YYYY-MM-DD (default today)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE, help="rows per bulk statement"
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    seed_database()
+    args = parse_args()
+    seed_database(
+        counts={name: getattr(args, name) for name in DEFAULT_COUNTS},
+        seed=args.seed,
+        today=args.today,
+        chunk_size=args.chunk_size,
+    )
@@ -0,0 +1,290 @@
+"""
+"Similar campsites" recommendations from a precomputed sparse index
+
+Each campsite is a sparse feature vector made of four blocks: TF-IDF over
+its title and description, its price band, its location and its average
+rating. Each block is L2-normalized and scaled by the square root of its
+weight, so the dot product of two rows is the weighted sum of the
+per-block cosine similarities. Features are hashed into a fixed number of
+columns, so new words and locations need no vocabulary changes.
+
+The index is built once per process on first use. After that it follows
+the change feed (change_log.py): campsites created, updated or reviewed
+since its cursor get fresh rows appended and their old rows masked out,
+and deleted campsites are masked out. IDF weights are fixed at build
+time. Once the changes reach REBUILD_FRACTION of the index, the whole
+index is rebuilt. A query is one sparse matrix-vector product plus an
+argpartition top-k.
+
+NumPy and SciPy are imported by the routes on first use, keeping them out
+of application start-up.
+"""
+
+from collections import Counter, namedtuple
+import math
+import re
+from threading import Lock
+import zlib
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
+
+from models import db, Campsite, Review, ChangeEvent
+
+N_FEATURES = 2**20
+
+# Share of the score each block contributes, summing to 1
+WEIGHTS = {"text": 0.55, "location": 0.2, "price": 0.15, "rating": 0.1}
+
+# Rebuild once this share of the indexed campsites has changed
+REBUILD_FRACTION = 0.25
+
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the "
+    "this to with".split()
+)
+
+IndexSnapshot = namedtuple("IndexSnapshot", "matrix ids rows active")
+
+_index_lock = Lock()
+
+
+def tokenize(text):
+    return [
+        token
+        for token in re.findall(r"[a-z0-9]+", (text or "").lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def feature_column(key):
+    # crc32 rather than hash() so columns match across processes
+    return zlib.crc32(key.encode()) % N_FEATURES
+
+
+def _banded(prefix, band):
+    """Features for a band, with half weight on its neighbours"""
+    return {
+        feature_column(f"{prefix}:{band}"): 1.0,
+        feature_column(f"{prefix}:{band - 1}"): 0.5,
+        feature_column(f"{prefix}:{band + 1}"): 0.5,
+    }
+
+
+def _add_block(vector, block, weight):
+    norm = math.sqrt(sum(value * value for value in block.values()))
+    if not norm:
+        return
+    scale = math.sqrt(weight) / norm
+    for column, value in block.items():
+        vector[column] = vector.get(column, 0.0) + value * scale
+
+
+class SimilarityIndex:
+    """Sparse campsite feature matrix kept in step with the change feed"""
+
+    def __init__(self, rebuild_fraction=REBUILD_FRACTION):
+        self.rebuild_fraction = rebuild_fraction
+        self.cursor = 0
+        self.snapshot = None
+        self.idf = {}
+        self.default_idf = 1.0
+        self.changes_since_build = 0
+        self._lock = Lock()
+
+    def similar(self, campsite_id, k):
+        """Ids and scores of the k campsites most similar to campsite_id
+
+        Returns None if campsite_id is not indexed. Needs an app context.
+        """
+        self.refresh()
+        snapshot = self.snapshot
+        row = snapshot.rows.get(campsite_id)
+        if row is None:
+            return None
+
+        scores = (snapshot.matrix @ snapshot.matrix[row].T).toarray().ravel()
+        scores[~snapshot.active] = 0.0
+        scores[row] = 0.0
+
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(snapshot.ids[i]), round(float(scores[i]), 4)) for i in top]
+
+    def refresh(self):
+        """Build the index, or apply change events since the last refresh"""
+        with self._lock:
+            if self.snapshot is None:
+                self.build()
+                return
+
+            events = (
+                db.session.query(
+                    ChangeEvent.id, ChangeEvent.entity, ChangeEvent.entity_id
+                )
+                .filter(
+                    ChangeEvent.id > self.cursor,
+                    ChangeEvent.entity.in_(("campsite", "review")),
+                )
+                .order_by(ChangeEvent.id)
+                .all()
+            )
+            if not events:
+                return
+            self.cursor = events[-1].id
+
+            changed = {e.entity_id for e in events if e.entity == "campsite"}
+            review_ids = {e.entity_id for e in events if e.entity == "review"}
+            if review_ids:
+                # Deleted reviews are gone; their rating shift waits for a rebuild
+                changed.update(
+                    campsite_id
+                    for (campsite_id,) in db.session.query(Review.campsite_id)
+                    .filter(Review.id.in_(review_ids))
+                    .distinct()
+                )
+
+            self.changes_since_build += len(changed)
+            if self.changes_since_build > self.rebuild_fraction * max(
+                len(self.snapshot.rows), 1
+            ):
+                self.build()
+            elif changed:
+                self._apply(changed)
+
+    def build(self):
+        # Read the cursor first so writes during the scan are replayed later
+        self.cursor = db.session.query(func.max(ChangeEvent.id)).scalar() or 0
+        documents = self._load()
+
+        document_frequency = Counter()
+        for document in documents:
+            document_frequency.update(set(self._terms(document)))
+        count = len(documents)
+        self.idf = {
+            column: math.log((1 + count) / (1 + frequency)) + 1
+            for column, frequency in document_frequency.items()
+        }
+        self.default_idf = math.log(1 + count) + 1
+
+        ids = np.array([document.id for document in documents], dtype=np.int64)
+        self.snapshot = IndexSnapshot(
+            matrix=self._matrix(documents),
+            ids=ids,
+            rows={int(campsite_id): row for row, campsite_id in enumerate(ids)},
+            active=np.ones(len(ids), dtype=bool),
+        )
+        self.changes_since_build = 0
+
+    def _apply(self, campsite_ids):
+        snapshot = self.snapshot
+        documents = self._load(campsite_ids)
+
+        active = snapshot.active.copy()
+        rows = dict(snapshot.rows)
+        for campsite_id in campsite_ids:
+            row = rows.pop(campsite_id, None)
+            if row is not None:
+                active[row] = False
+
+        offset = len(snapshot.ids)
+        for position, document in enumerate(documents):
+            rows[document.id] = offset + position
+
+        self.snapshot = IndexSnapshot(
+            matrix=sparse.vstack(
+                [snapshot.matrix, self._matrix(documents)], format="csr"
+            ),
+            ids=np.concatenate(
+                [snapshot.ids, np.array([d.id for d in documents], dtype=np.int64)]
+            ),
+            rows=rows,
+            active=np.concatenate([active, np.ones(len(documents), dtype=bool)]),
+        )
+
+    def _load(self, campsite_ids=None):
+        query = (
+            db.session.query(
+                Campsite.id,
+                Campsite.title,
+                Campsite.description,
+                Campsite.price,
+                Campsite.location,
+                func.avg(Review.rating).label("rating"),
+            )
+            .outerjoin(Review, Review.campsite_id == Campsite.id)
+            .group_by(Campsite.id)
+            .order_by(Campsite.id)
+        )
+        if campsite_ids is not None:
+            query = query.filter(Campsite.id.in_(campsite_ids))
+        return query.all()
+
+    def _terms(self, document):
+        return [
+            feature_column(f"t:{token}")
+            for token in tokenize(f"{document.title} {document.description}")
+        ]
+
+    def _vector(self, document):
+        vector = {}
+
+        counts = Counter(self._terms(document))
+        text = {
+            column: (1 + math.log(count)) * self.idf.get(column, self.default_idf)
+            for column, count in counts.items()
+        }
+        _add_block(vector, text, WEIGHTS["text"])
+
+        parts = [part.strip().lower() for part in document.location.split(",")]
+        parts = [part for part in parts if part]
+        location = {}
+        if parts:
+            location[feature_column("l:" + ",".join(parts))] = 1.0
+            location[feature_column(f"r:{parts[-1]}")] = 1.0
+        _add_block(vector, location, WEIGHTS["location"])
+
+        # Bands double in width: 16-32, 32-64, ...
+        price_band = int(math.log2(max(document.price, 1.0)))
+        _add_block(vector, _banded("p", price_band), WEIGHTS["price"])
+
+        if document.rating is not None:
+            rating_band = int(round(float(document.rating) * 2))
+            _add_block(vector, _banded("s", rating_band), WEIGHTS["rating"])
+
+        return vector
+
+    def _matrix(self, documents):
+        data, indices, indptr = [], [], [0]
+        for document in documents:
+            vector = self._vector(document)
+            columns = sorted(vector)
+            indices.extend(columns)
+            data.extend(vector[column] for column in columns)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (
+                np.array(data, dtype=np.float64),
+                np.array(indices, dtype=np.int32),
+                np.array(indptr, dtype=np.int64),
+            ),
+            shape=(len(documents), N_FEATURES),
+        )
+
+
+def get_index(app):
+    """The app's similarity index, created on first use"""
+    index = app.extensions.get("similarity")
+    if index is None:
+        with _index_lock:
+            index = app.extensions.get("similarity")
+            if index is None:
+                index = SimilarityIndex(
+                    app.config.get("SIMILAR_REBUILD_FRACTION", REBUILD_FRACTION)
+                )
+                app.extensions["similarity"] = index
+    return index
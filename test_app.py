@@ -0,0 +1,34 @@
+"""
+Tests for application construction
+Run with: pytest test_app.py
+"""
+
+from sqlalchemy import inspect
+
+from app import create_app
+from conftest import TEST_CONFIG
+from models import db
+
+
+def test_create_app_does_no_database_io(tmp_path):
+    database = tmp_path / "cold.db"
+    app = create_app(
+        {**TEST_CONFIG, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}"}
+    )
+
+    assert app.url_map.bind("localhost").match("/api/campsites")
+    assert not database.exists()
+
+
+def test_init_db_command_creates_tables(tmp_path):
+    database = tmp_path / "init.db"
+    app = create_app(
+        {**TEST_CONFIG, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database}"}
+    )
+
+    result = app.test_cli_runner().invoke(args=["init-db"])
+
+    assert result.exit_code == 0
+    with app.app_context():
+        tables = inspect(db.engine).get_table_names()
+    assert {"user", "campsite", "booking", "review"} <= set(tables)
@@ -0,0 +1,127 @@
+"""
+Tests for archiving finished bookings
+Run with: pytest test_archive.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from archive import archive_bookings
+from models import db, ArchivedBooking, Booking, Campsite
+
+RETENTION = timedelta(days=365)
+
+
+@pytest.fixture
+def history(app, seed, auth_headers):
+    """A guest with two long-finished stays, a recent one and an upcoming one"""
+    ids = seed(users=2, campsites=1)
+    campsite_id, guest_id = ids["campsites"][0], ids["users"][1]
+    today = date.today()
+    stays = [
+        (today - timedelta(days=800), "paid"),
+        (today - timedelta(days=500), "cancelled"),
+        (today - timedelta(days=30), "paid"),
+        (today + timedelta(days=30), "confirmed"),
+    ]
+    with app.app_context():
+        bookings = [
+            Booking(
+                user_id=guest_id,
+                campsite_id=campsite_id,
+                start_date=start,
+                end_date=start + timedelta(days=2),
+                total_price=40,
+                status=status,
+            )
+            for start, status in stays
+        ]
+        db.session.add_all(bookings)
+        db.session.commit()
+        return {
+            "campsite_id": campsite_id,
+            "booking_ids": [booking.id for booking in bookings],
+            "guest": auth_headers(guest_id),
+        }
+
+
+def archive(app, batch_size=500):
+    with app.app_context():
+        return archive_bookings(RETENTION, batch_size)
+
+
+def booking_ids(client, history, **params):
+    response = client.get(
+        "/api/bookings", query_string=params, headers=history["guest"]
+    )
+    assert response.status_code == 200
+    return sorted(b["id"] for b in response.get_json()["bookings"])
+
+
+def test_finished_bookings_move_in_batches(app, history):
+    old = history["booking_ids"][:2]
+
+    assert archive(app, batch_size=1) == 2
+    assert archive(app) == 0
+
+    with app.app_context():
+        assert sorted(b.id for b in ArchivedBooking.query) == old
+        assert Booking.query.filter(Booking.id.in_(old)).count() == 0
+        assert Booking.query.count() == 2
+
+
+def test_history_is_only_read_when_asked_for(app, client, history):
+    ids = history["booking_ids"]
+    archive(app)
+
+    assert booking_ids(client, history) == ids[2:]
+    assert booking_ids(client, history, include_archived="true") == ids
+
+    url = f"/api/bookings/{ids[0]}"
+    assert client.get(url, headers=history["guest"]).status_code == 404
+    response = client.get(
+        url, query_string={"include_archived": "true"}, headers=history["guest"]
+    )
+    assert response.status_code == 200
+    assert response.get_json()["booking"]["archived"] is True
+
+
+def test_archived_stays_still_count(app, client, history):
+    with app.app_context():
+        # Only the old paid stay makes the guest eligible to review
+        db.session.delete(db.session.get(Booking, history["booking_ids"][2]))
+        db.session.commit()
+    archive(app)
+
+    with app.app_context():
+        campsite = db.session.get(Campsite, history["campsite_id"])
+        # Recomputed on the next booking write, with the archived stay counted
+        db.session.get(Booking, history["booking_ids"][3]).status = "paid"
+        db.session.commit()
+        assert campsite.booking_count == 2
+
+    response = client.post(
+        "/api/reviews",
+        json={"campsite_id": history["campsite_id"], "rating": 5},
+        headers=history["guest"],
+    )
+    assert response.status_code == 201
+
+
+def test_newest_booking_is_never_archived(app, seed):
+    ids = seed(users=2, campsites=1)
+    with app.app_context():
+        db.session.add(
+            Booking(
+                user_id=ids["users"][1],
+                campsite_id=ids["campsites"][0],
+                start_date=date.today() - timedelta(days=900),
+                end_date=date.today() - timedelta(days=898),
+                total_price=40,
+                status="paid",
+            )
+        )
+        db.session.commit()
+
+    assert archive(app) == 0
@@ -0,0 +1,110 @@
+"""
+Tests for the booking transition audit log
+Run with: pytest test_audit_log.py
+"""
+
+from datetime import timedelta
+
+from archive import archive_bookings
+from conftest import book
+from models import db, Booking, BookingTransition
+
+
+def booked(client, site, offset=0):
+    response = book(client, site, offset)
+    assert response.status_code == 201
+    return response.get_json()["booking"]
+
+
+def history(client, booking_id, headers):
+    response = client.get(f"/api/bookings/{booking_id}/history", headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["transitions"]
+
+
+def test_every_transition_is_recorded_with_its_actor(app, client, site):
+    booking = booked(client, site)
+    client.put(f"/api/bookings/{booking['id']}/cancel", headers=site["guest"])
+
+    transitions = history(client, booking["id"], site["guest"])
+
+    assert [(t["from_status"], t["to_status"]) for t in transitions] == [
+        (None, "confirmed"),
+        ("confirmed", "cancelled"),
+    ]
+    assert [t["source"] for t in transitions] == [
+        "bookings.create_booking",
+        "bookings.cancel_booking",
+    ]
+    assert all(t["actor_id"] == site["guest_id"] for t in transitions)
+    assert all(t["amount"] == booking["total_price"] for t in transitions)
+    assert history(client, booking["id"], site["host"]) == transitions
+
+
+def test_background_and_unchanged_writes(app, client, site):
+    booking = booked(client, site)
+    with app.app_context():
+        row = db.session.get(Booking, booking["id"])
+        row.total_price += 10
+        db.session.commit()
+        row.status = "paid"
+        db.session.commit()
+
+    transitions = history(client, booking["id"], site["guest"])
+    assert [(t["to_status"], t["source"], t["actor_id"]) for t in transitions] == [
+        ("confirmed", "bookings.create_booking", site["guest_id"]),
+        ("paid", "system", None),
+    ]
+
+
+def test_rolled_back_transitions_are_not_recorded(app, client, site):
+    booking = booked(client, site)
+    with app.app_context():
+        db.session.get(Booking, booking["id"]).status = "paid"
+        db.session.flush()
+        db.session.rollback()
+        assert BookingTransition.query.count() == 1
+
+
+def test_campsite_history_pages_for_the_host(client, site):
+    ids = [booked(client, site, offset)["id"] for offset in (0, 3, 6)]
+    url = f"/api/campsites/{site['campsite_id']}/booking-history"
+
+    first = client.get(url, query_string={"limit": 2}, headers=site["host"])
+    page = first.get_json()
+    assert [t["booking_id"] for t in page["transitions"]] == ids[:2]
+    assert page["has_more"]
+
+    rest = client.get(
+        url, query_string={"since": page["next_cursor"]}, headers=site["host"]
+    ).get_json()
+    assert [t["booking_id"] for t in rest["transitions"]] == ids[2:]
+    assert not rest["has_more"]
+
+    assert client.get(url, headers=site["guest"]).status_code == 403
+    response = client.get(url, query_string={"limit": 0}, headers=site["host"])
+    assert response.status_code == 400
+
+
+def test_history_is_private(client, site):
+    booking = booked(client, site)
+    url = f"/api/bookings/{booking['id']}/history"
+
+    assert client.get(url, headers=site["stranger"]).status_code == 403
+    response = client.get("/api/bookings/999/history", headers=site["guest"])
+    assert response.status_code == 404
+
+
+def test_history_of_an_archived_booking(app, client, site):
+    booking = booked(client, site)
+    booked(client, site, 3)
+    client.put(f"/api/bookings/{booking['id']}/cancel", headers=site["guest"])
+    with app.app_context():
+        assert archive_bookings(timedelta(days=-30)) == 1
+        assert db.session.get(Booking, booking["id"]) is None
+
+    transitions = history(client, booking["id"], site["guest"])
+    assert [t["to_status"] for t in transitions] == ["confirmed", "cancelled"]
+    assert history(client, booking["id"], site["host"]) == transitions
+    url = f"/api/bookings/{booking['id']}/history"
+    assert client.get(url, headers=site["stranger"]).status_code == 403
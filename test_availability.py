@@ -0,0 +1,182 @@
+"""
+Tests for host blackout dates and availability checks
+Run with: pytest test_availability.py
+"""
+
+from datetime import date, timedelta
+
+from availability import merge_ranges, recurring_ranges, subtract_ranges
+from conftest import book
+from models import Blackout, Booking
+
+# A Monday far enough ahead to be bookable
+MONDAY = date.today() + timedelta(days=14 - date.today().weekday())
+
+
+def day(offset):
+    return (MONDAY + timedelta(days=offset)).isoformat()
+
+
+def blackouts(client, campsite_id):
+    body = client.get(f"/api/campsites/{campsite_id}/blackouts").get_json()
+    return [(b["start_date"], b["end_date"]) for b in body["blackouts"]]
+
+
+def test_range_helpers():
+    d = MONDAY
+    week = [d + timedelta(days=i) for i in range(8)]
+    assert merge_ranges(
+        [(week[3], week[5]), (week[0], week[2]), (week[2], week[3])]
+    ) == [(week[0], week[5])]
+    assert subtract_ranges(
+        [(week[0], week[7])], [(week[1], week[2]), (week[5], week[7])]
+    ) == [
+        (week[0], week[1]),
+        (week[2], week[5]),
+    ]
+    assert recurring_ranges(week[0], week[7], {0, 5, 6}) == [
+        (week[0], week[1]),
+        (week[5], week[7]),
+    ]
+
+
+def test_recurring_pattern_expands_into_merged_ranges(client, site):
+    response = client.post(
+        f"/api/campsites/{site['campsite_id']}/blackouts",
+        json={
+            "recurring": [
+                {"start_date": day(0), "end_date": day(364), "weekdays": [0]}
+            ],
+            "ranges": [{"start_date": day(1), "end_date": day(3)}],
+        },
+        headers=site["host"],
+    )
+    assert response.status_code == 200, response.get_json()
+
+    stored = blackouts(client, site["campsite_id"])
+    assert len(stored) == 52
+    # The first Monday joins the range after it
+    assert stored[0] == (day(0), day(3))
+    assert stored[1] == (day(7), day(8))
+
+
+def test_adding_and_removing_merges_and_splits(client, site, app):
+    url = f"/api/campsites/{site['campsite_id']}/blackouts"
+    for start, end in ((0, 3), (5, 8), (3, 5)):
+        client.post(
+            url,
+            json={"ranges": [{"start_date": day(start), "end_date": day(end)}]},
+            headers=site["host"],
+        )
+    assert blackouts(client, site["campsite_id"]) == [(day(0), day(8))]
+
+    client.delete(
+        url,
+        json={"ranges": [{"start_date": day(2), "end_date": day(4)}]},
+        headers=site["host"],
+    )
+    assert blackouts(client, site["campsite_id"]) == [
+        (day(0), day(2)),
+        (day(4), day(8)),
+    ]
+
+    client.delete(
+        url,
+        json={
+            "recurring": [
+                {"start_date": day(0), "end_date": day(14), "weekdays": [0, 1, 5, 6]}
+            ]
+        },
+        headers=site["host"],
+    )
+    assert blackouts(client, site["campsite_id"]) == [(day(4), day(5))]
+
+    with app.app_context():
+        assert Blackout.query.count() == 1
+
+
+def test_blackouts_block_bookings_and_search(client, site, app):
+    client.post(
+        f"/api/campsites/{site['campsite_id']}/blackouts",
+        json={"ranges": [{"start_date": day(3), "end_date": day(5)}]},
+        headers=site["host"],
+    )
+
+    assert book(client, site, 4, start=MONDAY).status_code == 400
+    assert book(client, site, 1, start=MONDAY).status_code == 201
+    assert book(client, site, 5, start=MONDAY).status_code == 201
+    with app.app_context():
+        assert Booking.query.count() == 2
+
+    def search(start, end):
+        body = client.get(
+            "/api/campsites",
+            query_string={
+                "start_date": day(start),
+                "end_date": day(end),
+                "available": "true",
+            },
+        ).get_json()
+        return [c["id"] for c in body["campsites"]]
+
+    assert search(3, 4) == [site["other_id"]]
+    assert search(0, 1) == [site["campsite_id"], site["other_id"]]
+    assert search(2, 3) == [site["other_id"]]  # booked
+    assert search(7, 9) == [site["campsite_id"], site["other_id"]]
+
+
+def test_calendar_lists_bookings_and_blackouts(client, site):
+    client.post(
+        f"/api/campsites/{site['campsite_id']}/blackouts",
+        json={"ranges": [{"start_date": day(3), "end_date": day(5)}]},
+        headers=site["host"],
+    )
+    book(client, site, 0, start=MONDAY)
+
+    body = client.get(
+        f"/api/campsites/{site['campsite_id']}/availability",
+        query_string={"start_date": day(0), "end_date": day(30)},
+    ).get_json()
+    assert body["unavailable"] == [
+        {"start_date": day(0), "end_date": day(2), "reason": "booked"},
+        {"start_date": day(3), "end_date": day(5), "reason": "blackout"},
+    ]
+
+
+def test_blackouts_removed_with_campsite(client, site, app):
+    client.post(
+        f"/api/campsites/{site['campsite_id']}/blackouts",
+        json={"ranges": [{"start_date": day(3), "end_date": day(5)}]},
+        headers=site["host"],
+    )
+    response = client.delete(
+        f"/api/campsites/{site['campsite_id']}", headers=site["host"]
+    )
+    assert response.status_code == 200
+    with app.app_context():
+        assert Blackout.query.count() == 0
+
+
+def test_invalid_blackout_requests(client, site):
+    url = f"/api/campsites/{site['campsite_id']}/blackouts"
+    one_night = {"ranges": [{"start_date": day(0), "end_date": day(1)}]}
+    assert client.post(url, json=one_night, headers=site["guest"]).status_code == 403
+    for body in (
+        {},
+        {"ranges": [{"start_date": day(3), "end_date": day(1)}]},
+        {"ranges": [{"start_date": "soon", "end_date": day(1)}]},
+        {"ranges": "everything"},
+        {"recurring": [{"start_date": day(0), "end_date": day(7), "weekdays": [7]}]},
+        {"recurring": [{"start_date": day(0), "end_date": day(7), "weekdays": [True]}]},
+        {"recurring": [{"start_date": day(0), "end_date": day(7)}]},
+        {"ranges": [{"start_date": day(0), "end_date": day(1000)}]},
+    ):
+        assert client.post(url, json=body, headers=site["host"]).status_code == 400
+
+    for url in (
+        "/api/campsites?available=true",
+        f"/api/campsites/{site['campsite_id']}/availability?end_date={day(-30)}",
+        f"/api/campsites/{site['campsite_id']}/availability?end_date={day(400)}",
+    ):
+        assert client.get(url).status_code == 400
+    assert client.get("/api/campsites/999/blackouts").status_code == 404
@@ -0,0 +1,145 @@
+"""
+Tests for the in-memory availability index
+Run with: pytest test_availability_index.py
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from availability_index import CHECKED_KEY, AvailabilityConflict, get_index
+from conftest import STAY_START, book
+from models import db, Booking, Campsite, User
+
+
+def range_loads(queries):
+    return sum("UNION ALL" in statement for statement in queries.statements)
+
+
+def test_checks_are_answered_from_memory(client, site, count_queries):
+    assert book(client, site).status_code == 201
+
+    with count_queries() as queries:
+        assert book(client, site, offset=1).status_code == 400
+        assert book(client, site, offset=5).status_code == 201
+    assert range_loads(queries) == 0
+
+
+def test_cancel_and_pay_update_the_index_in_place(app, client, site, count_queries):
+    booking = book(client, site).get_json()["booking"]
+    client.post("/api/pay", json={"booking_id": booking["id"]})
+    client.put(f"/api/bookings/{booking['id']}/cancel", headers=site["guest"])
+
+    with app.app_context():
+        campsite = db.session.get(Campsite, site["campsite_id"])
+        entry = get_index(app).entries[campsite.id]
+        assert entry.version == campsite.availability_version
+        assert booking["id"] not in entry.bookings
+
+    with count_queries() as queries:
+        assert book(client, site).status_code == 201
+    assert range_loads(queries) == 0
+
+
+def test_bulk_checks(app, client, site):
+    book(client, site)
+    with app.app_context():
+        versions = {
+            campsite.id: campsite.availability_version
+            for campsite in Campsite.query.all()
+        }
+        index = get_index(app)
+        end = STAY_START + timedelta(days=1)
+        assert index.taken_ranges(versions, STAY_START, end) == {
+            site["campsite_id"]: [(STAY_START, STAY_START + timedelta(days=2))]
+        }
+
+
+def seed_file(app):
+    with app.app_context():
+        guest = User(name="Guest", email="guest@example.com", password_hash="x")
+        db.session.add(guest)
+        db.session.flush()
+        campsite = Campsite(
+            title="Riverside",
+            description="A quiet spot.",
+            price=20.0,
+            location="Yosemite, California",
+            host_id=guest.id,
+        )
+        db.session.add(campsite)
+        db.session.commit()
+        return guest.id, campsite.id
+
+
+def test_other_workers_writes_are_seen(workers):
+    first, second = workers
+    guest_id, campsite_id = seed_file(first)
+
+    for app in (first, second):
+        with app.app_context():
+            campsite = db.session.get(Campsite, campsite_id)
+            assert get_index(app).is_available(
+                campsite_id,
+                campsite.availability_version,
+                STAY_START,
+                STAY_START + timedelta(days=1),
+            )
+
+    with second.app_context():
+        db.session.add(
+            Booking(
+                user_id=guest_id,
+                campsite_id=campsite_id,
+                start_date=STAY_START,
+                end_date=STAY_START + timedelta(days=2),
+                total_price=40,
+                status="confirmed",
+            )
+        )
+        db.session.commit()
+
+    with first.app_context():
+        campsite = db.session.get(Campsite, campsite_id)
+        assert not get_index(first).is_available(
+            campsite_id,
+            campsite.availability_version,
+            STAY_START,
+            STAY_START + timedelta(days=1),
+        )
+
+
+def test_booking_from_a_stale_check_conflicts(workers):
+    first, second = workers
+    guest_id, campsite_id = seed_file(first)
+
+    def booking():
+        return Booking(
+            user_id=guest_id,
+            campsite_id=campsite_id,
+            start_date=STAY_START,
+            end_date=STAY_START + timedelta(days=2),
+            total_price=40,
+            status="confirmed",
+        )
+
+    with first.app_context():
+        campsite = db.session.get(Campsite, campsite_id)
+        version = campsite.availability_version
+        assert get_index(first).is_available(
+            campsite_id, version, STAY_START, STAY_START + timedelta(days=2)
+        )
+        # End the read so the other worker can write to the SQLite file,
+        # keeping the version the check answered from
+        db.session.commit()
+        db.session.info[CHECKED_KEY] = {campsite_id: version}
+
+        with second.app_context():
+            db.session.add(booking())
+            db.session.commit()
+
+        db.session.add(booking())
+        with pytest.raises(AvailabilityConflict):
+            db.session.commit()
+        db.session.rollback()
+        assert Booking.query.count() == 1
@@ -0,0 +1,44 @@
+"""
+Smoke tests for the benchmark suite
+Run with: pytest test_benchmark.py
+"""
+
+from benchmark import SCENARIOS, compare_results, run_benchmark, uncovered_endpoints
+
+
+def test_every_blueprint_route_has_a_scenario(app):
+    assert uncovered_endpoints(app) == []
+
+
+def test_scenarios_succeed(app, seed):
+    seed(users=5, campsites=5, bookings_per_campsite=2, reviews_per_campsite=1)
+
+    # Skip the password-hashing routes, they only add runtime here
+    scenarios = [
+        s for s in SCENARIOS if s.endpoint not in ("auth.register", "auth.login")
+    ]
+    results = run_benchmark(
+        app, requests_per_endpoint=3, concurrency=1, warmup=0, scenarios=scenarios
+    )
+
+    assert set(results["endpoints"]) == {s.name for s in scenarios}
+    for name, stats in results["endpoints"].items():
+        assert stats["count"] == 3, name
+        assert stats["errors"] == 0, name
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+
+
+def test_compare_flags_regressions_past_threshold():
+    def result(p95, throughput):
+        return {"endpoints": {"GET /x": {"p95_ms": p95, "throughput_rps": throughput}}}
+
+    _, regressed = compare_results(result(10, 100), result(10.5, 100), threshold=0.1)
+    assert regressed == []
+
+    _, regressed = compare_results(result(10, 100), result(12, 100), threshold=0.1)
+    assert regressed == ["GET /x"]
+
+    _, regressed = compare_results(
+        result(10, 100), result(10, 80), metric="throughput_rps", threshold=0.1
+    )
+    assert regressed == ["GET /x"]
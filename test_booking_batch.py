@@ -0,0 +1,147 @@
+"""
+Tests for atomic multi-site group booking
+Run with: pytest test_booking_batch.py
+"""
+
+from datetime import timedelta
+
+import pytest
+
+from conftest import STAY_START, stay
+from models import db, Blackout, Booking
+
+
+@pytest.fixture
+def group(seed, auth_headers):
+    ids = seed(users=2, campsites=12)
+    return {"campsites": ids["campsites"], "guest": auth_headers(ids["users"][1])}
+
+
+def post_batch(client, group, items, **options):
+    return client.post(
+        "/api/bookings/batch",
+        json={"bookings": items, **options},
+        headers=group["guest"],
+    )
+
+
+def statuses(response):
+    return [result["status"] for result in response.get_json()["results"]]
+
+
+def booking_count(app):
+    with app.app_context():
+        return db.session.query(Booking).count()
+
+
+def test_books_every_site_in_one_transaction(app, client, group):
+    items = [stay(campsite_id=campsite_id) for campsite_id in group["campsites"][:5]]
+
+    response = post_batch(client, group, items)
+
+    assert response.status_code == 201, response.get_json()
+    assert statuses(response) == ["created"] * 5
+    quote = client.get(
+        f"/api/campsites/{group['campsites'][0]}/quote",
+        query_string={
+            "start_date": items[0]["start_date"],
+            "end_date": items[0]["end_date"],
+        },
+    ).get_json()
+    booking = response.get_json()["results"][0]["booking"]
+    assert booking["total_price"] == quote["total_price"]
+    assert booking_count(app) == 5
+
+
+def test_one_conflict_rolls_back_the_whole_batch(app, client, group):
+    first, second, third = group["campsites"][:3]
+    assert post_batch(client, group, [stay(campsite_id=second)]).status_code == 201
+
+    response = post_batch(
+        client,
+        group,
+        [stay(campsite_id=first), stay(1, campsite_id=second), stay(campsite_id=third)],
+    )
+
+    assert response.status_code == 400
+    assert statuses(response) == ["skipped", "failed", "skipped"]
+    assert booking_count(app) == 1
+
+
+def test_partial_mode_keeps_the_bookable_sites(app, client, group):
+    first, second, third = group["campsites"][:3]
+    with app.app_context():
+        db.session.add(
+            Blackout(
+                campsite_id=third,
+                start_date=STAY_START,
+                end_date=STAY_START + timedelta(days=1),
+            )
+        )
+        db.session.commit()
+
+    items = [
+        stay(campsite_id=first),
+        stay(campsite_id=second),
+        stay(campsite_id=third),
+        stay(campsite_id=999),
+    ]
+    response = post_batch(client, group, items, partial=True)
+
+    assert response.status_code == 201
+    assert statuses(response) == ["created", "created", "failed", "failed"]
+    errors = [r.get("error") for r in response.get_json()["results"]]
+    assert errors[2] == "Campsite is not available for selected dates"
+    assert errors[3] == "Campsite not found"
+    assert booking_count(app) == 2
+
+
+def test_overlapping_items_for_one_site_conflict(client, group):
+    campsite_id = group["campsites"][0]
+    items = [
+        stay(campsite_id=campsite_id),
+        stay(1, campsite_id=campsite_id),
+        stay(2, campsite_id=campsite_id),
+    ]
+
+    response = post_batch(client, group, items, partial=True)
+
+    assert statuses(response) == ["created", "failed", "created"]
+
+
+def test_query_count_does_not_grow_with_batch_size(client, group, count_queries):
+    counts = []
+    for offset, size in ((0, 2), (5, 10)):
+        items = [stay(offset, campsite_id=c) for c in group["campsites"][:size]]
+        with count_queries() as queries:
+            assert post_batch(client, group, items).status_code == 201
+        # SQLite runs one INSERT per new row; every other statement is shared
+        counts.append(queries.count - size)
+
+    assert counts[0] == counts[1]
+
+
+def test_invalid_batches(client, group):
+    past = stay(-20, campsite_id=group["campsites"][0])
+    for body in (
+        {},
+        {"bookings": []},
+        {"bookings": [stay(campsite_id=group["campsites"][0])] * 51},
+        {"bookings": [stay(campsite_id=group["campsites"][0])], "partial": "false"},
+    ):
+        response = client.post("/api/bookings/batch", json=body, headers=group["guest"])
+        assert response.status_code == 400
+
+    response = post_batch(client, group, [past, {"start_date": "soon"}, "site"])
+    assert response.status_code == 400
+    assert statuses(response) == ["failed"] * 3
+
+    first = group["campsites"][0]
+    response = post_batch(
+        client,
+        group,
+        [stay(campsite_id=True), stay(campsite_id=first + 0.5)],
+        partial=True,
+    )
+    assert response.status_code == 400
+    assert statuses(response) == ["failed"] * 2
@@ -0,0 +1,171 @@
+"""
+Tests for bulk campsite import and update
+Run with: pytest test_campsite_bulk.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import campsite_bulk
+from models import db, Campsite, ChangeEvent, PriceNight
+
+
+@pytest.fixture
+def host(seed, auth_headers):
+    ids = seed(users=2, campsites=3)
+    return {
+        "id": ids["users"][0],
+        "headers": auth_headers(ids["users"][0]),
+        "own": [ids["campsites"][0], ids["campsites"][2]],
+        "other": ids["campsites"][1],
+    }
+
+
+def site(i, **fields):
+    return {
+        "title": f" Site {i} ",
+        "description": "Flat pitch.",
+        "price": 30,
+        "location": "Big Sur, California",
+        **fields,
+    }
+
+
+def test_import_reports_invalid_rows_and_creates_the_rest(app, client, host):
+    rows = [
+        site(0, latitude=36.27, longitude=-121.8),
+        site(1, price=0),
+        {"title": "No price"},
+        site(3, latitude=36.27),
+        site(4),
+    ]
+    response = client.post("/api/campsites/bulk", json=rows, headers=host["headers"])
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["created"] == 2
+    assert body["errors"] == [
+        {"index": 1, "error": "Price must be greater than 0"},
+        {"index": 2, "error": "Title, description, price, and location are required"},
+        {"index": 3, "error": "latitude and longitude must be given together"},
+    ]
+    with app.app_context():
+        first, second = (db.session.get(Campsite, i) for i in body["ids"])
+        assert (first.title, first.host_id, first.geo_band) == (
+            "Site 0",
+            host["id"],
+            1262,
+        )
+        assert second.latitude is None and second.created_at is not None
+        events = ChangeEvent.query.filter(
+            ChangeEvent.entity == "campsite", ChangeEvent.entity_id.in_(body["ids"])
+        )
+        assert sorted(e.action for e in events) == ["create", "create"]
+
+
+def test_ndjson_import_streams_in_chunks(app, client, host, monkeypatch):
+    monkeypatch.setattr(campsite_bulk, "BULK_CHUNK_SIZE", 2)
+    chunks = []
+    insert_chunk = campsite_bulk._insert_chunk
+
+    def record(chunk, result):
+        chunks.append([index for index, _ in chunk])
+        insert_chunk(chunk, result)
+
+    monkeypatch.setattr(campsite_bulk, "_insert_chunk", record)
+    lines = [
+        f'{{"title": "Site {i}", "description": "d", "price": 25, '
+        f'"location": "Big Sur"}}'
+        for i in range(5)
+    ]
+    lines[2:2] = ["", "{not json"]
+    response = client.post(
+        "/api/campsites/bulk",
+        data="\n".join(lines) + "\n",
+        content_type="application/x-ndjson",
+        headers=host["headers"],
+    )
+
+    body = response.get_json()
+    assert response.status_code == 201
+    assert body["created"] == 5
+    assert body["errors"] == [{"index": 2, "error": "Invalid JSON"}]
+    assert chunks == [[0, 1], [3, 4], [5]]
+    with app.app_context():
+        titles = [db.session.get(Campsite, i).title for i in body["ids"]]
+    assert titles == [f"Site {i}" for i in range(5)]
+
+
+def test_failed_chunk_is_reported_and_later_chunks_written(
+    app, client, host, monkeypatch
+):
+    monkeypatch.setattr(campsite_bulk, "BULK_CHUNK_SIZE", 2)
+    insert_chunk = campsite_bulk._insert_chunk
+
+    def fail_row_two(chunk, result):
+        if 2 in [index for index, _ in chunk]:
+            raise RuntimeError("disk full")
+        insert_chunk(chunk, result)
+
+    monkeypatch.setattr(campsite_bulk, "_insert_chunk", fail_row_two)
+    rows = [site(i) for i in range(5)]
+    response = client.post("/api/campsites/bulk", json=rows, headers=host["headers"])
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["created"] == 3
+    assert body["errors"] == [
+        {"index": 2, "end_index": 3, "error": "Failed to write rows"}
+    ]
+    with app.app_context():
+        titles = [db.session.get(Campsite, i).title for i in body["ids"]]
+    assert titles == ["Site 0", "Site 1", "Site 4"]
+
+    monkeypatch.setattr(campsite_bulk, "BULK_CHUNK_SIZE", 5)
+    response = client.post("/api/campsites/bulk", json=rows, headers=host["headers"])
+    assert response.status_code == 500
+    assert response.get_json()["ids"] == []
+
+
+def test_import_rejects_bodies_that_are_not_lists(client, host):
+    response = client.post(
+        "/api/campsites/bulk", json={"title": "x"}, headers=host["headers"]
+    )
+    assert response.status_code == 400
+    response = client.post("/api/campsites/bulk", json=[], headers=host["headers"])
+    assert response.status_code == 400
+
+
+def test_bulk_update_applies_own_rows_and_reprices(app, client, host):
+    first, second = host["own"]
+    rule = {"kind": "weekend", "multiplier": 2}
+    client.post(
+        f"/api/campsites/{first}/pricing-rules", json=rule, headers=host["headers"]
+    )
+
+    rows = [
+        {"id": first, "price": 50},
+        {"id": second, "title": "Renamed", "latitude": 10, "longitude": 20},
+        {"id": host["other"], "price": 10},
+        {"id": 999, "price": 10},
+        {"id": first},
+        {"price": 10},
+        {"id": True, "price": 10},
+        {"id": second, "price": 99},
+    ]
+    response = client.patch("/api/campsites/bulk", json=rows, headers=host["headers"])
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["updated"] == 2
+    assert body["ids"] == [first, second]
+    assert [error["index"] for error in body["errors"]] == [4, 5, 6, 7, 2, 3]
+    assert body["errors"][3]["error"] == "Campsite id appears more than once"
+    with app.app_context():
+        renamed = db.session.get(Campsite, second)
+        assert (renamed.title, renamed.geo_band) == ("Renamed", 1000)
+        assert db.session.get(Campsite, host["other"]).price != 10
+        saturday = date.today() + timedelta(days=(5 - date.today().weekday()) % 7)
+        night = db.session.get(PriceNight, (first, saturday))
+        assert night.price == 100
@@ -0,0 +1,117 @@
+"""
+Tests for campsite sort options, stored aggregates and cursor pagination
+Run with: pytest test_campsite_sort.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Booking, Campsite, Review
+from routes.campsites import SORTS
+
+
+@pytest.fixture
+def ranked(app, seed):
+    """Twelve campsites with varied ratings and booking counts, plus ties"""
+    ids = seed(users=4, campsites=12)
+    guests = ids["users"][1:]
+    with app.app_context():
+        for position, campsite_id in enumerate(ids["campsites"]):
+            for guest in guests[: position % 3]:
+                db.session.add(
+                    Review(
+                        user_id=guest,
+                        campsite_id=campsite_id,
+                        rating=1 + (position + guest) % 5,
+                    )
+                )
+            for night in range(position % 4):
+                start = date.today() + timedelta(days=10 + 3 * night)
+                db.session.add(
+                    Booking(
+                        user_id=guests[0],
+                        campsite_id=campsite_id,
+                        start_date=start,
+                        end_date=start + timedelta(days=2),
+                        total_price=40,
+                        status="confirmed",
+                    )
+                )
+        db.session.commit()
+    return ids
+
+
+def fetch_all_pages(client, sort, limit=5):
+    campsites, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/campsites", query_string=params).get_json()
+        campsites.extend(body["campsites"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return campsites
+
+
+def test_aggregates_follow_reviews_and_bookings(app, client, ranked, auth_headers):
+    with app.app_context():
+        for campsite in Campsite.query:
+            reviews = Review.query.filter_by(campsite_id=campsite.id).all()
+            expected = sum(r.rating for r in reviews) / len(reviews) if reviews else 0
+            assert campsite.review_count == len(reviews)
+            assert campsite.average_rating == pytest.approx(expected)
+        booking = Booking.query.first()
+        campsite_id, before = booking.campsite_id, booking.campsite.booking_count
+
+    client.put(
+        f"/api/bookings/{booking.id}/cancel", headers=auth_headers(booking.user_id)
+    )
+
+    with app.app_context():
+        assert db.session.get(Campsite, campsite_id).booking_count == before - 1
+
+
+@pytest.mark.parametrize("sort", list(SORTS))
+def test_pages_follow_sort_order_without_gaps(app, client, ranked, sort):
+    with app.app_context():
+        column, descending, _ = SORTS[sort]
+        expected = [
+            campsite.id
+            for campsite in sorted(
+                Campsite.query,
+                key=lambda c: (getattr(c, column.key), c.id),
+                reverse=descending,
+            )
+        ]
+
+    assert [c["id"] for c in fetch_all_pages(client, sort)] == expected
+
+
+def test_unsorted_pages_follow_id(client, ranked):
+    assert [c["id"] for c in fetch_all_pages(client, None)] == ranked["campsites"]
+
+
+def test_invalid_sort_limit_and_cursor(client, ranked):
+    body = client.get("/api/campsites?sort=rating&limit=2").get_json()
+
+    for query in (
+        "sort=distance",
+        "limit=0",
+        "limit=abc",
+        "sort=rating&cursor=not-a-cursor",
+        f"sort=price&cursor={body['next_cursor']}",
+    ):
+        assert client.get(f"/api/campsites?{query}").status_code == 400
+
+
+def test_refresh_stats_command_recomputes_aggregates(app, ranked):
+    with app.app_context():
+        Campsite.query.update({"average_rating": 0, "review_count": 0})
+        db.session.commit()
+
+    assert app.test_cli_runner().invoke(args=["refresh-stats"]).exit_code == 0
+
+    with app.app_context():
+        assert Campsite.query.filter(Campsite.review_count > 0).count() == 8
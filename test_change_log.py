@@ -0,0 +1,85 @@
+"""
+Tests for the incremental change feed
+Run with: pytest test_change_log.py
+"""
+
+from datetime import datetime, timedelta
+
+from change_log import compact_change_log
+from models import db, Campsite, ChangeEvent
+
+
+def feed(client, **params):
+    response = client.get("/api/changes", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_writes_are_recorded_in_order(client, seed, auth_headers):
+    ids = seed(users=2, campsites=0)
+    headers = auth_headers(ids["users"][0])
+    cursor = feed(client)["next_cursor"]
+
+    created = client.post(
+        "/api/campsites",
+        json={
+            "title": "Lakeside",
+            "description": "Quiet",
+            "price": 30,
+            "location": "Tahoe, California",
+        },
+        headers=headers,
+    )
+    campsite_id = created.get_json()["campsite"]["id"]
+    client.put(f"/api/campsites/{campsite_id}", json={"price": 35}, headers=headers)
+    client.delete(f"/api/campsites/{campsite_id}", headers=headers)
+
+    changes = feed(client, since=cursor)["changes"]
+    assert [(c["entity"], c["entity_id"], c["action"]) for c in changes] == [
+        ("campsite", campsite_id, "create"),
+        ("campsite", campsite_id, "update"),
+        ("campsite", campsite_id, "delete"),
+    ]
+
+
+def test_rolled_back_writes_leave_no_events(app):
+    with app.app_context():
+        db.session.add(
+            Campsite(title="Gone", description="", price=1, location="", host_id=1)
+        )
+        db.session.flush()
+        db.session.rollback()
+        assert ChangeEvent.query.count() == 0
+
+
+def test_cursor_paging(client, seed):
+    seed(users=2, campsites=5)
+
+    first = feed(client, limit=3, entity="campsite")
+    second = feed(client, since=first["next_cursor"], limit=3, entity="campsite")
+
+    assert first["has_more"] and not second["has_more"]
+    assert len(first["changes"]) + len(second["changes"]) == 5
+    assert second["changes"][0]["id"] > first["next_cursor"]
+    assert feed(client, since=second["next_cursor"])["changes"] == []
+    assert client.get("/api/changes?limit=0").status_code == 400
+    assert client.get("/api/changes?since=abc").status_code == 400
+
+
+def test_compaction_keeps_latest_event_per_row(app, seed):
+    ids = seed(users=2, campsites=2)
+    with app.app_context():
+        campsite = db.session.get(Campsite, ids["campsites"][0])
+        for price in (40, 50):
+            campsite.price = price
+            db.session.commit()
+        ChangeEvent.query.update({"created_at": datetime.utcnow() - timedelta(days=30)})
+        db.session.commit()
+
+        assert compact_change_log(timedelta(days=7)) == 2
+        remaining = {
+            (event.entity, event.entity_id): event.action for event in ChangeEvent.query
+        }
+        assert remaining[("campsite", ids["campsites"][0])] == "update"
+        assert remaining[("campsite", ids["campsites"][1])] == "create"
+        assert ChangeEvent.query.count() == len(remaining)
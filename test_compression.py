@@ -0,0 +1,69 @@
+"""
+Tests for response compression
+Run with: pytest test_compression.py
+"""
+
+import gzip
+import json
+import zlib
+
+from compression import CompressedBodyCache
+
+
+def test_streamed_list_is_gzipped(client, seed):
+    seed(users=3, campsites=10)
+
+    response = client.get("/api/campsites", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.data))["total"] == 10
+
+
+def test_small_or_unrequested_bodies_are_sent_raw(app, client, seed):
+    ids = seed(users=2, campsites=1)
+    url = f"/api/campsites/{ids['campsites'][0]}"
+
+    # Below the size threshold
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    assert "Content-Encoding" not in client.get(url).headers
+    response = client.get(url, headers={"Accept-Encoding": "gzip;q=0, deflate"})
+    assert response.headers["Content-Encoding"] == "deflate"
+    assert json.loads(zlib.decompress(response.data))["campsite"]["id"] == 1
+
+
+def test_etag_per_encoding_and_cached_body(app, client, seed):
+    ids = seed(users=2, campsites=1)
+    url = f"/api/campsites/{ids['campsites'][0]}"
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    headers = {"Accept-Encoding": "gzip"}
+
+    first = client.get(url, headers=headers)
+    plain = client.get(url)
+    assert first.headers["ETag"].endswith('-gzip"')
+    assert first.headers["ETag"] != plain.headers["ETag"]
+
+    second = client.get(url, headers=headers)
+    assert second.data == first.data
+    assert app.extensions["compression"].size == len(first.data)
+
+    not_modified = client.get(
+        url, headers={**headers, "If-None-Match": first.headers["ETag"]}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+
+
+def test_cache_evicts_least_recently_used():
+    cache = CompressedBodyCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.get("a")
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.size == 8
@@ -0,0 +1,115 @@
+"""
+Tests for the streaming booking export
+Run with: pytest test_export.py
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from archive import archive_bookings
+from models import db, Booking
+
+
+@pytest.fixture
+def sites(app, seed, auth_headers):
+    """Two campsites with three bookings each, hosted by different users"""
+    ids = seed(users=3, campsites=2, bookings_per_campsite=3)
+    return {
+        "campsites": ids["campsites"],
+        "bookings": ids["bookings"],
+        "users": ids["users"],
+        "host": auth_headers(ids["users"][0]),
+        "guest": auth_headers(ids["users"][2]),
+    }
+
+
+def export(client, headers, **params):
+    response = client.get("/api/export/bookings", query_string=params, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def csv_rows(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_hosts_export_their_campsites_as_csv(client, sites):
+    response = export(client, sites["host"])
+
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert "bookings.csv" in response.headers["Content-Disposition"]
+    rows = csv_rows(response)
+    assert [int(row["id"]) for row in rows] == sites["bookings"][:3]
+    assert rows[0]["campsite_id"] == str(sites["campsites"][0])
+    assert rows[0]["campsite_title"] == "Campsite 0"
+    assert rows[0]["nights"] == "2"
+    assert rows[0]["status"] == "paid"
+    assert rows[0]["archived"] == "False"
+
+
+def test_admins_export_everything_as_ndjson(app, client, sites):
+    app.config["ADMIN_USER_IDS"] = [sites["users"][2]]
+
+    response = export(client, sites["guest"], format="ndjson")
+
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row["id"] for row in rows] == sites["bookings"]
+    assert rows[0]["total_price"] == 40.0
+
+
+def test_exports_resume_and_filter_by_stay_date(client, sites):
+    first, second, third = sites["bookings"][:3]
+    rows = csv_rows(export(client, sites["host"], since=first))
+    assert [int(row["id"]) for row in rows] == [second, third]
+
+    # Seeded stays start 30, 33 and 36 days out
+    start = date.today() + timedelta(days=31)
+    end = start + timedelta(days=3)
+    params = {"from": start.isoformat(), "to": end.isoformat()}
+    rows = csv_rows(export(client, sites["host"], **params))
+    assert [int(row["id"]) for row in rows] == [second]
+
+
+def test_exports_are_gzipped_on_the_fly(client, sites):
+    plain = export(client, sites["host"]).get_data()
+    response = client.get(
+        "/api/export/bookings",
+        headers={**sites["host"], "Accept-Encoding": "gzip"},
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == plain
+
+
+def test_archived_bookings_are_merged_in_id_order(app, client, sites):
+    first = sites["bookings"][0]
+    with app.app_context():
+        booking = db.session.get(Booking, first)
+        booking.start_date = date.today() - timedelta(days=800)
+        booking.end_date = date.today() - timedelta(days=798)
+        db.session.commit()
+        assert archive_bookings(timedelta(days=365)) == 1
+
+    current = [int(row["id"]) for row in csv_rows(export(client, sites["host"]))]
+    assert current == sites["bookings"][1:3]
+    rows = csv_rows(export(client, sites["host"], include_archived="true"))
+    assert [(int(row["id"]), row["archived"]) for row in rows] == [
+        (first, "True"),
+        *((booking_id, "False") for booking_id in current),
+    ]
+
+
+def test_invalid_exports(client, sites):
+    assert client.get("/api/export/bookings", headers=sites["guest"]).status_code == 403
+    for params in ({"format": "xml"}, {"from": "soon"}, {"since": -1}):
+        response = client.get(
+            "/api/export/bookings", query_string=params, headers=sites["host"]
+        )
+        assert response.status_code == 400
@@ -0,0 +1,104 @@
+"""
+Tests for sparse fieldsets and embedded relations
+Run with: pytest test_fieldsets.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from fieldsets import Fieldset
+from models import db, ArchivedBooking, Booking, Campsite, Review
+
+
+@pytest.fixture
+def ids(seed):
+    return seed(users=3, campsites=3, bookings_per_campsite=2, reviews_per_campsite=4)
+
+
+def test_every_field_matches_to_dict(app, ids):
+    with app.app_context():
+        db.session.add(
+            ArchivedBooking(
+                id=9999,
+                user_id=ids["users"][1],
+                campsite_id=ids["campsites"][0],
+                start_date=date(2020, 1, 1),
+                end_date=date(2020, 1, 3),
+                total_price=40,
+                status="paid",
+                created_at=date(2019, 12, 1),
+            )
+        )
+        db.session.commit()
+        for model in (Campsite, Booking, ArchivedBooking, Review):
+            obj = model.query.first()
+            names = ",".join(Fieldset(model).fields)
+            fieldset = Fieldset.from_args(model, {"fields": names})
+            assert fieldset.serialize(obj) == obj.to_dict()
+
+
+def test_fields_load_only_the_columns_they_read(client, ids, count_queries):
+    with count_queries() as queries:
+        response = client.get("/api/campsites?fields=title,price&sort=rating&limit=2")
+
+    assert response.status_code == 200
+    campsites = response.get_json()["campsites"]
+    assert [sorted(c) for c in campsites] == [["id", "price", "title"]] * 2
+    assert response.get_json()["next_cursor"]
+    (statement,) = queries.statements
+    assert "description" not in statement
+    assert "JOIN" not in statement
+
+    response = client.get("/api/campsites?fields=title,host_name")
+    assert response.get_json()["campsites"][0]["host_name"].startswith("User")
+
+
+def test_detail_embeds_latest_reviews_host_and_availability(client, ids):
+    campsite_id = ids["campsites"][0]
+    response = client.get(
+        f"/api/campsites/{campsite_id}?fields=title&include=reviews:2,host,availability"
+    )
+
+    assert response.status_code == 200
+    campsite = response.get_json()["campsite"]
+    assert sorted(campsite) == ["availability", "host", "id", "reviews", "title"]
+    reviews = campsite["reviews"]
+    assert len(reviews) == 2
+    assert reviews[0]["id"] > reviews[1]["id"]
+    assert {review["campsite_id"] for review in reviews} == {campsite_id}
+    assert campsite["host"] == {"id": ids["users"][0], "name": "User 0"}
+    first = date.today() + timedelta(days=30)
+    assert campsite["availability"][0] == {
+        "start_date": first.isoformat(),
+        "end_date": (first + timedelta(days=2)).isoformat(),
+    }
+
+
+def test_lists_embed_in_bounded_batches(client, ids, auth_headers, count_queries):
+    headers = auth_headers(ids["users"][1])
+    with count_queries() as queries:
+        response = client.get(
+            "/api/bookings?fields=status&include=campsite", headers=headers
+        )
+    bookings = response.get_json()["bookings"]
+    assert bookings and all(sorted(b) == ["campsite", "id", "status"] for b in bookings)
+    assert bookings[0]["campsite"]["title"].startswith("Campsite")
+    assert queries.count == 2
+
+    response = client.get(
+        f"/api/reviews/{ids['campsites'][1]}?fields=rating&include=user"
+    )
+    body = response.get_json()
+    assert body["total_reviews"] == 4
+    assert all(sorted(r) == ["id", "rating", "user"] for r in body["reviews"])
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["fields=title,secret", "include=owner", "include=reviews:0", "include=host:2"],
+)
+def test_invalid_fieldsets_are_rejected(client, ids, query):
+    response = client.get(f"/api/campsites?{query}")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
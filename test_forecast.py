@@ -0,0 +1,118 @@
+"""
+Tests for occupancy forecasts
+Run with: pytest test_forecast.py
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+
+from forecast import HORIZON_DAYS, YEAR_DAYS, get_forecasts, occupancy_matrix
+from models import db, ArchivedBooking, Booking
+
+
+def add_stays(app, site, starts, nights=1, model=Booking, status="paid"):
+    with app.app_context():
+        db.session.add_all(
+            model(
+                id=None if model is Booking else 10_000 + offset,
+                user_id=site["guest_id"],
+                campsite_id=site["campsite_id"],
+                start_date=start,
+                end_date=start + timedelta(days=nights),
+                total_price=20,
+                status=status,
+            )
+            for offset, start in enumerate(starts)
+        )
+        db.session.commit()
+
+
+def forecast(client, site):
+    url = f"/api/campsites/{site['campsite_id']}/forecast"
+    response = client.get(url, headers=site["host"])
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_occupancy_matrix_expands_and_clips_stays():
+    occupied = occupancy_matrix(
+        rows=np.array([0, 0, 1, 1]),
+        starts=np.array([1, -3, 2, 4]),
+        ends=np.array([3, 1, 9, 5]),
+        n_rows=3,
+        width=6,
+    )
+
+    assert occupied.tolist() == [
+        [1, 1, 1, 0, 0, 0],
+        [0, 0, 1, 1, 1, 1],
+        [0, 0, 0, 0, 0, 0],
+    ]
+
+
+def test_booked_nights_are_certain(app, client, site):
+    today = date.today()
+    add_stays(app, site, [today + timedelta(days=3)], nights=2)
+    add_stays(app, site, [today + timedelta(days=10)], status="cancelled")
+
+    result = forecast(client, site)
+
+    nights = result["nights"]
+    assert len(nights) == HORIZON_DAYS
+    assert nights[0]["date"] == today.isoformat()
+    assert [n["date"] for n in nights if n["booked"]] == [
+        (today + timedelta(days=3)).isoformat(),
+        (today + timedelta(days=4)).isoformat(),
+    ]
+    assert all(n["expected_occupancy"] == 1.0 for n in nights if n["booked"])
+    assert result["weeks"][0]["booked_nights"] == 2
+    assert len(result["weeks"]) == HORIZON_DAYS // 7
+
+
+def test_weekday_pattern_and_last_years_season(app, client, site):
+    today = date.today()
+    # Every night on today's weekday for the last eight weeks
+    recent = [today - timedelta(days=7 * week) for week in range(1, 9)]
+    # Last year, the fortnight from three weeks ahead was fully booked
+    season = today - timedelta(days=YEAR_DAYS - 21)
+    add_stays(app, site, recent)
+    add_stays(app, site, [season], nights=14, model=ArchivedBooking)
+
+    nights = forecast(client, site)["nights"]
+    occupancy = [n["expected_occupancy"] for n in nights]
+
+    assert occupancy[0] > occupancy[1]
+    assert occupancy[0] == occupancy[7]
+    assert min(occupancy[24:32]) > max(occupancy[1:7])
+    assert not any(n["booked"] for n in nights)
+
+
+def test_new_campsites_are_forecast_alone_until_the_refresh(
+    app, client, site, seed, auth_headers, count_queries
+):
+    forecast(client, site)
+    add_stays(app, site, [date.today() + timedelta(days=1)])
+    assert not forecast(client, site)["nights"][1]["booked"]
+
+    ids = seed(users=1, campsites=1)
+    new = {"campsite_id": ids["campsites"][0], "guest_id": ids["users"][0]}
+    add_stays(app, new, [date.today() + timedelta(days=2)])
+    new["host"] = auth_headers(ids["users"][0])
+    assert forecast(client, new)["nights"][2]["booked"]
+    with count_queries() as queries:
+        forecast(client, new)
+    assert not any("archived_booking" in s for s in queries.statements)
+    assert not forecast(client, site)["nights"][1]["booked"]
+
+    with app.app_context():
+        get_forecasts(app).refresh()
+    assert forecast(client, site)["nights"][1]["booked"]
+
+
+def test_forecast_is_for_the_host_only(client, site):
+    url = f"/api/campsites/{site['campsite_id']}/forecast"
+
+    assert client.get(url, headers=site["guest"]).status_code == 403
+    response = client.get("/api/campsites/999/forecast", headers=site["host"])
+    assert response.status_code == 404
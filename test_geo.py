@@ -0,0 +1,181 @@
+"""
+Tests for radius and bounding-box campsite search
+Run with: pytest test_geo.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from geo import set_coordinates
+from models import db, Campsite, User
+
+# title: (latitude, longitude, price)
+SITES = {
+    "valley": (37.75, -119.59, 30),
+    "meadow": (37.85, -119.59, 60),  # about 11 km north of valley
+    "lake": (38.25, -119.59, 30),  # about 56 km north of valley
+    "reef": (-17.8, 179.9, 40),
+    "atoll": (-17.8, -179.9, 40),
+    "unplaced": (None, None, 40),
+}
+
+
+@pytest.fixture
+def sites(app, auth_headers):
+    with app.app_context():
+        user = User(name="Host", email="host@example.com", password_hash="unused")
+        db.session.add(user)
+        db.session.flush()
+        ids = {}
+        for title, (latitude, longitude, price) in SITES.items():
+            campsite = Campsite(
+                title=title,
+                description="",
+                price=price,
+                location="Somewhere",
+                host_id=user.id,
+            )
+            set_coordinates(campsite, latitude, longitude)
+            db.session.add(campsite)
+            db.session.flush()
+            ids[title] = campsite.id
+        db.session.commit()
+        ids["headers"] = auth_headers(user.id)
+        return ids
+
+
+def search(client, **params):
+    response = client.get("/api/campsites", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["campsites"]
+
+
+def titles(campsites):
+    return [campsite["title"] for campsite in campsites]
+
+
+def test_near_filters_by_radius_and_sorts_by_distance(client, sites):
+    found = search(client, near="37.75,-119.59", radius_km=20)
+    assert titles(found) == ["valley", "meadow"]
+    assert found[0]["distance_km"] == 0
+    assert found[1]["distance_km"] == pytest.approx(11.12, abs=0.01)
+
+    assert titles(search(client, near="37.75,-119.59", radius_km=100)) == [
+        "valley",
+        "meadow",
+        "lake",
+    ]
+
+
+def test_near_combines_with_price_filter_and_sort(client, sites):
+    near = {"near": "37.75,-119.59", "radius_km": 100}
+    assert titles(search(client, max_price=40, **near)) == ["valley", "lake"]
+    assert titles(search(client, sort="price", **near)) == [
+        "valley",
+        "lake",
+        "meadow",
+    ]
+
+
+def test_near_pages_continue_in_distance_order(client, sites):
+    found, cursor = [], None
+    while True:
+        params = {"near": "37.75,-119.59", "radius_km": 100, "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/campsites", query_string=params).get_json()
+        found.extend(body["campsites"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert titles(found) == ["valley", "meadow", "lake"]
+
+
+def test_near_with_stay_dates_prices_results(client, sites):
+    start = date.today() + timedelta(days=5)
+    found = search(
+        client,
+        near="37.75,-119.59",
+        radius_km=20,
+        start_date=start.isoformat(),
+        end_date=(start + timedelta(days=2)).isoformat(),
+    )
+    assert [(c["title"], c["total_price"]) for c in found] == [
+        ("valley", 60),
+        ("meadow", 120),
+    ]
+    assert "distance_km" in found[0]
+
+
+def test_bbox_filters_to_box(client, sites):
+    assert titles(search(client, bbox="-120,37.5,-119,38")) == ["valley", "meadow"]
+    assert titles(search(client, bbox="0,0,10,10")) == []
+
+
+def test_bbox_across_antimeridian(client, sites):
+    assert titles(search(client, bbox="179,-18,-179,-17")) == ["reef", "atoll"]
+    assert titles(search(client, bbox="-179,-18,179,-17")) == []
+
+
+def test_large_bbox_skips_unplaced_sites(client, sites):
+    assert titles(search(client, bbox="-180,-90,180,90")) == [
+        title for title in SITES if title != "unplaced"
+    ]
+
+
+def test_coordinates_set_and_cleared_through_api(client, sites):
+    headers = sites["headers"]
+    created = client.post(
+        "/api/campsites",
+        json={
+            "title": "ridge",
+            "description": "",
+            "price": 25,
+            "location": "Somewhere",
+            "latitude": 37.76,
+            "longitude": -119.59,
+        },
+        headers=headers,
+    ).get_json()["campsite"]
+    assert (created["latitude"], created["longitude"]) == (37.76, -119.59)
+    assert "ridge" in titles(search(client, near="37.75,-119.59", radius_km=5))
+
+    client.put(
+        f"/api/campsites/{created['id']}",
+        json={"latitude": -17.8, "longitude": 179.95},
+        headers=headers,
+    )
+    assert "ridge" in titles(search(client, bbox="179,-18,-179,-17"))
+
+    client.put(
+        f"/api/campsites/{created['id']}",
+        json={"latitude": None, "longitude": None},
+        headers=headers,
+    )
+    assert "ridge" not in titles(search(client, bbox="-180,-90,180,90"))
+
+
+def test_invalid_coordinates_rejected(client, sites):
+    headers = sites["headers"]
+    for body in (
+        {"latitude": 37.7},
+        {"latitude": 91, "longitude": 0},
+        {"latitude": "north", "longitude": 0},
+    ):
+        response = client.put(
+            f"/api/campsites/{sites['valley']}", json=body, headers=headers
+        )
+        assert response.status_code == 400
+
+    for query in (
+        "sort=distance",
+        "near=37.7",
+        "near=37.7,-119.5&radius_km=0",
+        "near=37.7,-119.5&radius_km=501",
+        "bbox=1,2,3",
+        "bbox=0,10,10,0",
+        "bbox=0,0,200,10",
+    ):
+        assert client.get(f"/api/campsites?{query}").status_code == 400
@@ -0,0 +1,55 @@
+"""
+Tests for the JSON provider and streamed list responses
+Run with: pytest test_json_provider.py
+"""
+
+import json
+from datetime import date, datetime
+
+import pytest
+
+from json_provider import STREAM_CHUNK_SIZE, stream_json_list
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_provider_matches_stdlib(app, fast):
+    app.json.fast = fast and app.json.fast
+    payload = {
+        "b": [1, 2.5, None, True],
+        "a": {"when": datetime(2025, 1, 2, 3, 4, 5), "day": date(2025, 1, 2)},
+        "breakdown": {1: 0, 5: 3},
+    }
+
+    with app.app_context():
+        body = app.json.response(payload).get_data()
+
+    expected = json.dumps(payload, default=app.json.default, sort_keys=False)
+    assert json.loads(body) == json.loads(expected)
+    assert body.endswith(b"\n")
+
+
+def test_stream_json_list(app):
+    rows = [{"id": i, "title": "x" * 1000} for i in range(200)]
+
+    with app.test_request_context():
+        response = stream_json_list(
+            "campsites", iter(rows), dict, lambda count: {"count": count}
+        )
+        chunks = list(response.response)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= STREAM_CHUNK_SIZE + 2000 for chunk in chunks)
+    assert json.loads(b"".join(chunks)) == {"campsites": rows, "count": 200}
+
+
+def test_list_endpoints_stream(client, seed):
+    ids = seed(users=3, campsites=3, bookings_per_campsite=2, reviews_per_campsite=2)
+
+    response = client.get("/api/campsites")
+    assert response.is_streamed
+    assert response.get_json()["total"] == 3
+
+    data = client.get(f"/api/reviews/{ids['campsites'][0]}").get_json()
+    assert data["total_reviews"] == 2
+    assert data["rating_breakdown"] == {"1": 1, "2": 1, "3": 0, "4": 0, "5": 0}
+    assert data["average_rating"] == 1.5
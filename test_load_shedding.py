@@ -0,0 +1,91 @@
+"""
+Tests for priority classes and load shedding
+Run with: pytest test_load_shedding.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from conftest import TEST_CONFIG
+from load_shedding import ClassPolicy, Limiter, LoadShedder, classify
+from models import db
+
+TIGHT = {
+    "checkout": ClassPolicy(4, 4, 4, 1.0, 1),
+    "standard": ClassPolicy(4, 1, 0, 0.0, 1),
+    "browse": ClassPolicy(1, 1, 0, 0.0, 3),
+}
+
+
+def test_classify():
+    assert classify("bookings.create_booking", "POST", "bookings") == "checkout"
+    assert classify("waitlist.book_hold", "POST", "waitlist") == "checkout"
+    assert classify("campsites.get_campsites", "GET", "campsites") == "browse"
+    assert classify("campsites.create_campsite", "POST", "campsites") == "standard"
+    assert classify("bookings.get_bookings", "GET", "bookings") == "standard"
+    assert classify("health", "GET", None) is None
+    assert classify(None, "GET", None) is None
+
+
+def test_limiter_queues_then_sheds():
+    limiter = Limiter(limit=1, queue_size=1)
+    assert limiter.acquire(timeout=1) == 0.0
+
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire(timeout=1) > 0
+
+    started = time.monotonic()
+    assert limiter.acquire(timeout=0.05) is None
+    assert time.monotonic() - started >= 0.05
+
+    limiter.queue_size = 0
+    assert limiter.acquire(timeout=1) is None
+
+
+@pytest.fixture
+def tight_app():
+    app = create_app({**TEST_CONFIG, "LOAD_SHED_CLASSES": TIGHT})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+def test_busy_browse_class_is_shed_but_checkout_is_not(tight_app):
+    client = tight_app.test_client()
+    browse = tight_app.extensions["load_shedder"].limiters["browse"]
+    assert client.get("/api/campsites").status_code == 200
+    assert browse.active == 0
+
+    browse.acquire(timeout=0)
+    try:
+        response = client.get("/api/campsites")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "3"
+        assert client.post("/api/pay", json={"booking_id": 999}).status_code == 404
+        assert client.get("/health").status_code == 200
+    finally:
+        browse.release()
+    assert client.get("/api/campsites").status_code == 200
+
+
+def test_limits_shrink_while_checkout_is_slow_and_recover():
+    shedder = LoadShedder({**TIGHT, "browse": ClassPolicy(8, 2, 0, 0.0, 1)})
+    shedder.adjust_interval = 0
+
+    def limits():
+        return shedder.limiters["browse"].limit, shedder.limiters["standard"].limit
+
+    for _ in range(30):
+        shedder.record("checkout", latency=2.0, queued=0.0)
+    assert limits() == (2, 1)
+    assert shedder.limiters["checkout"].limit == 4
+
+    for _ in range(30):
+        shedder.record("checkout", latency=0.01, queued=0.0)
+    assert limits() == (8, 4)
@@ -0,0 +1,86 @@
+"""
+Tests for location autocomplete
+Run with: pytest test_locations.py
+"""
+
+import pytest
+
+from models import db, Campsite, User
+
+LOCATIONS = [
+    "Yosemite, California",
+    "Yosemite, California",
+    "yosemite,  california",
+    "Big Sur, California",
+    "Bend, Oregon",
+]
+
+
+@pytest.fixture
+def host(app, auth_headers):
+    with app.app_context():
+        user = User(name="Host", email="host@example.com", password_hash="unused")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            Campsite(
+                title="Site",
+                description="",
+                price=30,
+                location=location,
+                host_id=user.id,
+            )
+            for location in LOCATIONS
+        )
+        db.session.commit()
+        return auth_headers(user.id)
+
+
+def suggest(client, prefix, limit=10):
+    response = client.get(
+        "/api/locations/suggest", query_string={"prefix": prefix, "limit": limit}
+    )
+    assert response.status_code == 200, response.get_json()
+    return [(s["location"], s["count"]) for s in response.get_json()["suggestions"]]
+
+
+def test_suggestions_are_normalized_and_counted(client, host):
+    assert suggest(client, "YOS") == [("Yosemite, California", 3)]
+    assert suggest(client, "b") == [("Bend, Oregon", 1), ("Big Sur, California", 1)]
+    assert suggest(client, "c") == [("California", 4)]
+    assert suggest(client, "x") == []
+
+
+def test_index_follows_campsite_writes(client, host):
+    suggest(client, "b")
+
+    created = client.post(
+        "/api/campsites",
+        json={
+            "title": "Beach",
+            "description": "Dunes",
+            "price": 25,
+            "location": "Bend, Oregon",
+        },
+        headers=host,
+    ).get_json()["campsite"]["id"]
+    assert suggest(client, "bend") == [("Bend, Oregon", 2)]
+
+    client.put(
+        f"/api/campsites/{created}", json={"location": "Astoria, Oregon"}, headers=host
+    )
+    assert suggest(client, "o") == [("Oregon", 2)]
+    assert suggest(client, "bend") == [("Bend, Oregon", 1)]
+
+    client.delete(f"/api/campsites/{created}", headers=host)
+    assert suggest(client, "astoria") == []
+
+
+def test_limit_keeps_most_common(client, host):
+    assert suggest(client, "b", limit=1) == [("Bend, Oregon", 1)]
+    assert suggest(client, "yosemite, c", limit=1) == [("Yosemite, California", 3)]
+
+
+def test_invalid_requests(client, host):
+    assert client.get("/api/locations/suggest").status_code == 400
+    assert client.get("/api/locations/suggest?prefix=a&limit=0").status_code == 400
@@ -0,0 +1,215 @@
+"""
+Tests for the notification outbox and its worker
+Run with: pytest test_outbox.py
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmark import start_local_server
+from metrics import registry
+from conftest import STAY_START, stay
+from models import db, Booking, OutboxMessage
+from notifications import DebugSink, WebhookSink
+from outbox import get_outbox_worker
+
+STAY = stay()
+
+
+class FailingSink(DebugSink):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink unavailable")
+        super().send(message)
+
+
+@pytest.fixture
+def guest(app, client, seed, auth_headers):
+    ids = seed(users=2, campsites=1)
+    with app.app_context():
+        get_outbox_worker(app).drain()
+    return {
+        "campsite_id": ids["campsites"][0],
+        "headers": auth_headers(ids["users"][1]),
+    }
+
+
+def book(client, guest):
+    response = client.post(
+        "/api/bookings",
+        json={"campsite_id": guest["campsite_id"], **STAY},
+        headers=guest["headers"],
+    )
+    assert response.status_code == 201
+    return response.get_json()["booking"]["id"]
+
+
+def messages(app):
+    with app.app_context():
+        return [
+            (m.topic, m.status, m.attempts)
+            for m in OutboxMessage.query.order_by(OutboxMessage.id)
+        ]
+
+
+def use_sink(app, sink):
+    get_outbox_worker(app).sinks = [sink]
+    return sink
+
+
+def test_state_changes_queue_notifications_that_are_delivered(app, client, guest):
+    sink = use_sink(app, DebugSink())
+    booking_id = book(client, guest)
+    client.put(f"/api/bookings/{booking_id}/cancel", headers=guest["headers"])
+    assert messages(app) == [
+        ("booking.confirmed", "pending", 0),
+        ("booking.cancelled", "pending", 0),
+    ]
+
+    with app.app_context():
+        get_outbox_worker(app).drain()
+
+    assert messages(app) == []
+    assert [email["subject"] for email in sink.sent] == [
+        f"Booking #{booking_id} is confirmed",
+        f"Booking #{booking_id} was cancelled",
+    ]
+    assert sink.sent[0]["to"] == "user1@example.com"
+    assert f"start date: {STAY['start_date']}" in sink.sent[0]["body"]
+    assert registry.outbox_depth.value(("pending",)) == 0
+
+
+def test_rolled_back_changes_queue_nothing(app, guest):
+    with app.app_context():
+        db.session.add(
+            Booking(
+                user_id=1,
+                campsite_id=guest["campsite_id"],
+                start_date=STAY_START,
+                end_date=STAY_START + timedelta(days=1),
+                total_price=20,
+                status="confirmed",
+            )
+        )
+        db.session.flush()
+        assert OutboxMessage.query.count() == 1
+        db.session.rollback()
+
+    assert messages(app) == []
+
+
+def test_failed_deliveries_back_off_then_go_dead(app, client, guest):
+    sink = use_sink(app, FailingSink(failures=3))
+    book(client, guest)
+    worker = get_outbox_worker(app)
+    worker.max_attempts = 2
+
+    with app.app_context():
+        worker.drain()
+        message = OutboxMessage.query.one()
+        assert (message.status, message.attempts) == ("pending", 1)
+        assert message.last_error == "ConnectionError: sink unavailable"
+        assert message.next_attempt_at > datetime.utcnow() + timedelta(seconds=5)
+
+        # Not due yet, so draining again does nothing
+        worker.drain()
+        assert OutboxMessage.query.one().attempts == 1
+
+        message.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        worker.drain()
+
+    assert messages(app) == [("booking.confirmed", "dead", 2)]
+    assert registry.outbox_depth.value(("dead",)) == 1
+    assert list(sink.sent) == []
+
+
+def test_messages_are_drained_in_batches(app, client, guest, count_queries):
+    sink = use_sink(app, DebugSink())
+    worker = get_outbox_worker(app)
+    worker.batch_size = 4
+    with app.app_context():
+        db.session.add_all(
+            Booking(
+                user_id=2,
+                campsite_id=guest["campsite_id"],
+                start_date=STAY_START + timedelta(days=3 * i),
+                end_date=STAY_START + timedelta(days=3 * i + 1),
+                total_price=20,
+                status="paid",
+            )
+            for i in range(10)
+        )
+        db.session.commit()
+
+        with count_queries() as queries:
+            worker.drain()
+
+    assert len(sink.sent) == 10
+    # Claim, lease, recipients and delete for each of three batches
+    assert queries.count <= 3 * 4 + 1
+
+
+def test_reviews_notify_the_host(app, client, guest):
+    sink = use_sink(app, DebugSink())
+    with app.app_context():
+        db.session.add(
+            Booking(
+                user_id=2,
+                campsite_id=guest["campsite_id"],
+                start_date=STAY_START - timedelta(days=30),
+                end_date=STAY_START - timedelta(days=28),
+                total_price=40,
+                status="paid",
+            )
+        )
+        db.session.commit()
+    response = client.post(
+        "/api/reviews",
+        json={"campsite_id": guest["campsite_id"], "rating": 4, "comment": "Nice"},
+        headers=guest["headers"],
+    )
+    assert response.status_code == 201
+
+    with app.app_context():
+        get_outbox_worker(app).drain()
+
+    review = sink.sent[-1]
+    assert review["to"] == "user0@example.com"
+    assert review["subject"] == f"New 4-star review of campsite #{guest['campsite_id']}"
+
+
+def test_webhook_sink_posts_signed_json(app, client, guest):
+    received = []
+
+    def receiver(environ, start_response):
+        body = environ["wsgi.input"].read(int(environ["CONTENT_LENGTH"]))
+        received.append((environ["HTTP_X_OUTBOX_SIGNATURE"], body))
+        start_response("204 No Content", [])
+        return [b""]
+
+    server, url = start_local_server(receiver)
+    try:
+        use_sink(app, WebhookSink(url, secret="shh"))
+        book(client, guest)
+        with app.app_context():
+            get_outbox_worker(app).drain()
+    finally:
+        server.shutdown()
+
+    [(signature, body)] = received
+    expected = hmac.new(b"shh", body, hashlib.sha256).hexdigest()
+    assert signature == f"sha256={expected}"
+    message = json.loads(body)
+    assert message["topic"] == "booking.confirmed"
+    assert message["recipient"] == "user1@example.com"
+    assert messages(app) == []
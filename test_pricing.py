@@ -0,0 +1,172 @@
+"""
+Tests for per-night pricing and price calendars
+Run with: pytest test_pricing.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, PriceCalendar, PriceNight
+from pricing import CALENDAR_DAYS, WEEKEND_NIGHTS
+
+BASE_PRICE = 20.0
+
+
+@pytest.fixture
+def campsite(seed, auth_headers):
+    ids = seed(users=2, campsites=1)
+    return (
+        ids["campsites"][0],
+        auth_headers(ids["users"][0]),
+        auth_headers(ids["users"][1]),
+    )
+
+
+def add_rule(client, campsite_id, headers, **rule):
+    response = client.post(
+        f"/api/campsites/{campsite_id}/pricing-rules", json=rule, headers=headers
+    )
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["rule"]["id"]
+
+
+def quote(client, campsite_id, start, end):
+    response = client.get(
+        f"/api/campsites/{campsite_id}/quote",
+        query_string={"start_date": start.isoformat(), "end_date": end.isoformat()},
+    )
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["total_price"]
+
+
+def expected_total(start, end, weekend=1, season=None):
+    total = 0
+    night = start
+    while night < end:
+        price = BASE_PRICE
+        if night.weekday() in WEEKEND_NIGHTS:
+            price *= weekend
+        if season and season[0] <= night < season[1]:
+            price *= season[2]
+        total += round(price, 2)
+        night += timedelta(days=1)
+    return round(total, 2)
+
+
+def test_booking_search_and_quote_agree(client, campsite):
+    campsite_id, host, guest = campsite
+    start = date.today() + timedelta(days=10)
+    end = start + timedelta(days=9)
+    season = (start + timedelta(days=2), start + timedelta(days=5), 2.0)
+    add_rule(client, campsite_id, host, kind="weekend", multiplier=1.5)
+    add_rule(
+        client,
+        campsite_id,
+        host,
+        kind="season",
+        multiplier=2.0,
+        start_date=season[0].isoformat(),
+        end_date=season[1].isoformat(),
+    )
+    expected = expected_total(start, end, weekend=1.5, season=season)
+
+    assert quote(client, campsite_id, start, end) == expected
+
+    search = client.get(
+        "/api/campsites",
+        query_string={"start_date": start.isoformat(), "end_date": end.isoformat()},
+    ).get_json()
+    assert search["campsites"][0]["total_price"] == expected
+
+    booking = client.post(
+        "/api/bookings",
+        json={
+            "campsite_id": campsite_id,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+        },
+        headers=guest,
+    ).get_json()
+    assert booking["booking"]["total_price"] == expected
+
+
+def test_rule_changes_reprice_the_calendar(client, campsite):
+    campsite_id, host, guest = campsite
+    start = date.today() + timedelta(days=30)
+    end = start + timedelta(days=7)
+    later = (end + timedelta(days=20), end + timedelta(days=25))
+
+    rule_id = add_rule(
+        client,
+        campsite_id,
+        host,
+        kind="season",
+        multiplier=3.0,
+        start_date=start.isoformat(),
+        end_date=end.isoformat(),
+    )
+    assert quote(client, campsite_id, start, end) == 7 * BASE_PRICE * 3
+    assert quote(client, campsite_id, *later) == 5 * BASE_PRICE
+
+    client.put(f"/api/campsites/{campsite_id}", json={"price": 30}, headers=host)
+    assert quote(client, campsite_id, *later) == 5 * 30
+
+    response = client.delete(
+        f"/api/campsites/{campsite_id}/pricing-rules/{rule_id}", headers=host
+    )
+    assert response.status_code == 200
+    assert quote(client, campsite_id, start, end) == 7 * 30
+    assert quote(client, campsite_id, start, later[1]) == (later[1] - start).days * 30
+
+
+def test_length_of_stay_tiers(client, campsite):
+    campsite_id, host, guest = campsite
+    add_rule(
+        client, campsite_id, host, kind="length_of_stay", multiplier=0.9, min_nights=3
+    )
+    add_rule(
+        client, campsite_id, host, kind="length_of_stay", multiplier=0.8, min_nights=7
+    )
+    start = date.today() + timedelta(days=5)
+
+    assert quote(client, campsite_id, start, start + timedelta(days=2)) == 40
+    assert quote(client, campsite_id, start, start + timedelta(days=3)) == 54
+    assert quote(client, campsite_id, start, start + timedelta(days=10)) == 160
+
+
+def test_calendar_extends_past_its_horizon(app, client, campsite):
+    campsite_id, host, guest = campsite
+    add_rule(client, campsite_id, host, kind="weekend", multiplier=2)
+    start = date.today() + timedelta(days=CALENDAR_DAYS - 3)
+    end = start + timedelta(days=10)
+
+    assert quote(client, campsite_id, start, end) == expected_total(
+        start, end, weekend=2
+    )
+    with app.app_context():
+        calendar = db.session.get(PriceCalendar, campsite_id)
+        assert calendar.last_night >= end
+        assert (
+            PriceNight.query.count()
+            == (calendar.last_night - calendar.first_night).days + 1
+        )
+
+
+def test_invalid_rules_and_access(client, campsite):
+    campsite_id, host, guest = campsite
+    url = f"/api/campsites/{campsite_id}/pricing-rules"
+    cases = [
+        (guest, {"kind": "weekend", "multiplier": 2}, 403),
+        (host, {"kind": "holiday", "multiplier": 2}, 400),
+        (host, {"kind": "season", "multiplier": 2}, 400),
+        (host, {"kind": "season", "multiplier": 2, "start_date": 20300101}, 400),
+        (host, {"kind": "length_of_stay", "multiplier": 0.9, "min_nights": 0}, 400),
+        (host, {"kind": "weekend", "multiplier": 0}, 400),
+        (host, {"kind": "length_of_stay", "multiplier": 0.9}, 400),
+    ]
+
+    for headers, rule, status in cases:
+        assert client.post(url, json=rule, headers=headers).status_code == status
+    quote_url = f"/api/campsites/{campsite_id}/quote?start_date=x"
+    assert client.get(quote_url).status_code == 400
@@ -36,6 +36,15 @@ class TestBasicEndpoints:
         data = response.json()
         assert data["status"] == "healthy"
         assert data["service"] == "camping-api"
+        assert data["database"] == "connected"
+
+    def test_metrics_endpoint(self):
+        requests.get(f"{API_URL}/campsites")
+        response = requests.get(f"{BASE_URL}/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "camp_http_request_duration_seconds_bucket" in response.text
+        assert 'endpoint="campsites.get_campsites"' in response.text
 
 
 class TestCampsites:
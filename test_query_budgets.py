@@ -0,0 +1,100 @@
+"""
+Query budget tests for read endpoints
+Run with: pytest test_query_budgets.py
+
+Each endpoint is requested against a small and a large dataset. The test
+fails if it issues more statements than its budget, or if the count grows
+with the number of rows (an N+1 from a lazy load in to_dict).
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Campsite
+
+# (method, url, max queries, authenticate as the seeded guest)
+QUERY_BUDGETS = [
+    ("GET", "/api/campsites", 1, False),
+    ("GET", "/api/campsites?sort=rating&limit=5", 1, False),
+    ("GET", "/api/campsites?start_date={start}&end_date={end}", 2, False),
+    (
+        "GET",
+        "/api/campsites?start_date={start}&end_date={end}&available=true",
+        2,
+        False,
+    ),
+    ("GET", "/api/campsites?near=37.75,-119.59&radius_km=50&limit=5", 1, False),
+    ("GET", "/api/campsites?bbox=-120,37,-119,38.5&sort=price", 1, False),
+    (
+        "GET",
+        "/api/campsites?fields=title,price&include=reviews:3,host,availability",
+        4,
+        False,
+    ),
+    ("GET", "/api/campsites/{campsite_id}", 2, False),
+    ("GET", "/api/campsites/{campsite_id}?include=reviews,availability", 3, False),
+    (
+        "GET",
+        "/api/campsites/{campsite_id}/quote?start_date={start}&end_date={end}",
+        3,
+        False,
+    ),
+    ("GET", "/api/campsites/{campsite_id}/blackouts", 2, False),
+    ("GET", "/api/campsites/{campsite_id}/availability", 3, False),
+    ("GET", "/api/reviews/{campsite_id}", 2, False),
+    ("GET", "/api/reviews/{campsite_id}?include=user", 3, False),
+    ("GET", "/api/bookings", 1, True),
+    ("GET", "/api/bookings?include_archived=true", 2, True),
+    ("GET", "/api/bookings?fields=status&include=campsite,user", 3, True),
+    ("GET", "/api/waitlist", 1, True),
+    ("GET", "/api/bookings/{booking_id}", 3, True),
+    ("GET", "/api/bookings/{booking_id}/history", 3, True),
+    ("GET", "/api/changes", 1, False),
+]
+
+
+def measure(client, count_queries, method, url, headers):
+    with count_queries() as queries:
+        response = client.open(url, method=method, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return queries.count
+
+
+@pytest.mark.parametrize("method,url,budget,authenticated", QUERY_BUDGETS)
+def test_query_budget(
+    client, seed, count_queries, auth_headers, method, url, budget, authenticated
+):
+    counts = []
+    for size in (2, 20):
+        ids = seed(
+            users=size,
+            campsites=size,
+            bookings_per_campsite=size // 2,
+            reviews_per_campsite=size // 2,
+        )
+        headers = auth_headers(ids["users"][1]) if authenticated else {}
+        path = url.format(
+            campsite_id=ids["campsites"][0],
+            booking_id=ids["bookings"][0],
+            start=date.today() + timedelta(days=5),
+            end=date.today() + timedelta(days=8),
+        )
+        counts.append(measure(client, count_queries, method, path, headers))
+
+    small, large = counts
+    assert large <= budget, f"{method} {url} ran {large} queries, budget {budget}"
+    assert small == large, f"{method} {url} went from {small} to {large} queries"
+
+
+def test_query_counter_sees_lazy_loads(app, seed, count_queries):
+    seed(users=5, campsites=5, reviews_per_campsite=2)
+
+    with count_queries() as queries:
+        with app.app_context():
+            for campsite in Campsite.query.all():
+                campsite.to_dict()
+            db.session.remove()
+
+    # One query for the list plus host and reviews loads per row
+    assert queries.count > 5
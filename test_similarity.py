@@ -0,0 +1,110 @@
+"""
+Tests for similar campsite recommendations
+Run with: pytest test_similarity.py
+"""
+
+import pytest
+
+from models import db, Campsite, User
+
+LISTINGS = [
+    (
+        "Lakeside cabin",
+        "Canoe launch and fishing dock on the lake",
+        40,
+        "Tahoe, California",
+    ),
+    (
+        "Lakeside tent pitch",
+        "Fishing from the shore, canoe rentals nearby",
+        45,
+        "Tahoe, California",
+    ),
+    (
+        "Desert stargazing camp",
+        "Dark skies and rock climbing",
+        200,
+        "Joshua Tree, California",
+    ),
+    ("Forest yurt", "Heated yurt among old pines", 90, "Bend, Oregon"),
+]
+
+
+@pytest.fixture
+def listings(app, auth_headers):
+    with app.app_context():
+        host = User(name="Host", email="host@example.com", password_hash="unused")
+        db.session.add(host)
+        db.session.flush()
+        campsites = [
+            Campsite(
+                title=title,
+                description=description,
+                price=price,
+                location=location,
+                host_id=host.id,
+            )
+            for title, description, price, location in LISTINGS
+        ]
+        db.session.add_all(campsites)
+        db.session.commit()
+        return [campsite.id for campsite in campsites], auth_headers(host.id)
+
+
+def similar_ids(client, campsite_id, k=10):
+    response = client.get(f"/api/campsites/{campsite_id}/similar?k={k}")
+    assert response.status_code == 200, response.get_json()
+    return [campsite["id"] for campsite in response.get_json()["similar"]]
+
+
+def test_ranks_by_text_location_and_price(client, listings):
+    ids, host = listings
+
+    ranked = similar_ids(client, ids[0])
+
+    assert ranked[0] == ids[1]
+    assert ids[0] not in ranked
+    assert ranked.index(ids[2]) < ranked.index(ids[3])
+    assert similar_ids(client, ids[0], k=1) == [ids[1]]
+
+
+# A high fraction applies changes row by row, zero rebuilds on every change
+@pytest.mark.parametrize("rebuild_fraction", [10, 0])
+def test_index_follows_creates_and_deletes(app, client, listings, rebuild_fraction):
+    ids, host = listings
+    app.config["SIMILAR_REBUILD_FRACTION"] = rebuild_fraction
+    similar_ids(client, ids[0])
+
+    created = client.post(
+        "/api/campsites",
+        json={
+            "title": "Lakeside cabin with dock",
+            "description": "Canoe launch and fishing dock on the lake",
+            "price": 40,
+            "location": "Tahoe, California",
+        },
+        headers=host,
+    ).get_json()["campsite"]["id"]
+    client.delete(f"/api/campsites/{ids[1]}", headers=host)
+
+    ranked = similar_ids(client, ids[0])
+    assert ranked[0] == created
+    assert ids[1] not in ranked
+    assert client.get(f"/api/campsites/{ids[1]}/similar").status_code == 404
+
+
+def test_warm_index_queries_are_constant(client, listings, count_queries):
+    ids, host = listings
+    similar_ids(client, ids[0])
+
+    with count_queries() as queries:
+        similar_ids(client, ids[1])
+
+    # Change feed check, then the result rows with their hosts
+    assert queries.count == 2
+
+
+def test_invalid_k(client, listings):
+    ids, host = listings
+    assert client.get(f"/api/campsites/{ids[0]}/similar?k=0").status_code == 400
+    assert client.get(f"/api/campsites/{ids[0]}/similar?k=x").status_code == 400
@@ -0,0 +1,211 @@
+"""
+Tests for the waitlist and hold matching on cancellation
+Run with: pytest test_waitlist.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from availability_index import AvailabilityConflict
+from conftest import STAY_START, stay
+from models import db, Booking, Campsite, User, WaitlistEntry
+from waitlist import get_matcher, match_waitlist
+
+STAY = stay(nights=3)
+
+
+@pytest.fixture
+def booked(client, seed, auth_headers):
+    """One campsite booked by the first of three guests"""
+    ids = seed(users=4, campsites=1)
+    campsite_id = ids["campsites"][0]
+    guests = [auth_headers(user_id) for user_id in ids["users"][1:]]
+    response = client.post(
+        "/api/bookings", json={"campsite_id": campsite_id, **STAY}, headers=guests[0]
+    )
+    assert response.status_code == 201
+    return {
+        "campsite_id": campsite_id,
+        "booking_id": response.get_json()["booking"]["id"],
+        "guests": guests,
+    }
+
+
+def join(client, booked, guest, **stay):
+    return client.post(
+        "/api/waitlist",
+        json={"campsite_id": booked["campsite_id"], **STAY, **stay},
+        headers=booked["guests"][guest],
+    )
+
+
+def entries(client, booked, guest):
+    response = client.get("/api/waitlist", headers=booked["guests"][guest])
+    return response.get_json()["entries"]
+
+
+def run_matcher(app):
+    with app.app_context():
+        return get_matcher(app).run_once()
+
+
+def cancel_booking(client, booked):
+    response = client.put(
+        f"/api/bookings/{booked['booking_id']}/cancel", headers=booked["guests"][0]
+    )
+    assert response.status_code == 200
+
+
+def test_cancellation_offers_a_hold_that_can_be_booked(app, client, booked):
+    run_matcher(app)
+    entry_id = join(client, booked, 1).get_json()["entry"]["id"]
+    assert run_matcher(app) == 0
+
+    cancel_booking(client, booked)
+    assert run_matcher(app) == 1
+    [entry] = entries(client, booked, 1)
+    assert entry["status"] == "offered" and entry["hold_expires_at"]
+
+    # The hold blocks everyone else
+    response = client.post(
+        "/api/bookings",
+        json={"campsite_id": booked["campsite_id"], **STAY},
+        headers=booked["guests"][2],
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        f"/api/waitlist/{entry_id}/book", headers=booked["guests"][1]
+    )
+    assert response.status_code == 201
+    [entry] = entries(client, booked, 1)
+    assert entry["status"] == "booked"
+    assert entry["booking_id"] == response.get_json()["booking"]["id"]
+
+
+def test_holds_go_out_in_fifo_order(app, client, booked):
+    first = join(client, booked, 1).get_json()["entry"]["id"]
+    join(client, booked, 2)
+
+    cancel_booking(client, booked)
+    run_matcher(app)
+    assert [e["status"] for e in entries(client, booked, 2)] == ["waiting"]
+    assert [e["status"] for e in entries(client, booked, 1)] == ["offered"]
+
+    # Releasing the hold passes it straight to the next guest
+    response = client.delete(f"/api/waitlist/{first}", headers=booked["guests"][1])
+    assert response.status_code == 200
+    assert [e["status"] for e in entries(client, booked, 2)] == ["offered"]
+
+
+def test_expired_holds_move_down_the_waitlist(app, client, booked):
+    join(client, booked, 1)
+    join(client, booked, 2)
+    cancel_booking(client, booked)
+    run_matcher(app)
+
+    with app.app_context():
+        offered = WaitlistEntry.query.filter_by(status="offered").one()
+        offered.hold_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        entry_id = offered.id
+
+    response = client.post(
+        f"/api/waitlist/{entry_id}/book", headers=booked["guests"][1]
+    )
+    assert response.status_code == 400
+
+    run_matcher(app)
+    assert [e["status"] for e in entries(client, booked, 1)] == ["expired"]
+    assert [e["status"] for e in entries(client, booked, 2)] == ["offered"]
+
+
+def test_partial_frees_do_not_offer_unavailable_stays(app, client, booked):
+    run_matcher(app)
+    longer = (STAY_START + timedelta(days=5)).isoformat()
+    with app.app_context():
+        db.session.add(
+            Booking(
+                user_id=1,
+                campsite_id=booked["campsite_id"],
+                start_date=STAY_START + timedelta(days=4),
+                end_date=STAY_START + timedelta(days=6),
+                total_price=40,
+                status="paid",
+            )
+        )
+        db.session.commit()
+    assert join(client, booked, 1, end_date=longer).status_code == 201
+
+    cancel_booking(client, booked)
+    assert run_matcher(app) == 0
+    assert [e["status"] for e in entries(client, booked, 1)] == ["waiting"]
+
+
+def test_backlog_is_matched_on_first_run(app, client, booked):
+    join(client, booked, 1)
+    cancel_booking(client, booked)
+
+    assert run_matcher(app) == 1
+
+
+def test_invalid_waitlist_requests(client, booked):
+    free = {
+        "start_date": (STAY_START + timedelta(days=20)).isoformat(),
+        "end_date": (STAY_START + timedelta(days=22)).isoformat(),
+    }
+    too_long = (STAY_START + timedelta(days=31)).isoformat()
+    assert join(client, booked, 1, **free).status_code == 400
+    assert join(client, booked, 1, end_date=too_long).status_code == 400
+    assert join(client, booked, 1, campsite_id=999).status_code == 404
+    assert join(client, booked, 1).status_code == 201
+    assert join(client, booked, 1).status_code == 400
+
+    url = f"/api/waitlist/{entries(client, booked, 1)[0]['id']}"
+    assert client.delete(url, headers=booked["guests"][2]).status_code == 403
+    assert client.post(f"{url}/book", headers=booked["guests"][1]).status_code == 400
+
+
+def test_matchers_in_two_workers_cannot_offer_the_same_nights(workers):
+    first, second = workers
+    with first.app_context():
+        guests = [
+            User(name=f"Guest {i}", email=f"guest{i}@example.com", password_hash="x")
+            for i in range(2)
+        ]
+        db.session.add_all(guests)
+        db.session.flush()
+        campsite = Campsite(
+            title="Riverside",
+            description="A quiet spot.",
+            price=20.0,
+            location="Yosemite, California",
+            host_id=guests[0].id,
+        )
+        db.session.add(campsite)
+        db.session.flush()
+        db.session.add_all(
+            WaitlistEntry(
+                user_id=guest.id,
+                campsite_id=campsite.id,
+                start_date=STAY_START,
+                end_date=STAY_START + timedelta(days=3),
+            )
+            for guest in guests
+        )
+        db.session.commit()
+        campsite_id = campsite.id
+
+    hold = timedelta(minutes=30)
+    end = STAY_START + timedelta(days=3)
+    with first.app_context():
+        assert len(match_waitlist(campsite_id, STAY_START, end, hold)) == 1
+        with second.app_context():
+            assert len(match_waitlist(campsite_id, STAY_START, end, hold)) == 1
+            db.session.commit()
+
+        with pytest.raises(AvailabilityConflict):
+            db.session.commit()
+        db.session.rollback()
+        assert WaitlistEntry.query.filter_by(status="offered").count() == 1
@@ -0,0 +1,223 @@
+"""
+Waitlist for booked-out stays, matched as nights free up
+
+A guest who cannot book joins the waitlist for a campsite and date range
+instead of retrying the booking. A background matcher follows the change
+feed (change_log.py) for cancelled bookings and, every
+WAITLIST_MATCH_INTERVAL seconds, also expires unclaimed holds. Each freed
+range is matched against the waiting entries that overlap it, oldest
+first. Every entry whose whole stay is now free is offered a hold of
+WAITLIST_HOLD_MINUTES, which blocks the nights for everyone else
+(availability.py) until the guest books it or it expires.
+
+Entries are capped at MAX_HOLD_NIGHTS nights, so the entries overlapping
+a range all start within a bounded window before it. That makes matching
+one range scan of the (campsite_id, status, start_date) index, however
+long the waitlist is.
+
+Free nights are read from the versioned availability index
+(availability_index.py), so when matchers in two processes offer holds
+on the same campsite at once, the later commit raises
+AvailabilityConflict and is rolled back; its run is retried on the next
+interval.
+"""
+
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+
+from flask import current_app
+
+from availability import MAX_HOLD_NIGHTS, overlaps
+from availability_index import AvailabilityConflict, get_index
+from models import db, Booking, Campsite, ChangeEvent, WaitlistEntry
+
+DEFAULT_HOLD_MINUTES = 30
+DEFAULT_MATCH_INTERVAL = 5
+
+
+def match_waitlist(campsite_id, start, end, hold):
+    """Offer holds to waiting entries that now fit, in FIFO order
+
+    start and end bound the nights that were freed. Returns the entries
+    offered; the caller commits, which raises AvailabilityConflict if the
+    campsite's nights changed in another process meanwhile.
+    """
+    candidates = (
+        WaitlistEntry.query.filter(
+            WaitlistEntry.campsite_id == campsite_id,
+            WaitlistEntry.status == "waiting",
+            WaitlistEntry.start_date > start - timedelta(days=MAX_HOLD_NIGHTS),
+            WaitlistEntry.start_date < end,
+            WaitlistEntry.end_date > start,
+        )
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+        .all()
+    )
+    if not candidates:
+        return []
+
+    # Querying the candidates flushed earlier offers, so the version is
+    # current for this transaction
+    campsite = db.session.get(Campsite, campsite_id)
+    taken = (
+        get_index(current_app)
+        .taken_ranges(
+            {campsite_id: campsite.availability_version},
+            min(entry.start_date for entry in candidates),
+            max(entry.end_date for entry in candidates),
+        )
+        .get(campsite_id, [])
+    )
+    expires_at = datetime.utcnow() + hold
+    offered = []
+    for entry in candidates:
+        if overlaps(taken, entry.start_date, entry.end_date):
+            continue
+        entry.status = "offered"
+        entry.hold_expires_at = expires_at
+        taken.append((entry.start_date, entry.end_date))
+        offered.append(entry)
+    return offered
+
+
+def expire_holds():
+    """Mark lapsed holds expired, returning the ranges they freed"""
+    expired = WaitlistEntry.query.filter(
+        WaitlistEntry.status == "offered",
+        WaitlistEntry.hold_expires_at <= datetime.utcnow(),
+    ).all()
+    for entry in expired:
+        entry.status = "expired"
+    return [(e.campsite_id, e.start_date, e.end_date) for e in expired]
+
+
+def delete_waitlist(campsite_id):
+    """Remove a campsite's waitlist ahead of deleting it"""
+    WaitlistEntry.query.filter(WaitlistEntry.campsite_id == campsite_id).delete(
+        synchronize_session=False
+    )
+
+
+class WaitlistMatcher:
+    """Follows the change feed and offers holds for freed nights"""
+
+    def __init__(self, hold):
+        self.hold = hold
+        self.cursor = None
+        self._lock = Lock()
+
+    def _cancellations(self):
+        events = db.session.query(ChangeEvent.id, ChangeEvent.entity_id).filter(
+            ChangeEvent.id > self.cursor,
+            ChangeEvent.entity == "booking",
+            ChangeEvent.action == "update",
+        )
+        booking_ids = set()
+        for event_id, booking_id in events:
+            booking_ids.add(booking_id)
+            self.cursor = max(self.cursor, event_id)
+        if not booking_ids:
+            return []
+        return db.session.query(
+            Booking.campsite_id, Booking.start_date, Booking.end_date
+        ).filter(Booking.id.in_(booking_ids), Booking.status == "cancelled")
+
+    def _backlog(self):
+        # Nights may have freed up while no matcher was running
+        return (
+            db.session.query(
+                WaitlistEntry.campsite_id,
+                db.func.min(WaitlistEntry.start_date),
+                db.func.max(WaitlistEntry.end_date),
+            )
+            .filter(WaitlistEntry.status == "waiting")
+            .group_by(WaitlistEntry.campsite_id)
+        )
+
+    def run_once(self):
+        """Match every range freed since the last run; returns offers made"""
+        with self._lock:
+            cursor = self.cursor
+            try:
+                if self.cursor is None:
+                    self.cursor = (
+                        db.session.query(db.func.max(ChangeEvent.id)).scalar() or 0
+                    )
+                    freed = list(self._backlog())
+                else:
+                    freed = list(self._cancellations())
+                freed.extend(expire_holds())
+
+                offered = 0
+                for campsite_id, start, end in freed:
+                    offered += len(match_waitlist(campsite_id, start, end, self.hold))
+                db.session.commit()
+                return offered
+            except AvailabilityConflict:
+                # Another process changed these nights first; match the
+                # same changes again on the next run
+                db.session.rollback()
+                self.cursor = cursor
+                return 0
+            except Exception:
+                self.cursor = cursor
+                raise
+
+
+class WaitlistMatcherThread(Thread):
+    """Daemon thread running a WaitlistMatcher every interval seconds"""
+
+    def __init__(self, app, matcher, interval):
+        super().__init__(name="waitlist-matcher", daemon=True)
+        self.app = app
+        self.matcher = matcher
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.matcher.run_once()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception("Waitlist matching failed")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def get_matcher(app):
+    return app.extensions["waitlist_matcher"]
+
+
+def init_waitlist(app):
+    """Create the app's matcher and run it in the background"""
+    app.config.setdefault("WAITLIST_HOLD_MINUTES", DEFAULT_HOLD_MINUTES)
+    app.config.setdefault("WAITLIST_MATCH_INTERVAL", DEFAULT_MATCH_INTERVAL)
+
+    matcher = WaitlistMatcher(timedelta(minutes=app.config["WAITLIST_HOLD_MINUTES"]))
+    app.extensions["waitlist_matcher"] = matcher
+    interval = app.config["WAITLIST_MATCH_INTERVAL"]
+
+    @app.cli.command("match-waitlist")
+    def match_waitlist_command():
+        """Offer holds for freed nights once, then exit"""
+        print(f"Offered {matcher.run_once()} waitlist holds")
+
+    if not interval:
+        return
+
+    # Started by the first request so building an app never spawns threads
+    start_lock = Lock()
+
+    def start_matcher():
+        if "waitlist_matcher_thread" in app.extensions:
+            return
+        with start_lock:
+            if "waitlist_matcher_thread" not in app.extensions:
+                thread = WaitlistMatcherThread(app, matcher, interval)
+                app.extensions["waitlist_matcher_thread"] = thread
+                thread.start()
+
+    app.before_request(start_matcher)